@@ -80,6 +80,10 @@ poetry add gunicorn gevent
 
 # Step 7: Run Flask App using Gunicorn
 echo "🚀 Starting Flask app using Gunicorn..."
+# The workers share /metrics samples through this directory; start it empty
+export METRICS_MULTIPROC_DIR="/home/$USER/events_scraper/data/metrics"
+rm -rf "$METRICS_MULTIPROC_DIR"
+mkdir -p "$METRICS_MULTIPROC_DIR"
 nohup poetry run gunicorn --workers=6 --worker-class=gevent --worker-connections=1000 \
   --max-requests=10000 --max-requests-jitter=1000 --backlog=2048 --bind 127.0.0.1:5001 \
   --timeout=30 --access-logfile=- --error-logfile=- "src.app:create_app()" &
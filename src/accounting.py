@@ -0,0 +1,104 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from .deadlines import DeadlineExceeded
+
+class BudgetExhausted(DeadlineExceeded):
+    """The run used up its request budget; the event is skipped as if it ran out of time."""
+
+def _counters() -> Dict:
+    return {'requests': 0, 'bytes': 0, 'seconds': 0.0, 'errors': 0}
+
+class RequestLedger:
+    """Upstream requests made for one run, by upstream and endpoint and by event.
+
+    Every attempt counts, hedges and failed requests included, since the
+    proxy bills each one. `limit` is the run's request allowance, if any.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.total = 0
+        self.endpoints: Dict[str, Dict[str, Dict]] = {}
+        self.events: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.total >= self.limit
+
+    def record(self, upstream: str, endpoint: str, event_id: Optional[int], nbytes: int, seconds: float,
+               error: bool = False):
+        with self._lock:
+            self.total += 1
+            entries = [self.endpoints.setdefault(upstream, {}).setdefault(endpoint, _counters())]
+            if event_id is not None:
+                entries.append(self.events.setdefault(event_id, _counters()))
+            for entry in entries:
+                entry['requests'] += 1
+                entry['bytes'] += nbytes
+                entry['seconds'] += seconds
+                entry['errors'] += int(error)
+
+    def merge(self, snapshot: Dict):
+        """Add the counts of another ledger's to_dict(), e.g. from a shard worker."""
+        with self._lock:
+            for upstream, endpoints in snapshot.get('endpoints', {}).items():
+                for endpoint, counters in endpoints.items():
+                    entry = self.endpoints.setdefault(upstream, {}).setdefault(endpoint, _counters())
+                    for name in entry:
+                        entry[name] += counters.get(name, 0)
+                    self.total += counters.get('requests', 0)
+            for event_id, counters in snapshot.get('events', {}).items():
+                entry = self.events.setdefault(int(event_id), _counters())
+                for name in entry:
+                    entry[name] += counters.get(name, 0)
+
+    def to_dict(self, events: bool = True) -> Dict:
+        with self._lock:
+            data = {
+                'total': self.total,
+                'endpoints': {upstream: {endpoint: dict(counters, seconds=round(counters['seconds'], 3))
+                                         for endpoint, counters in endpoints.items()}
+                              for upstream, endpoints in self.endpoints.items()}
+            }
+            if events:
+                data['events'] = {event_id: dict(counters) for event_id, counters in self.events.items()}
+            return data
+
+# Ledger and event the current thread is scraping for, read by the API clients
+_local = threading.local()
+
+@contextmanager
+def accounting_scope(ledger: RequestLedger, event_id: int = None):
+    previous = getattr(_local, 'scope', None)
+    _local.scope = (ledger, event_id)
+    try:
+        yield ledger
+    finally:
+        _local.scope = previous
+
+def metered(upstream: str, endpoint: str, send: Callable) -> Callable:
+    """Wrap `send` so each call is booked to the current thread's ledger and event.
+
+    The scope is taken when wrapping, so the calls may run on other
+    threads (hedged attempts do). Outside a scope `send` is returned as is.
+    """
+    scope = getattr(_local, 'scope', None)
+    if scope is None:
+        return send
+    ledger, event_id = scope
+
+    def measured():
+        started = time.monotonic()
+        try:
+            response = send()
+        except DeadlineExceeded:
+            # Refused before anything was sent
+            raise
+        except Exception:
+            ledger.record(upstream, endpoint, event_id, 0, time.monotonic() - started, error=True)
+            raise
+        ledger.record(upstream, endpoint, event_id, len(response.content), time.monotonic() - started)
+        return response
+    return measured
@@ -4,20 +4,29 @@ from .config import Config
 from .models.database import db, Event
 from .routes import events, scraper
 from .constants import CITY_URL_MAP
-from .scraper.scheduler import scheduler
+from .scraper.scheduler import scheduler, ScraperScheduler
 from .routes.auth import auth_bp, login_manager
 from .routes.rules import rules_bp
 from .routes.venue_mapping import bp as venue_mapping_bp
 from .routes.ticketmaster_events import bp as ticketmaster_events_bp
+from .routes.inventory import bp as inventory_bp
+from .routes.metrics import bp as metrics_bp
+from .services import init_upload_service
+from .clients import init_clients
+from .instrumentation import init_instrumentation
+from .migrations import run_migrations
+from .db_utils import configure_sqlite
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
+def create_app(worker: bool = False):
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Set for the standalone scraper process (src/worker.py)
+    app.config['SCRAPER_WORKER'] = worker
     app.secret_key = app.config['SECRET_KEY']
 
     # Enable session protection
@@ -27,6 +36,14 @@ def create_app():
     app.config['PERMANENT_SESSION_LIFETIME'] = Config.PERMANENT_SESSION_LIFETIME
     
     db.init_app(app)
+    configure_sqlite(app)
+
+    # Shared, connection-pooled client for the store API and S3
+    init_upload_service(app)
+    # Warm, pooled TodayTix / Ticketmaster clients shared by runs and searches
+    init_clients(app)
+    # Request and DB commit timings plus queue depths for /metrics
+    init_instrumentation(app)
     
     # Configure APScheduler
     app.config['SCHEDULER_API_ENABLED'] = True
@@ -46,10 +63,21 @@ def create_app():
     app.register_blueprint(rules_bp)
     app.register_blueprint(venue_mapping_bp)
     app.register_blueprint(ticketmaster_events_bp)
+    app.register_blueprint(inventory_bp)
+    app.register_blueprint(metrics_bp)
 
 
     with app.app_context():
         db.create_all()
+        run_migrations()
+
+    if worker:
+        # The worker starts its schedules itself (src/worker.py)
+        return app
+
+    # Pick recurring scrapes back up where they left off, here or in the lease holder
+    ScraperScheduler.start(app)
+    scraper.schedule_cleanup(app)
     
     return app
 
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from flask import current_app
+from .hedging import Hedger
+from .metrics import metrics
+from .ticketmaster.api import TicketmasterAPI
+from .todaytix.api import TodayTixAPI
+
+logger = logging.getLogger(__name__)
+
+upstream_request_seconds = metrics.histogram(
+    'upstream_request_seconds', 'TodayTix / Ticketmaster request latency up to the response headers, by host and status'
+)
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter that times every request it sends, by host and status ('error' if none came back)."""
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ''
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            upstream_request_seconds.observe(time.perf_counter() - started, host=host, status='error')
+            raise
+        upstream_request_seconds.observe(time.perf_counter() - started, host=host, status=response.status_code)
+        return response
+
+def pooled_session(pool_size: int) -> requests.Session:
+    """Keep-alive session whose connection pool holds `pool_size` connections per host.
+
+    Accept-Encoding only lists what urllib3 can decode here: gzip and
+    deflate always, br and zstd when brotli / zstandard are installed.
+    """
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    mount_pool(session, pool_size)
+    return session
+
+def mount_pool(session: requests.Session, pool_size: int):
+    adapter = InstrumentedAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+class ClientRegistry:
+    """Process-wide TodayTix and Ticketmaster clients, reused by every run and search.
+
+    Each client is built on first use and keeps one pooled session, so
+    connections stay warm between runs. Worker threads share the session;
+    its headers and adapters are only changed under the registry lock, and
+    the pool only ever grows (to the largest concurrency asked for).
+    """
+
+    def __init__(self, pool_size: int = 5, timeout: Tuple[float, float] = (10, 30), hedger: Optional[Hedger] = None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.hedger = hedger  # Shared by both clients, so they draw on one hedge budget
+        self._clients: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = factory(session=pooled_session(self.pool_size), timeout=self.timeout, hedger=self.hedger)
+                    self._clients[name] = client
+        return client
+
+    def todaytix(self) -> TodayTixAPI:
+        return self._get('todaytix', TodayTixAPI)
+
+    def ticketmaster(self) -> TicketmasterAPI:
+        return self._get('ticketmaster', TicketmasterAPI)
+
+    def ensure_capacity(self, concurrency: int):
+        """Grow every pool so `concurrency` threads each get a connection without blocking."""
+        if concurrency <= self.pool_size:
+            return
+        with self._lock:
+            if concurrency <= self.pool_size:
+                return
+            self.pool_size = concurrency
+            for client in self._clients.values():
+                # Replacing the adapter drops its idle connections; it only happens when a run needs more
+                mount_pool(client.session, concurrency)
+            if self.hedger:
+                # A primary and its hedge each take a thread
+                self.hedger.resize(concurrency * 2)
+        logger.info(f"API client pools resized to {concurrency} connections per host")
+
+    def stats(self) -> Dict:
+        """Connection reuse per client and host, from urllib3's pool counters.
+
+        Counters restart whenever a pool is replaced (see ensure_capacity).
+        """
+        stats = {'pool_size': self.pool_size, 'clients': {}}
+        for name, client in list(self._clients.items()):
+            hosts = {}
+            seen = set()
+            for adapter in client.session.adapters.values():
+                if id(adapter) in seen:
+                    continue
+                seen.add(id(adapter))
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened, requests_sent = pool.num_connections, pool.num_requests
+                    hosts[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                        'connections_opened': opened,
+                        'requests': requests_sent,
+                        'reused': max(requests_sent - opened, 0),
+                        'idle': pool.pool.qsize() if pool.pool else 0
+                    }
+            stats['clients'][name] = hosts
+        if self.hedger:
+            stats['hedging'] = self.hedger.stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.session.close()
+            self._clients.clear()
+            if self.hedger:
+                self.hedger.close()
+
+def init_clients(app):
+    """Create the app's client registry; clients themselves are built on first use."""
+    config = app.config
+    hedger = None
+    if config['HEDGE_REQUESTS']:
+        hedger = Hedger(
+            percentile=config['HEDGE_PERCENTILE'],
+            budget_percent=config['HEDGE_BUDGET_PERCENT'],
+            min_samples=config['HEDGE_MIN_SAMPLES'],
+            max_workers=config['MAX_CONCURRENT_REQUESTS'] * 2
+        )
+    app.extensions['api_clients'] = ClientRegistry(
+        pool_size=config['MAX_CONCURRENT_REQUESTS'],
+        timeout=(config['API_CONNECT_TIMEOUT'], config['API_READ_TIMEOUT']),
+        hedger=hedger
+    )
+
+def get_clients(app=None) -> ClientRegistry:
+    return (app or current_app).extensions['api_clients']
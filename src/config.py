@@ -9,6 +9,17 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///todaytix.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+    }
+    # Applied to every new SQLite connection (ignored for other databases)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '30000'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+    SQLITE_FOREIGN_KEYS = os.getenv('SQLITE_FOREIGN_KEYS', 'True').lower() == 'true'  # Enforces ON DELETE CASCADE
     OUTPUT_FILE_DIR = os.getenv('OUTPUT_FILE_DIR', 'data/output')
     STORE_API_BASE_URL = os.getenv('STORE_API_BASE_URL', '')
     STORE_API_KEY = os.getenv('STORE_API_KEY')
@@ -16,7 +27,52 @@ class Config:
     PROXY_API_URL = os.getenv('PROXY_API_URL')
     PROXY_API_KEY = os.getenv('PROXY_API_KEY')
     MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '5'))
+    API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', '10'))
+    API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', '30'))
+    # Duplicate seat lookups still running past the observed percentile latency, within a budget
+    HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', 'False').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+    HEDGE_BUDGET_PERCENT = float(os.getenv('HEDGE_BUDGET_PERCENT', '5'))
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+    UPLOAD_CONNECT_TIMEOUT = float(os.getenv('UPLOAD_CONNECT_TIMEOUT', '10'))
+    UPLOAD_READ_TIMEOUT = float(os.getenv('UPLOAD_READ_TIMEOUT', '120'))
+    UPLOAD_POOL_SIZE = int(os.getenv('UPLOAD_POOL_SIZE', '4'))
+    UPLOAD_CHUNK_ROWS = int(os.getenv('UPLOAD_CHUNK_ROWS', '5000'))
+    UPLOAD_ENCODING_SAMPLE_BYTES = int(os.getenv('UPLOAD_ENCODING_SAMPLE_BYTES', str(1024 * 1024)))
     SCHEDULER_API_ENABLED = True
+    SCRAPER_JITTER_SECONDS = int(os.getenv('SCRAPER_JITTER_SECONDS', '30'))
+    SCRAPER_OVERRUN_POLICY = os.getenv('SCRAPER_OVERRUN_POLICY', 'skip')  # 'skip' or 'run_now'
+    PRIORITY_REFRESH_ENABLED = os.getenv('PRIORITY_REFRESH_ENABLED', 'True').lower() == 'true'
+    EVENT_RETENTION_DAYS = int(os.getenv('EVENT_RETENTION_DAYS', '7'))
+    EVENT_LIFECYCLE_INTERVAL_HOURS = int(os.getenv('EVENT_LIFECYCLE_INTERVAL_HOURS', '24'))
+    SCRAPER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCRAPER_MISFIRE_GRACE_SECONDS', '300'))
+    SCRAPER_EVENT_TIMEOUT_SECONDS = float(os.getenv('SCRAPER_EVENT_TIMEOUT_SECONDS', '120'))
+    # Bearer token required on /metrics; leave empty to serve it openly
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    # Directory the web processes (e.g. gunicorn workers) share their metrics through; emptied on deploy
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+    # Port a standalone worker serves /metrics on; 0 disables it
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '0'))
+    # Upstream (proxy) requests a run / a calendar day may make; 0 for no limit
+    SCRAPER_RUN_REQUEST_BUDGET = int(os.getenv('SCRAPER_RUN_REQUEST_BUDGET', '0'))
+    SCRAPER_DAILY_REQUEST_BUDGET = int(os.getenv('SCRAPER_DAILY_REQUEST_BUDGET', '0'))
+    # Share of the job interval a run may spend scraping before it skips what's left and writes out
+    SCRAPER_RUN_BUDGET_FRACTION = float(os.getenv('SCRAPER_RUN_BUDGET_FRACTION', '0.9'))
+    SCRAPER_MODE = os.getenv('SCRAPER_MODE', 'inline')  # 'inline' (in the web process) or 'worker' (python -m src.worker)
+    # Only the holder of the scheduler lease runs scraper schedules; it renews every sync
+    SCHEDULER_LEADER_ELECTION = os.getenv('SCHEDULER_LEADER_ELECTION', 'True').lower() == 'true'
+    SCHEDULER_SYNC_SECONDS = int(os.getenv('SCHEDULER_SYNC_SECONDS', '10'))
+    SCHEDULER_LEASE_TTL_SECONDS = int(os.getenv('SCHEDULER_LEASE_TTL_SECONDS', '30'))  # Keep above 2 syncs
+    # Split each run into work items that `python -m src.worker --shard` processes can claim
+    SCRAPER_SHARDING = os.getenv('SCRAPER_SHARDING', 'False').lower() == 'true'
+    SCRAPER_SHARD_SIZE = int(os.getenv('SCRAPER_SHARD_SIZE', '20'))  # Events per work item
+    SCRAPER_WORK_LEASE_SECONDS = int(os.getenv('SCRAPER_WORK_LEASE_SECONDS', '60'))
+    SCRAPER_WORK_MAX_ATTEMPTS = int(os.getenv('SCRAPER_WORK_MAX_ATTEMPTS', '3'))
+    SCRAPER_SHARD_POLL_SECONDS = float(os.getenv('SCRAPER_SHARD_POLL_SECONDS', '2'))
+    SCRAPER_PROGRESS_POLL_SECONDS = float(os.getenv('SCRAPER_PROGRESS_POLL_SECONDS', '1'))
+    EVENT_IMPORT_BATCH_SIZE = int(os.getenv('EVENT_IMPORT_BATCH_SIZE', '1000'))
+    # CSV imports larger than this run as a background job
+    EVENT_IMPORT_BACKGROUND_BYTES = int(os.getenv('EVENT_IMPORT_BACKGROUND_BYTES', str(512 * 1024)))
     AUTH_USERNAME = os.getenv('AUTH_USERNAME')
     AUTH_PASSWORD = os.getenv('AUTH_PASSWORD')
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
@@ -13,3 +13,5 @@ CITY_URL_MAP = {
     "Other Cities": 98
 }
 
+# Reverse lookup, built once
+CITY_NAMES_BY_ID = {cid: name for name, cid in CITY_URL_MAP.items()}
@@ -0,0 +1,34 @@
+import csv
+from typing import Iterable, List
+from flask import Response, stream_with_context
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer just formatted."""
+
+    def write(self, value):
+        return value
+
+def iter_csv(header: List, rows: Iterable[List], rows_per_chunk: int = 500):
+    """Yield CSV text for `header` and `rows`, a few hundred rows per chunk."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def csv_response(header: List, rows: Iterable[List], filename: str) -> Response:
+    """Stream a CSV download. `rows` may be a lazy generator over a query; it is
+    consumed while the response is sent, with the request context kept alive."""
+    return Response(
+        stream_with_context(iter_csv(header, rows)),
+        mimetype='text/csv',
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Type": "text/csv; charset=utf-8"
+        }
+    )
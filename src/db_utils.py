@@ -1,5 +1,7 @@
 import os
+from sqlalchemy import event
 from .models.database import db
+from .migrations import run_migrations
 
 def reset_database(app):
     """Utility function to reset the database"""
@@ -14,4 +16,28 @@ def reset_database(app):
         
         # Create all tables
         db.create_all()
-        print("Created new database with updated schema")
\ No newline at end of file
+        run_migrations()
+        print("Created new database with updated schema")
+
+def configure_sqlite(app):
+    """Set journal mode, sync level, busy timeout and FK enforcement on every new SQLite connection"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    journal_mode = app.config['SQLITE_JOURNAL_MODE']
+    synchronous = app.config['SQLITE_SYNCHRONOUS']
+    busy_timeout = app.config['SQLITE_BUSY_TIMEOUT_MS']
+    cache_size = app.config['SQLITE_CACHE_SIZE_KB']
+    foreign_keys = 'ON' if app.config['SQLITE_FOREIGN_KEYS'] else 'OFF'
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(cache_size)}")
+        cursor.execute(f"PRAGMA foreign_keys={foreign_keys}")
+        cursor.close()
\ No newline at end of file
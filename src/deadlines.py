@@ -0,0 +1,68 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+class DeadlineExceeded(Exception):
+    """Raised when work runs past its deadline; the work is skipped, not failed."""
+
+class Deadline:
+    """A point in time after which work should stop, optionally capped by a parent.
+
+    `seconds=None` means no limit of its own. Monotonic time, so clock
+    changes don't move it.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: 'Deadline' = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.parent = parent
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (may be negative), or None if unbounded."""
+        candidates = []
+        if self.expires_at is not None:
+            candidates.append(self.expires_at - time.monotonic())
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                candidates.append(parent_remaining)
+        return min(candidates) if candidates else None
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+# Deadline of the work the current thread is doing, read by the API clients
+_local = threading.local()
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+def current_deadline() -> Optional[Deadline]:
+    return getattr(_local, 'deadline', None)
+
+def check_deadline():
+    deadline = current_deadline()
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded('Deadline exceeded')
+
+def request_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """(connect, read) timeouts for one request, cut down to what the current deadline leaves.
+
+    The read timeout bounds each wait on the socket rather than the whole
+    response, so a response trickling in can still overrun by up to one
+    read timeout.
+    """
+    deadline = current_deadline()
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded('Deadline exceeded')
+    return min(timeout[0], remaining), min(timeout[1], remaining)
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from typing import Callable, Dict, Optional
+from .deadlines import current_deadline, deadline_scope
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per endpoint, and how many new ones before the threshold is recomputed
+LATENCY_WINDOW = 500
+THRESHOLD_REFRESH = 20
+# Hedges that may be saved up while requests are fast
+MAX_BUDGET_TOKENS = 10
+
+class Hedger:
+    """Sends a duplicate of a slow request and takes whichever response comes first.
+
+    A request still running after the endpoint's observed `percentile`
+    latency gets one hedge. Hedges are paid from a budget that earns
+    `budget_percent` of a hedge per request, so at most that share of
+    requests is ever duplicated, and endpoints need `min_samples`
+    latencies before they are hedged at all. Only use it for idempotent
+    requests: the losing request still runs to completion.
+    """
+
+    def __init__(self, percentile: float = 95, budget_percent: float = 5, min_samples: int = 20, max_workers: int = 10):
+        self.percentile = percentile
+        self.budget_ratio = budget_percent / 100
+        self.min_samples = min_samples
+        self._latencies: Dict[str, deque] = {}
+        self._thresholds: Dict[str, tuple] = {}  # key -> (samples seen when computed, seconds)
+        self._seen: Dict[str, int] = {}
+        self._counters: Dict[str, Dict] = {}
+        self._tokens = 1.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='hedge')
+
+    def resize(self, max_workers: int):
+        """Give the attempts more threads; calls already running keep the old pool."""
+        with self._lock:
+            old, self._executor = self._executor, ThreadPoolExecutor(max_workers, thread_name_prefix='hedge')
+        old.shutdown(wait=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def threshold(self, key: str) -> Optional[float]:
+        """Seconds after which a request to `key` is hedged, or None while there are too few samples."""
+        with self._lock:
+            samples = self._latencies.get(key)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            seen = self._seen[key]
+            cached = self._thresholds.get(key)
+            if cached is None or seen - cached[0] >= THRESHOLD_REFRESH:
+                ordered = sorted(samples)
+                index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+                cached = (seen, ordered[index])
+                self._thresholds[key] = cached
+            return cached[1]
+
+    def _counter(self, key: str) -> Dict:
+        return self._counters.setdefault(key, {
+            'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_exhausted': 0, 'saved_seconds': 0.0
+        })
+
+    def _attempt(self, key: str, send: Callable, deadline):
+        # Attempts run on the hedge pool; carry the caller's deadline over so timeouts stay capped
+        started = time.monotonic()
+        with deadline_scope(deadline):
+            result = send()
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+            self._seen[key] = self._seen.get(key, 0) + 1
+        return result
+
+    def _take_token(self, key: str) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                self._counter(key)['budget_exhausted'] += 1
+                return False
+            self._tokens -= 1
+            self._counter(key)['hedged'] += 1
+            return True
+
+    def _credit_savings(self, key: str, started: float, won_after: float):
+        """Once the primary a hedge beat finishes, book how much sooner the hedge answered."""
+        def credit(future):
+            saved = time.monotonic() - started - won_after
+            with self._lock:
+                self._counter(key)['saved_seconds'] += max(saved, 0.0)
+        return credit
+
+    def call(self, key: str, send: Callable):
+        """Run `send()` and return its result, hedging it if it is slow for `key`.
+
+        An attempt that raises makes way for the other; the primary's error
+        is raised only if both fail.
+        """
+        with self._lock:
+            self._counter(key)['requests'] += 1
+            self._tokens = min(self._tokens + self.budget_ratio, MAX_BUDGET_TOKENS)
+            executor = self._executor
+        delay = self.threshold(key)
+        deadline = current_deadline()
+        started = time.monotonic()
+        primary = executor.submit(self._attempt, key, send, deadline)
+        if delay is None:
+            return primary.result()
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        if not self._take_token(key):
+            return primary.result()
+
+        hedge = executor.submit(self._attempt, key, send, deadline)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future not in done or future.exception() is not None:
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self._counter(key)['hedge_wins'] += 1
+                    primary.add_done_callback(self._credit_savings(key, started, time.monotonic() - started))
+                return future.result()
+        return primary.result()
+
+    def stats(self) -> Dict:
+        """Counters per endpoint since the process started, with the current hedge thresholds."""
+        stats = {}
+        for key in list(self._counters):
+            threshold = self.threshold(key)
+            with self._lock:
+                stats[key] = dict(self._counters[key], threshold_seconds=threshold)
+        return stats
+
+    @staticmethod
+    def diff(before: Dict, after: Dict) -> Dict:
+        """What happened between two stats() snapshots, with the hedge rate per endpoint."""
+        summary = {}
+        for key, counters in after.items():
+            base = before.get(key, {})
+            entry = {name: counters[name] - base.get(name, 0)
+                     for name in ('requests', 'hedged', 'hedge_wins', 'budget_exhausted', 'saved_seconds')}
+            if not entry['requests']:
+                continue
+            entry['saved_seconds'] = round(entry['saved_seconds'], 3)
+            entry['hedge_rate'] = round(entry['hedged'] / entry['requests'], 4)
+            entry['threshold_seconds'] = counters.get('threshold_seconds')
+            summary[key] = entry
+        return summary
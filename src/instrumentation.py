@@ -0,0 +1,83 @@
+import time
+from flask import g, request
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from .metrics import metrics
+from .models.database import db, ImportJob, ScrapeWorkItem
+from .progress import progress
+
+http_request_seconds = metrics.histogram('http_request_seconds', 'Flask request latency by route, method and status')
+db_commit_seconds = metrics.histogram('db_commit_seconds', 'Duration of session commits, flush included')
+scrape_work_items = metrics.gauge('scrape_work_items', 'Work items of sharded runs by status')
+import_jobs = metrics.gauge('import_jobs', 'Event CSV imports waiting or running')
+scraper_events_pending = metrics.gauge('scraper_events_pending', 'Events of the current run not scraped yet',
+                                       multiprocess_mode='livesum')
+progress_subscribers = metrics.gauge('progress_subscribers', 'Open scraper progress streams',
+                                     multiprocess_mode='livesum')
+
+# Route latency is only kept for matched rules, so stray URLs can't add label values
+UNMATCHED_ROUTE = 'unmatched'
+
+def _before_commit(session):
+    session.info['commit_started'] = time.perf_counter()
+
+def _after_commit(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        db_commit_seconds.observe(time.perf_counter() - started)
+
+def _after_rollback(session):
+    session.info.pop('commit_started', None)
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        http_request_seconds.observe(time.perf_counter() - started, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+def init_instrumentation(app):
+    """Time the app's requests and DB commits and report queue depths on /metrics.
+
+    Web processes share their samples through METRICS_MULTIPROC_DIR when it
+    is set, so any gunicorn worker can serve the totals of all of them.
+    """
+    if app.config['METRICS_MULTIPROC_DIR'] and not app.config['SCRAPER_WORKER']:
+        metrics.enable_multiprocess(app.config['METRICS_MULTIPROC_DIR'])
+
+    if not event.contains(Session, 'before_commit', _before_commit):
+        event.listen(Session, 'before_commit', _before_commit)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+
+    def collect_queue_depths():
+        with app.app_context():
+            scrape_work_items.clear()
+            for status, count in db.session.execute(
+                select(ScrapeWorkItem.status, func.count()).group_by(ScrapeWorkItem.status)
+            ).all():
+                scrape_work_items.set(count, status=status)
+            import_jobs.clear()
+            for status, count in db.session.execute(
+                select(ImportJob.status, func.count())
+                .where(ImportJob.status.in_(['pending', 'running']))
+                .group_by(ImportJob.status)
+            ).all():
+                import_jobs.set(count, status=status)
+
+    def collect_progress():
+        snapshot = progress.snapshot()
+        running = snapshot.get('stage') in ('selecting', 'scraping', 'writing', 'uploading')
+        pending = (snapshot.get('events_total') or 0) - (snapshot.get('events_processed') or 0)
+        scraper_events_pending.set(max(pending, 0) if running else 0)
+        progress_subscribers.set(progress.subscriber_count())
+
+    metrics.on_collect(collect_queue_depths, shared=True)
+    metrics.on_collect(collect_progress)
@@ -0,0 +1,289 @@
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# How often each process writes its samples to the shared directory in multiprocess mode
+MULTIPROCESS_FLUSH_SECONDS = 1.0
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key: Tuple) -> str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in key) + '}'
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str = ''):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+class Gauge:
+    """A value that goes up and down, usually set by a collector right before exposition.
+
+    In multiprocess mode a 'local' gauge is reported by whichever process
+    renders (for state every process sees, like DB counts) and a 'livesum'
+    gauge is summed over the live processes (for per-process state).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, description: str = '', multiprocess_mode: str = 'local'):
+        self.name = name
+        self.description = description
+        self.multiprocess_mode = multiprocess_mode
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self):
+        """Forget every label set, so ones a collector no longer reports disappear."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str = '', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._values[key] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][i] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: {'buckets': list(v['buckets']), 'sum': v['sum'], 'count': v['count']}
+                    for key, v in self._values.items()}
+
+class MetricsRegistry:
+    """Registry of counters, gauges and histograms, process-local unless multiprocess mode is on."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.multiprocess_dir = None
+        self._file = None
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, description, **kwargs)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, description: str = '') -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def histogram(self, name: str, description: str = '', buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def gauge(self, name: str, description: str = '', multiprocess_mode: str = 'local') -> Gauge:
+        return self._get_or_create(Gauge, name, description, multiprocess_mode=multiprocess_mode)
+
+    def on_collect(self, collector: Callable, shared: bool = False):
+        """Run `collector` before every render(), e.g. to set gauges from current state.
+
+        `shared` collectors read state every process sees (the database), so
+        in multiprocess mode only the rendering process runs them; the others
+        also run before each flush.
+        """
+        with self._lock:
+            self._collectors.append((collector, shared))
+
+    def all(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def _collect(self, shared: bool):
+        with self._lock:
+            collectors = [collector for collector, is_shared in self._collectors if shared or not is_shared]
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {str(e)}")
+
+    def enable_multiprocess(self, directory: str):
+        """Share samples with the other processes using `directory`, e.g. gunicorn workers.
+
+        Each process writes its samples to a file of its own every
+        MULTIPROCESS_FLUSH_SECONDS and at exit, and render() merges all of
+        them: counters and histograms add up (exited processes included, so
+        totals never go backwards), gauges follow their multiprocess_mode.
+        Empty the directory before the server starts.
+        """
+        with self._lock:
+            if self.multiprocess_dir:
+                return
+            os.makedirs(directory, exist_ok=True)
+            self.multiprocess_dir = directory
+            self._file = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        atexit.register(self.flush)
+        threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(MULTIPROCESS_FLUSH_SECONDS)
+            self._collect(shared=False)
+            self.flush()
+
+    def flush(self):
+        """Write this process's samples to its file in the multiprocess directory."""
+        if not self._file:
+            return
+        data = {}
+        for metric in self.all():
+            family = {'kind': metric.kind, 'description': metric.description,
+                      'samples': [[list(key), value] for key, value in metric.samples().items()]}
+            if metric.kind == 'histogram':
+                family['buckets'] = list(metric.buckets)
+            if metric.kind == 'gauge':
+                family['multiprocess_mode'] = metric.multiprocess_mode
+            data[metric.name] = family
+        try:
+            # Readers only ever see a complete file
+            with open(f'{self._file}.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(f'{self._file}.tmp', self._file)
+        except OSError as e:
+            logger.error(f"Error writing metrics to {self._file}: {str(e)}")
+
+    def _local_families(self) -> Dict[str, Dict]:
+        return {metric.name: {'kind': metric.kind, 'description': metric.description,
+                              'buckets': getattr(metric, 'buckets', None), 'samples': metric.samples()}
+                for metric in self.all()}
+
+    def _merged_families(self) -> Dict[str, Dict]:
+        self.flush()
+        merged = {name: family for name, family in self._local_families().items()
+                  if family['kind'] == 'gauge' and self._metrics[name].multiprocess_mode == 'local'}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = None
+            for name, family in data.items():
+                # 'local' gauges come from this process alone, livesum ones from live processes
+                if family['kind'] == 'gauge':
+                    if family.get('multiprocess_mode') != 'livesum':
+                        continue
+                    if alive is None:
+                        alive = _pid_alive(int(os.path.basename(path).split('-')[0]))
+                    if not alive:
+                        continue
+                target = merged.setdefault(name, {'kind': family['kind'], 'description': family['description'],
+                                                  'buckets': tuple(family.get('buckets') or ()), 'samples': {}})
+                for key, value in family['samples']:
+                    key = tuple(tuple(pair) for pair in key)
+                    current = target['samples'].get(key)
+                    if family['kind'] != 'histogram':
+                        target['samples'][key] = (current or 0) + value
+                    elif current is None:
+                        target['samples'][key] = value
+                    elif len(current['buckets']) == len(value['buckets']):
+                        target['samples'][key] = {
+                            'buckets': [a + b for a, b in zip(current['buckets'], value['buckets'])],
+                            'sum': current['sum'] + value['sum'],
+                            'count': current['count'] + value['count']
+                        }
+        return merged
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        self._collect(shared=True)
+        families = self._merged_families() if self.multiprocess_dir else self._local_families()
+
+        lines = []
+        for name, family in sorted(families.items()):
+            if family['description']:
+                help_text = family['description'].replace('\\', '\\\\').replace('\n', '\\n')
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {family["kind"]}')
+            for key, value in sorted(family['samples'].items()):
+                if family['kind'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+                    continue
+                # Buckets are already cumulative: observe() counts a value in every bucket it fits
+                for bound, count in zip(tuple(family['buckets']) + (math.inf,), value['buckets'] + [value['count']]):
+                    lines.append(f'{name}_bucket{_format_labels(key + (("le", _format_value(bound)),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(value["sum"])}')
+                lines.append(f'{name}_count{_format_labels(key)} {value["count"]}')
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
@@ -0,0 +1,191 @@
+import logging
+from datetime import datetime
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+from .models.database import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+def migration(version: int, name: str, disable_foreign_keys: bool = False):
+    """Register a schema migration. Versions are applied once, in ascending order.
+
+    Table rebuilds need `disable_foreign_keys`: dropping the old table would
+    otherwise cascade into every table referencing it.
+    """
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn, disable_foreign_keys))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+def create_index(conn, table_name: str, index_name: str):
+    """Create an index declared on a model, if the database doesn't have it yet."""
+    table = db.metadata.tables[table_name]
+    index = next(i for i in table.indexes if i.name == index_name)
+    index.create(conn, checkfirst=True)
+
+def create_table(conn, table_name: str):
+    """Create a model's table (and its indexes) if it doesn't exist yet."""
+    db.metadata.tables[table_name].create(conn, checkfirst=True)
+
+def add_column(conn, table_name: str, column_name: str, ddl: str):
+    """Add a column to an existing table unless it is already there."""
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    if column_name not in existing:
+        conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}'))
+
+def rebuild_table(conn, table_name: str):
+    """Recreate a table from its model and copy the rows over, for changes SQLite can't ALTER.
+
+    SQLite's documented procedure: create, copy, drop the old table, rename.
+    """
+    table = db.metadata.tables[table_name]
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    columns = ', '.join(c.name for c in table.columns if c.name in existing)
+    metadata = MetaData()
+    # Foreign keys compile against the tables they point at
+    for foreign_key in table.foreign_keys:
+        foreign_key.column.table.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=f'{table_name}_rebuild')
+    conn.execute(CreateTable(rebuilt))
+    conn.execute(text(f'INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table_name}'))
+    conn.execute(text(f'DROP TABLE {table_name}'))
+    conn.execute(text(f'ALTER TABLE {rebuilt.name} RENAME TO {table_name}'))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+def seed_sequence(conn, table_name: str, *id_columns):
+    """Start an AUTOINCREMENT table's ids after every (table, column) given, so ids kept elsewhere aren't handed out again."""
+    highest = max(
+        (conn.execute(text(f'SELECT MAX({column}) FROM {table}')).scalar() or 0 for table, column in id_columns),
+        default=0
+    )
+    conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table_name})
+    conn.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'), {'name': table_name, 'seq': highest})
+
+@migration(1, 'event lifecycle tables and event_date index')
+def _event_lifecycle(conn):
+    create_table(conn, 'archived_events')
+    create_table(conn, 'archived_event_rules')
+    create_index(conn, 'events', 'ix_events_event_date')
+
+@migration(2, 'hot path indexes')
+def _hot_path_indexes(conn):
+    create_index(conn, 'events', 'ix_events_website_event_date')
+    create_index(conn, 'events', 'ix_events_todaytix_ids')
+    create_index(conn, 'events', 'ix_events_ticketmaster_id')
+    create_index(conn, 'events', 'ix_events_name_city_venue')
+    create_index(conn, 'event_rules', 'ix_event_rules_event_id_rule_type')
+    create_index(conn, 'venue_mappings', 'ix_venue_mappings_event_venue_active')
+
+@migration(3, 'import jobs table')
+def _import_jobs(conn):
+    create_table(conn, 'import_jobs')
+
+@migration(4, 'scraper runs and inventory tables')
+def _inventory(conn):
+    create_table(conn, 'scraper_runs')
+    create_table(conn, 'inventory')
+
+@migration(5, 'price history tables')
+def _price_history(conn):
+    create_table(conn, 'price_history_labels')
+    create_table(conn, 'price_history')
+
+@migration(6, 'scheduler leases table')
+def _scheduler_leases(conn):
+    create_table(conn, 'scheduler_leases')
+
+@migration(7, 'scrape work items table')
+def _scrape_work_items(conn):
+    create_table(conn, 'scrape_work_items')
+
+@migration(8, 'scraper run skipped events count')
+def _scraper_run_events_skipped(conn):
+    add_column(conn, 'scraper_runs', 'events_skipped', 'INTEGER DEFAULT 0')
+
+@migration(9, 'scraper run hedging stats')
+def _scraper_run_hedge_stats(conn):
+    add_column(conn, 'scraper_runs', 'hedge_stats', 'TEXT')
+
+@migration(10, 'upstream request accounting')
+def _request_accounting(conn):
+    add_column(conn, 'scraper_runs', 'requests_made', 'INTEGER DEFAULT 0')
+    add_column(conn, 'scraper_runs', 'request_stats', 'TEXT')
+    add_column(conn, 'scrape_work_items', 'request_stats', 'TEXT')
+    create_table(conn, 'run_event_requests')
+
+@migration(11, 'scraper run started_at index')
+def _scraper_run_started_at(conn):
+    create_index(conn, 'scraper_runs', 'ix_scraper_runs_started_at')
+
+@migration(12, 'request budget of sharded runs')
+def _sharded_request_budget(conn):
+    add_column(conn, 'scraper_runs', 'request_limit', 'INTEGER')
+    add_column(conn, 'scrape_work_items', 'requests_made', 'INTEGER')
+
+@migration(13, 'case-insensitive event name index')
+def _event_name_nocase(conn):
+    create_index(conn, 'events', 'ix_events_event_name_nocase')
+
+@migration(14, 'never reuse event ids', disable_foreign_keys=True)
+def _events_autoincrement(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'events'")).scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return
+    rebuild_table(conn, 'events')
+    # Start after every id handed out so far, including those of events already archived or deleted
+    seed_sequence(conn, 'events', ('events', 'id'), ('archived_events', 'id'), ('archived_event_rules', 'event_id'),
+                  ('price_history', 'event_pk'), ('run_event_requests', 'event_id'))
+
+@migration(15, 'never reuse event rule ids', disable_foreign_keys=True)
+def _event_rules_autoincrement(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'event_rules'")).scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return
+    rebuild_table(conn, 'event_rules')
+    # Archived rules keep their original ids
+    seed_sequence(conn, 'event_rules', ('event_rules', 'id'), ('archived_event_rules', 'id'))
+
+def run_migrations():
+    """Bring an existing database up to the current schema in place.
+
+    Must run inside an app context, after db.create_all() has created any
+    tables that are missing entirely.
+    """
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)'
+        ))
+        applied = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+    for version, name, fn, disable_foreign_keys in MIGRATIONS:
+        if version in applied:
+            continue
+        with db.engine.connect() as conn:
+            foreign_keys = None
+            if disable_foreign_keys and conn.dialect.name == 'sqlite':
+                # The pragma is a no-op inside a transaction, so it is switched before one starts
+                foreign_keys = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+                conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+                conn.commit()
+            try:
+                # Each migration and its bookkeeping row commit together
+                with conn.begin():
+                    fn(conn)
+                    conn.execute(
+                        text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                        {'v': version, 'n': name, 't': datetime.now()}
+                    )
+            finally:
+                if foreign_keys is not None:
+                    conn.exec_driver_sql(f'PRAGMA foreign_keys={int(foreign_keys)}')
+                    conn.commit()
+        logger.info(f"Applied migration {version}: {name}")
@@ -1,11 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, tuple_, update
 from sqlalchemy.sql import func
 from datetime import datetime
+import threading
+import time
 
 db = SQLAlchemy()
 
 class Event(db.Model):
     __tablename__ = 'events'
+    __table_args__ = (
+        db.Index('ix_events_website_event_date', 'website', 'event_date'),
+        db.Index('ix_events_todaytix_ids', 'todaytix_show_id', 'todaytix_event_id'),
+        db.Index('ix_events_ticketmaster_id', 'ticketmaster_id'),
+        db.Index('ix_events_name_city_venue', 'event_name', 'city_id', 'venue_name'),
+        # Case-insensitive name prefix search (build_event_filters' q) as a NOCASE range scan
+        db.Index('ix_events_event_name_nocase', text('event_name COLLATE NOCASE')),
+        # Ids are never reused: the archive, price history and request stats keep them after the event is gone
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     website = db.Column(db.String(255), nullable=False)
@@ -15,7 +28,7 @@ class Event(db.Model):
     ticketmaster_id = db.Column(db.String(255), nullable=True) 
     event_name = db.Column(db.String(255), nullable=False)
     city_id = db.Column(db.Integer, nullable=False)
-    event_date = db.Column(db.Date, nullable=False)
+    event_date = db.Column(db.Date, nullable=False, index=True)
     event_time = db.Column(db.String(50), nullable=False)
     venue_name = db.Column(db.String(255), nullable=True)
     markup = db.Column(db.Float, nullable=False, default=1.6)
@@ -25,13 +38,23 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
 
-    def to_dict(self):
-        from ..constants import CITY_URL_MAP
-        city_name = None
-        for city, cid in CITY_URL_MAP.items():
-            if cid == self.city_id:
-                city_name = city
-                break
+    @staticmethod
+    def mark_changed(*conditions):
+        """Bump updated_at on the matching events after a change to how their listings are built.
+
+        The priority scheduler then scrapes them on its next tick instead of
+        reusing rows cached before the change. Commit it with the change.
+        UTC with microseconds, as the scheduler's last_scraped_at; CURRENT_TIMESTAMP
+        only has whole seconds.
+        """
+        db.session.execute(
+            update(Event).where(*conditions).values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def to_dict(self, include_rules: bool = True):
+        from ..constants import CITY_NAMES_BY_ID
+        city_name = CITY_NAMES_BY_ID.get(self.city_id)
 
         result = {
             'id': self.id,
@@ -39,6 +62,7 @@ class Event(db.Model):
             'event_id': self.event_id,
             'todaytix_event_id': self.todaytix_event_id,
             'todaytix_show_id': self.todaytix_show_id,
+            'ticketmaster_id': self.ticketmaster_id,
             'event_name': self.event_name,
             'city_id': self.city_id,
             'city': city_name or 'Unknown',
@@ -53,18 +77,50 @@ class Event(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-        result['rules'] = [rule.to_dict() for rule in self.rules]
+        if include_rules:
+            result['rules'] = [rule.to_dict() for rule in self.rules]
         return result
 
     @property
     def city_name(self):
         """Helper property to get city name directly"""
-        from ..constants import CITY_URL_MAP
-        for city, cid in CITY_URL_MAP.items():
-            if cid == self.city_id:
-                return city
-        return 'Unknown'
+        from ..constants import CITY_NAMES_BY_ID
+        return CITY_NAMES_BY_ID.get(self.city_id, 'Unknown')
     
+class ArchivedEvent(db.Model):
+    """Events moved out of the live table once they are past the retention window."""
+    __tablename__ = 'archived_events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    website = db.Column(db.String(255), nullable=False)
+    event_id = db.Column(db.String(255), nullable=False, index=True)
+    todaytix_event_id = db.Column(db.String(255), nullable=True)
+    todaytix_show_id = db.Column(db.String(255), nullable=True)
+    ticketmaster_id = db.Column(db.String(255), nullable=True)
+    event_name = db.Column(db.String(255), nullable=False)
+    city_id = db.Column(db.Integer, nullable=False)
+    event_date = db.Column(db.Date, nullable=False)
+    event_time = db.Column(db.String(50), nullable=False)
+    venue_name = db.Column(db.String(255), nullable=True)
+    markup = db.Column(db.Float, nullable=False, default=1.6)
+    stock_type = db.Column(db.String(50), nullable=True)
+    in_hand_date = db.Column(db.Date, nullable=True)
+    in_hand = db.Column(db.String(25), nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=func.now())
+
+class ArchivedEventRule(db.Model):
+    __tablename__ = 'archived_event_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=False, index=True)  # ArchivedEvent.id (the original Event.id)
+    rule_type = db.Column(db.String(50), nullable=False)
+    keyword = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=func.now())
+
 class ScraperJob(db.Model):
     __tablename__ = 'scraper_jobs'
     
@@ -95,8 +151,270 @@ class ScraperJob(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+class ScraperSchedule(db.Model):
+    __tablename__ = 'scraper_schedules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('scraper_jobs.id', ondelete='CASCADE'), nullable=False, unique=True)
+    interval_minutes = db.Column(db.Integer, nullable=False)
+    jitter_seconds = db.Column(db.Integer, nullable=False, default=0)
+    overrun_policy = db.Column(db.String(20), nullable=False, default='skip')  # 'skip' or 'run_now'
+    anchor = db.Column(db.DateTime, nullable=False)  # Runs are due at anchor + k * interval
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'interval_minutes': self.interval_minutes,
+            'jitter_seconds': self.jitter_seconds,
+            'overrun_policy': self.overrun_policy,
+            'anchor': self.anchor.isoformat() if self.anchor else None,
+            'enabled': self.enabled,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class SchedulerLease(db.Model):
+    """Time-limited claim on a singleton role, such as running the scraper schedules."""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)  # host:pid:nonce of the holding process
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    renewed_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'holder': self.holder,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'renewed_at': self.renewed_at.isoformat() if self.renewed_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+class EventRefreshState(db.Model):
+    __tablename__ = 'event_refresh_states'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), primary_key=True)
+    last_scraped_at = db.Column(db.DateTime)
+    next_due_at = db.Column(db.DateTime, index=True)
+    volatility = db.Column(db.Float, nullable=False, default=1.0)  # EWMA of listing changes per run, 0..1
+    last_signature = db.Column(db.String(64))
+    last_row_count = db.Column(db.Integer, default=0)
+    # Output rows from the last scrape, reused while not due; deferred, read with priority.cached_rows
+    rows_json = db.deferred(db.Column(db.Text))
+
+    event = db.relationship('Event', backref=db.backref('refresh_state', uselist=False, cascade='all, delete-orphan',
+                                                        passive_deletes=True))
+
+    def to_dict(self):
+        return {
+            'event_id': self.event_id,
+            'last_scraped_at': self.last_scraped_at.isoformat() if self.last_scraped_at else None,
+            'next_due_at': self.next_due_at.isoformat() if self.next_due_at else None,
+            'volatility': self.volatility,
+            'last_row_count': self.last_row_count
+        }
+
+class ScraperRun(db.Model):
+    """One execution of EventScraper.run."""
+    __tablename__ = 'scraper_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('scraper_jobs.id', ondelete='SET NULL'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, completed, error, stopped
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime)
+    events_scraped = db.Column(db.Integer, default=0)
+    rows_found = db.Column(db.Integer, default=0)
+    events_skipped = db.Column(db.Integer, default=0)  # Left out because the run or event deadline ran out
+    output_file = db.Column(db.String(512))
+    hedge_stats = db.Column(db.Text)  # JSON per endpoint: requests, hedged, hedge_wins, saved_seconds, ...
+    requests_made = db.Column(db.Integer, default=0)  # Upstream requests, counted against the daily budget
+    request_limit = db.Column(db.Integer)  # Requests the run was allowed when it started; None for no budget
+    request_stats = db.Column(db.Text)  # JSON: requests, bytes, seconds and errors per upstream and endpoint
+
+    def to_dict(self):
+        import json
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'events_scraped': self.events_scraped,
+            'rows_found': self.rows_found,
+            'events_skipped': self.events_skipped,
+            'output_file': self.output_file,
+            'hedge_stats': json.loads(self.hedge_stats) if self.hedge_stats else None,
+            'requests_made': self.requests_made,
+            'request_limit': self.request_limit,
+            'request_stats': json.loads(self.request_stats) if self.request_stats else None
+        }
+
+class RunEventRequests(db.Model):
+    """Upstream requests one run spent on one event, for finding expensive events and budgeting."""
+    __tablename__ = 'run_event_requests'
+    __table_args__ = (
+        db.Index('ix_run_event_requests_event_id', 'event_id'),
+    )
+
+    run_id = db.Column(db.Integer, db.ForeignKey('scraper_runs.id', ondelete='CASCADE'), primary_key=True)
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Event.id; kept after the event is gone
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    bytes = db.Column(db.Integer, nullable=False, default=0)
+    seconds = db.Column(db.Float, nullable=False, default=0.0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+
+class ScrapeWorkItem(db.Model):
+    """A batch of events from one scraper run, leased to whichever worker claims it."""
+    __tablename__ = 'scrape_work_items'
+    __table_args__ = (
+        db.Index('ix_scrape_work_items_run_status', 'run_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('scraper_runs.id', ondelete='CASCADE'), nullable=False)
+    event_ids = db.Column(db.Text, nullable=False)  # JSON list of Event.id
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, claimed, done, failed
+    claimed_by = db.Column(db.String(255))
+    claim_token = db.Column(db.String(32))  # Changes on every claim, so a stale holder can't complete the item
+    lease_expires_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    rows_found = db.Column(db.Integer)
+    results_json = db.Column(db.Text)  # JSON object of Event.id -> scraped rows
+    request_stats = db.Column(db.Text)  # JSON RequestLedger of the worker that completed it
+    requests_made = db.Column(db.Integer)  # The ledger's total, summed for the run's remaining allowance
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'status': self.status,
+            'claimed_by': self.claimed_by,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'attempts': self.attempts,
+            'rows_found': self.rows_found,
+            'error': self.error
+        }
+
+class Inventory(db.Model):
+    """Listings the scraper currently produces, one row per inventory_id."""
+    __tablename__ = 'inventory'
+    __table_args__ = (
+        db.Index('ix_inventory_event_section', 'event_pk', 'section'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    inventory_id = db.Column(db.String(100), nullable=False, unique=True)
+    event_pk = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False)
+    event_id = db.Column(db.String(255), nullable=False, index=True)  # Event.event_id, as in the output CSV
+    section = db.Column(db.String(255), nullable=False)
+    row = db.Column(db.String(50), nullable=False)
+    seats = db.Column(db.String(255), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=2)
+    cost = db.Column(db.Float, nullable=False)
+    list_price = db.Column(db.Integer, nullable=False)
+    first_seen_run_id = db.Column(db.Integer, nullable=False)
+    last_seen_run_id = db.Column(db.Integer, nullable=False, index=True)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'inventory_id': self.inventory_id,
+            'event_id': self.event_id,
+            'section': self.section,
+            'row': self.row,
+            'seats': self.seats,
+            'quantity': self.quantity,
+            'cost': self.cost,
+            'list_price': self.list_price,
+            'first_seen_run_id': self.first_seen_run_id,
+            'last_seen_run_id': self.last_seen_run_id,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None
+        }
+
+class PriceHistoryLabel(db.Model):
+    """Dictionary of section and row names, so history rows store small integers."""
+    __tablename__ = 'price_history_labels'
+
+    id = db.Column(db.Integer, primary_key=True)
+    label = db.Column(db.String(255), nullable=False, unique=True)
+
+class PriceHistory(db.Model):
+    """Append-only price observations, one row per event, section and row per scrape.
+
+    Clustered on the primary key (WITHOUT ROWID on SQLite) so a trend query
+    for one event/section reads a contiguous range.
+    """
+    __tablename__ = 'price_history'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    event_pk = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Event.id; kept after the event is gone
+    section_code = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    observed_at = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Unix seconds
+    row_code = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    run_id = db.Column(db.Integer, nullable=False)
+    min_cost_cents = db.Column(db.Integer, nullable=False)
+    max_cost_cents = db.Column(db.Integer, nullable=False)
+    listings = db.Column(db.Integer, nullable=False)
+
+class ImportJob(db.Model):
+    """Progress and outcome of a bulk event CSV import."""
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    mode = db.Column(db.String(20), nullable=False, default='skip')  # 'skip' or 'upsert'
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, error
+    total_rows = db.Column(db.Integer, default=0)
+    processed_rows = db.Column(db.Integer, default=0)
+    imported_count = db.Column(db.Integer, default=0)
+    updated_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    errors_json = db.Column(db.Text)  # First MAX_REPORTED_ERRORS row errors
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        import json
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'mode': self.mode,
+            'status': self.status,
+            'total_rows': self.total_rows,
+            'processed_rows': self.processed_rows,
+            'imported_count': self.imported_count,
+            'updated_count': self.updated_count,
+            'skipped_count': self.skipped_count,
+            'error_count': self.error_count,
+            'errors': json.loads(self.errors_json) if self.errors_json else [],
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class EventRule(db.Model):
     __tablename__ = 'event_rules'
+    __table_args__ = (
+        db.Index('ix_event_rules_event_id_rule_type', 'event_id', 'rule_type'),
+        # Ids are never reused: archived rules keep theirs
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False)
@@ -105,7 +423,7 @@ class EventRule(db.Model):
     created_at = db.Column(db.DateTime, server_default=func.now())
     updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
-    event = db.relationship('Event', backref=db.backref('rules', cascade='all, delete-orphan'))
+    event = db.relationship('Event', backref=db.backref('rules', cascade='all, delete-orphan', passive_deletes=True))
     
     def to_dict(self):
         return {
@@ -119,6 +437,9 @@ class EventRule(db.Model):
     
 class VenueMapping(db.Model):
     __tablename__ = 'venue_mappings'
+    __table_args__ = (
+        db.Index('ix_venue_mappings_event_venue_active', 'event_name', 'venue_name', 'active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     event_name = db.Column(db.String(255), nullable=False)
@@ -143,9 +464,38 @@ class VenueMapping(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+    # (event_name, venue_name) -> (loaded_at, excluded seats); shared by scraper threads
+    _excluded_seats_cache = {}
+    _excluded_seats_lock = threading.Lock()
+    EXCLUDED_SEATS_TTL_SECONDS = 300
+
+    @staticmethod
+    def mark_events_changed(pairs):
+        """Have the events of these (event_name, venue_name) pairs scraped afresh; see Event.mark_changed."""
+        pairs = list(set(pairs))
+        if pairs:
+            Event.mark_changed(tuple_(Event.event_name, Event.venue_name).in_(pairs))
+
+    @staticmethod
+    def invalidate_excluded_seats_cache():
+        """Drop cached exclusions. Call once after any change to venue mappings."""
+        with VenueMapping._excluded_seats_lock:
+            VenueMapping._excluded_seats_cache.clear()
+
     @staticmethod
     def get_excluded_seats(event_name: str, venue_name: str):
-        """Get all excluded seats for a specific event and venue"""
+        """Get all excluded seats for a specific event and venue.
+
+        Results are cached per process for EXCLUDED_SEATS_TTL_SECONDS; the TTL
+        bounds staleness when another process edits the mappings.
+        """
+        key = (event_name, venue_name)
+        now = time.monotonic()
+        with VenueMapping._excluded_seats_lock:
+            cached = VenueMapping._excluded_seats_cache.get(key)
+        if cached and now - cached[0] < VenueMapping.EXCLUDED_SEATS_TTL_SECONDS:
+            return cached[1]
+
         mappings = VenueMapping.query.filter_by(
             event_name=event_name,
             venue_name=venue_name,
@@ -154,9 +504,11 @@ class VenueMapping(db.Model):
         
         excluded_seats = {}
         for mapping in mappings:
-            key = f"{mapping.section}_{mapping.row}"
-            if key not in excluded_seats:
-                excluded_seats[key] = set()
-            excluded_seats[key].update(seat.strip() for seat in mapping.seats.split(','))
-        
+            key_name = f"{mapping.section}_{mapping.row}"
+            if key_name not in excluded_seats:
+                excluded_seats[key_name] = set()
+            excluded_seats[key_name].update(seat.strip() for seat in mapping.seats.split(','))
+
+        with VenueMapping._excluded_seats_lock:
+            VenueMapping._excluded_seats_cache[key] = (now, excluded_seats)
         return excluded_seats
\ No newline at end of file
@@ -0,0 +1,83 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from typing import Dict
+
+class ProgressBroker:
+    """In-process fan-out of scraper progress to any number of listeners.
+
+    The scraper publishes; each subscriber (an SSE response) gets its own
+    bounded queue. A slow subscriber loses its oldest messages rather than
+    holding up the scraper. The latest job state is kept as a snapshot so a
+    new subscriber can render immediately.
+    """
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._snapshot: Dict = {}
+
+    def publish(self, event_type: str, **data):
+        message = {'id': next(self._ids), 'type': event_type, 'time': time.time(), **data}
+        with self._lock:
+            # Per-event details are transient; everything else describes the current state
+            self._snapshot.update({k: v for k, v in data.items() if k not in ('event', 'error')})
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self._snapshot)
+
+    def stream(self, keepalive_seconds: float = 15):
+        """Generator of SSE-formatted text: the current snapshot, then live messages."""
+        subscriber = self.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            yield format_sse('snapshot', self.snapshot())
+            while True:
+                try:
+                    message = subscriber.get(timeout=keepalive_seconds)
+                except queue.Empty:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(message['type'], message, message['id'])
+        finally:
+            self.unsubscribe(subscriber)
+
+def format_sse(event_type: str, data: Dict, message_id: int = None) -> str:
+    lines = []
+    if message_id is not None:
+        lines.append(f'id: {message_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+progress = ProgressBroker()
@@ -1,12 +1,18 @@
-from datetime import datetime
-from io import StringIO
+from datetime import date, datetime
 from flask import Blueprint, jsonify, redirect, request, render_template, current_app, url_for
 from flask_login import login_required
+from sqlalchemy import and_, collate, func, or_, select
+from sqlalchemy.orm import selectinload
 from werkzeug.utils import secure_filename
-import csv
+import base64
+import json
 import os
-from ..models.database import db, Event
-from ..constants import CITY_URL_MAP
+import threading
+import uuid
+from ..models.database import db, Event, ImportJob
+from ..constants import CITY_URL_MAP, CITY_NAMES_BY_ID
+from ..csv_utils import csv_response
+from ..services import archive_past_events, delete_events, EventImporter, IMPORT_MODES, run_import_job
 
 bp = Blueprint('events', __name__)
 
@@ -16,10 +22,129 @@ def get_city_id_by_name(city_name):
 
 def get_city_name_by_id(city_id):
     """Get city name from city ID"""
-    for city_name, cid in CITY_URL_MAP.items():
-        if cid == city_id:
-            return city_name
-    return None
+    return CITY_NAMES_BY_ID.get(city_id)
+
+EVENT_CSV_HEADER = [
+    'website', 'event_id', 'event_name', 'city',
+    'event_date', 'event_time', 'todaytix_event_id',
+    'todaytix_show_id', 'ticketmaster_id', 'venue_name', 'markup',
+    'stock_type', 'in_hand', 'in_hand_date'
+]
+EXPORT_BATCH_SIZE = 1000
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sortable columns; nullable ones are coalesced so keyset comparisons stay total
+SORT_COLUMNS = {
+    'id': Event.id,
+    'event_date': Event.event_date,
+    'event_name': Event.event_name,
+    'venue_name': func.coalesce(Event.venue_name, ''),
+    'website': Event.website,
+    'city_id': Event.city_id,
+    'markup': Event.markup,
+}
+
+def name_prefix_range(prefix: str):
+    """Bounds [low, high) of the names starting with `prefix` under NOCASE, which folds ASCII only.
+
+    high is None when nothing sorts after the prefix's last character.
+    """
+    low = ''.join(c.lower() if 'A' <= c <= 'Z' else c for c in prefix)
+    following = ord(low[-1]) + 1
+    if ord('A') <= following <= ord('Z'):
+        following = ord('[')  # NOCASE reads A-Z as a-z; after '@' comes '['
+    elif 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # Surrogates can't be stored as UTF-8
+    if following > 0x10FFFF:
+        return low, None
+    return low, low[:-1] + chr(following)
+
+def build_event_filters(args):
+    """Translate query-string filters into SQLAlchemy conditions.
+
+    Supported: website, city (name or id), date_from, date_to (YYYY-MM-DD),
+    q (event name prefix, ignoring case) and venue (exact venue name).
+    """
+    filters = []
+    if args.get('website'):
+        filters.append(Event.website == args['website'])
+    if args.get('city'):
+        city = args['city'].strip()
+        city_id = int(city) if city.isdigit() else get_city_id_by_name(city)
+        if city_id is None:
+            raise ValueError(f"Unknown city '{city}'")
+        filters.append(Event.city_id == city_id)
+    if args.get('date_from'):
+        filters.append(Event.event_date >= datetime.strptime(args['date_from'], '%Y-%m-%d').date())
+    if args.get('date_to'):
+        filters.append(Event.event_date <= datetime.strptime(args['date_to'], '%Y-%m-%d').date())
+    if args.get('q') and args['q'].strip():
+        # A NOCASE range rather than LIKE 'q%', so ix_events_event_name_nocase can serve it
+        low, high = name_prefix_range(args['q'].strip())
+        name = collate(Event.event_name, 'NOCASE')
+        filters.append(name >= low)
+        if high is not None:
+            filters.append(name < high)
+    if args.get('venue'):
+        filters.append(Event.venue_name == args['venue'].strip())
+    return filters
+
+def encode_cursor(sort: str, value, event_id: int) -> str:
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str, sort: str):
+    sort_name, value, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if sort_name != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    if sort == 'event_date' and value is not None:
+        value = date.fromisoformat(value)
+    return value, event_id
+
+def paginate_events(args, filters=None):
+    """Return one keyset page of events as (events, next_cursor).
+
+    Costs two queries regardless of page position: the page itself and one
+    batched SELECT for the rules of every event on it.
+    """
+    sort = args.get('sort', 'id')
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Invalid sort column '{sort}'")
+    descending = args.get('order', 'asc').lower() == 'desc'
+    limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    sort_col = SORT_COLUMNS[sort]
+
+    query = Event.query.options(selectinload(Event.rules))
+    conditions = filters if filters is not None else build_event_filters(args)
+    if conditions:
+        query = query.filter(*conditions)
+
+    if args.get('cursor'):
+        value, last_id = decode_cursor(args['cursor'], sort)
+        if sort == 'id':
+            query = query.filter(Event.id < last_id if descending else Event.id > last_id)
+        elif descending:
+            query = query.filter(or_(sort_col < value, and_(sort_col == value, Event.id < last_id)))
+        else:
+            query = query.filter(or_(sort_col > value, and_(sort_col == value, Event.id > last_id)))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), Event.id.desc())
+    else:
+        query = query.order_by(sort_col.asc(), Event.id.asc())
+
+    events = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        last_value = (last.venue_name or '') if sort == 'venue_name' else getattr(last, sort)
+        next_cursor = encode_cursor(sort, last_value, last.id)
+    return events, next_cursor
 
 @bp.route('/')
 @login_required
@@ -29,16 +154,31 @@ def index():
 @bp.route('/events', methods=['GET'])
 @login_required
 def events_page():
-    events = Event.query.all()
-    # Create a reverse mapping for display purposes
-    city_names = {cid: name for name, cid in CITY_URL_MAP.items()}
-    return render_template('events.html', events=events, cities=CITY_URL_MAP, city_names=city_names)
+    # Rows are fetched page by page from /api/events, so the initial render is constant-size
+    return render_template('events.html', cities=CITY_URL_MAP, city_names=CITY_NAMES_BY_ID,
+                           page_size=DEFAULT_PAGE_SIZE, sort_columns=list(SORT_COLUMNS))
 
 @bp.route('/api/events', methods=['GET'])
 @login_required
 def get_events():
-    events = Event.query.all()
-    return jsonify([event.to_dict() for event in events])
+    """List events one keyset page at a time.
+
+    Query params: limit, cursor (from the previous page's next_cursor),
+    sort, order (asc|desc), include_total=1 to also count all matches,
+    and the filters accepted by build_event_filters.
+    """
+    try:
+        filters = build_event_filters(request.args)
+        events, next_cursor = paginate_events(request.args, filters)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    result = {
+        'events': [event.to_dict() for event in events],
+        'next_cursor': next_cursor
+    }
+    if request.args.get('include_total') == '1':
+        result['total'] = db.session.query(func.count(Event.id)).filter(*filters).scalar()
+    return jsonify(result)
 
 @bp.route('/api/events', methods=['POST'])
 @login_required
@@ -142,41 +282,29 @@ def delete_event(id):
 @bp.route('/api/events/template', methods=['GET'])
 @login_required
 def download_template():
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        'website', 'event_id', 'event_name', 'city', 
-        'event_date', 'event_time', 'todaytix_event_id', 
-        'todaytix_show_id', 'ticketmaster_id', 'venue_name', 'markup',
-        'stock_type', 'in_hand', 'in_hand_date' 
-    ])
-    
-    # Add sample row
-    writer.writerow([
-        'TodayTix', 'EVT_001', 'Sample Event', 'New York', 
-        '2024-01-01', '19:30', '123456', '789', '', 'Sample Theater', '1.6',
-        'ELECTRONIC', 'N', '2025-02-12'
-    ])
-    
-    # Add Ticketmaster sample row
-    writer.writerow([
-        'TicketMaster', 'EVT_002', 'Sample Event 2', 'New York', 
-        '2024-01-01', '19:30', '', '', 'TM123456', 'Sample Theater', '1.6',
-        'ELECTRONIC', 'N', '2025-02-12'
-    ])
-    
-    output.seek(0)
-    return current_app.response_class(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={
-            "Content-Disposition": "attachment;filename=event_template.csv"
-        }
-    )
+    rows = [
+        # TodayTix sample row
+        ['TodayTix', 'EVT_001', 'Sample Event', 'New York',
+         '2024-01-01', '19:30', '123456', '789', '', 'Sample Theater', '1.6',
+         'ELECTRONIC', 'N', '2025-02-12'],
+        # Ticketmaster sample row
+        ['TicketMaster', 'EVT_002', 'Sample Event 2', 'New York',
+         '2024-01-01', '19:30', '', '', 'TM123456', 'Sample Theater', '1.6',
+         'ELECTRONIC', 'N', '2025-02-12'],
+    ]
+    return csv_response(EVENT_CSV_HEADER, rows, 'event_template.csv')
 
 @bp.route('/api/events/import', methods=['POST'])
 @login_required
 def import_events():
+    """Import events from a CSV.
+
+    Form fields: mode ('skip' leaves existing event_ids alone, 'upsert'
+    overwrites them) and background=1 to force a background job. Files
+    over EVENT_IMPORT_BACKGROUND_BYTES always run in the background; the
+    response is then 202 with a job whose progress is at
+    /api/events/import/<job_id>.
+    """
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
     
@@ -186,121 +314,72 @@ def import_events():
     
     if not file.filename.endswith('.csv'):
         return jsonify({'error': 'Only CSV files are allowed'}), 400
+
+    mode = request.form.get('mode', 'skip')
+    if mode not in IMPORT_MODES:
+        return jsonify({'error': f"Invalid mode '{mode}'. Use one of: {', '.join(IMPORT_MODES)}"}), 400
     
+    temp_path = None
+    handed_off = False
     try:
         filename = secure_filename(file.filename)
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{filename}")
         os.makedirs(os.path.dirname(temp_path), exist_ok=True)
         file.save(temp_path)
-        
-        imported_count = 0
-        skipped_count = 0
-        errors = []
-        
-        with open(temp_path, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    # Check if event already exists
-                    existing_event = Event.query.filter_by(event_id=row['event_id'].strip()).first()
-                    if existing_event:
-                        skipped_count += 1
-                        continue
-                        
-                    city_id = get_city_id_by_name(row['city'])
-                    if city_id is None:
-                        errors.append(f"Row {row_num}: Invalid city name '{row['city']}'")
-                        continue
-                    
-                    # Parse dates
-                    in_hand_date = None
-                    if row.get('in_hand_date') and row['in_hand_date'].strip():
-                        try:
-                            in_hand_date = datetime.strptime(row['in_hand_date'].strip(), '%Y-%m-%d').date()
-                        except ValueError:
-                            errors.append(f"Row {row_num}: Invalid in_hand_date format. Use YYYY-MM-DD")
-                            continue
-
-                    # Validate in_hand value
-                    in_hand = row.get('in_hand', '').strip().upper()
-                    if in_hand and in_hand not in ['Y', 'N']:
-                        errors.append(f"Row {row_num}: Invalid in_hand value. Use 'Y' or 'N'")
-                        continue
-
-                    event = Event(
-                        website=row['website'].strip(),
-                        event_id=row['event_id'].strip(),
-                        todaytix_event_id=row['todaytix_event_id'].strip() if row.get('todaytix_event_id') else None,
-                        todaytix_show_id=row['todaytix_show_id'].strip() if row.get('todaytix_show_id') else None,
-                        ticketmaster_id=row['ticketmaster_id'].strip() if row.get('ticketmaster_id') else None,
-                        event_name=row['event_name'].strip(),
-                        city_id=city_id,
-                        event_date=datetime.strptime(row['event_date'].strip(), '%Y-%m-%d').date(),
-                        event_time=row['event_time'].strip(),
-                        venue_name=row['venue_name'].strip() or None,
-                        markup=float(row['markup'].strip()),
-                        stock_type=row['stock_type'].strip() if row.get('stock_type') else None,
-                        in_hand=in_hand or 'N',
-                        in_hand_date=in_hand_date
-                    )
-                    
-                    db.session.add(event)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-                    continue
-            
-            if imported_count > 0:
-                db.session.commit()
-        
-        os.remove(temp_path)
-        
-        response = {
-            'success': True,
-            'imported_count': imported_count,
-            'skipped_count': skipped_count,
-            'errors': errors
-        }
-        
-        if errors:
-            response['status'] = 'partial'
-        else:
-            response['status'] = 'success'
-            
+
+        background = request.form.get('background') == '1' or \
+            os.path.getsize(temp_path) > current_app.config['EVENT_IMPORT_BACKGROUND_BYTES']
+        if background:
+            job = ImportJob(filename=filename, mode=mode)
+            db.session.add(job)
+            db.session.commit()
+            threading.Thread(
+                target=run_import_job,
+                args=(current_app._get_current_object(), job.id, temp_path),
+                daemon=True
+            ).start()
+            handed_off = True
+            return jsonify({'success': True, 'status': 'queued', 'job': job.to_dict()}), 202
+
+        importer = EventImporter(mode=mode, batch_size=current_app.config['EVENT_IMPORT_BATCH_SIZE'])
+        response = {'success': True, **importer.run(temp_path)}
+        response['status'] = 'partial' if importer.error_count else 'success'
         return jsonify(response)
         
     except Exception as e:
-        if 'temp_path' in locals():
-            os.remove(temp_path)
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    finally:
+        # Background jobs remove the file themselves
+        if temp_path and not handed_off and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@bp.route('/api/events/import/<int:job_id>', methods=['GET'])
+@login_required
+def get_import_job(job_id):
+    job = db.session.get(ImportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job.to_dict())
     
 @bp.route('/api/events/export', methods=['GET'])
 @login_required
 def export_events():
-    try:
-        events = Event.query.all()
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write headers
-        writer.writerow([
-            'website', 'event_id', 'event_name', 'city', 
-            'event_date', 'event_time', 'todaytix_event_id', 
-            'todaytix_show_id', 'ticketmaster_id', 'venue_name', 'markup',
-            'stock_type', 'in_hand', 'in_hand_date'
-        ])
-        
-        # Write data
-        for event in events:
-            city_name = get_city_name_by_id(event.city_id)
-            writer.writerow([
+    columns = select(
+        Event.website, Event.event_id, Event.event_name, Event.city_id,
+        Event.event_date, Event.event_time, Event.todaytix_event_id,
+        Event.todaytix_show_id, Event.ticketmaster_id, Event.venue_name, Event.markup,
+        Event.stock_type, Event.in_hand, Event.in_hand_date
+    ).order_by(Event.id)
+
+    def rows():
+        # Plain column tuples fetched in batches: memory stays flat however many events there are
+        for event in db.session.execute(columns.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+            yield [
                 event.website,
                 event.event_id,
                 event.event_name,
-                city_name,
+                get_city_name_by_id(event.city_id),
                 event.event_date.strftime('%Y-%m-%d'),
                 event.event_time,
                 event.todaytix_event_id or '',
@@ -311,22 +390,10 @@ def export_events():
                 event.stock_type or '',
                 event.in_hand or 'N',
                 event.in_hand_date.strftime('%Y-%m-%d') if event.in_hand_date else ''
-            ])
-        
-        output.seek(0)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'events_export_{timestamp}.csv'
-        
-        return current_app.response_class(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/csv; charset=utf-8"
-            }
-        )
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            ]
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return csv_response(EVENT_CSV_HEADER, rows(), f'events_export_{timestamp}.csv')
     
 @bp.route('/api/events/bulk-delete', methods=['POST'])
 @login_required
@@ -340,16 +407,50 @@ def bulk_delete_events():
         if not event_ids:
             return jsonify({'error': 'Empty ID list'}), 400
             
-        # Query all events at once
-        events = Event.query.filter(Event.id.in_(event_ids)).all()
-        
-        # Delete all events
-        for event in events:
-            db.session.delete(event)
-            
-        db.session.commit()
-        return jsonify({'success': True, 'count': len(events)}), 200
+        count = delete_events(Event.id.in_(event_ids))
+        return jsonify({'success': True, 'count': count}), 200
         
     except Exception as e:
-        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/events/delete-past', methods=['POST'])
+@login_required
+def delete_past_events():
+    """Permanently delete events dated before `before` (YYYY-MM-DD, default today)."""
+    try:
+        data = request.get_json(silent=True) or {}
+        before = datetime.strptime(data['before'], '%Y-%m-%d').date() if data.get('before') else date.today()
+        count = delete_events(Event.event_date < before)
+        return jsonify({'success': True, 'count': count, 'before': before.isoformat()}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/events/delete-by-filter', methods=['POST'])
+@login_required
+def delete_filtered_events():
+    """Delete every event matching the same filters GET /api/events accepts."""
+    try:
+        filters = build_event_filters(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not filters:
+        return jsonify({'error': 'At least one filter is required'}), 400
+
+    try:
+        count = delete_events(*filters)
+        return jsonify({'success': True, 'count': count}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/events/archive-past', methods=['POST'])
+@login_required
+def archive_past():
+    try:
+        data = request.get_json(silent=True) or {}
+        retention_days = int(data.get('retention_days', current_app.config['EVENT_RETENTION_DAYS']))
+        counts = archive_past_events(retention_days)
+        return jsonify({'success': True, **counts}), 200
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
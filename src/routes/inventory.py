@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from flask_login import login_required
+from sqlalchemy import select
+from ..models.database import db, ArchivedEvent, Event, Inventory, ScraperRun
+from ..services import price_trend
+
+bp = Blueprint('inventory', __name__)
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+@bp.route('/api/inventory', methods=['GET'])
+@login_required
+def get_inventory():
+    """Current listings, filtered by event_id (as in the output CSV) and optionally section."""
+    event_id = request.args.get('event_id')
+    if not event_id:
+        return jsonify({'error': 'event_id is required'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    query = select(Inventory).where(Inventory.event_id == event_id)
+    if request.args.get('section'):
+        query = query.where(Inventory.section == request.args['section'])
+    query = query.order_by(Inventory.section, Inventory.row, Inventory.inventory_id).limit(limit)
+
+    items = db.session.execute(query).scalars().all()
+    last_run_id = max((item.last_seen_run_id for item in items), default=None)
+    last_run = db.session.get(ScraperRun, last_run_id) if last_run_id else None
+
+    return jsonify({
+        'event_id': event_id,
+        'count': len(items),
+        'items': [item.to_dict() for item in items],
+        'last_run': last_run.to_dict() if last_run else None
+    })
+
+@bp.route('/api/price-history', methods=['GET'])
+@login_required
+def get_price_history():
+    """Price trend for an event (event_id as in the output CSV), optionally one section.
+
+    Query args: days (default 30), bucket ('run', 'hour' or 'day').
+    """
+    event_id = request.args.get('event_id')
+    if not event_id:
+        return jsonify({'error': 'event_id is required'}), 400
+
+    # History outlives the event row; archived events keep their original id
+    event_pk = db.session.execute(select(Event.id).where(Event.event_id == event_id)).scalar()
+    if event_pk is None:
+        event_pk = db.session.execute(
+            select(ArchivedEvent.id).where(ArchivedEvent.event_id == event_id).order_by(ArchivedEvent.id.desc())
+        ).scalar()
+    if event_pk is None:
+        return jsonify({'error': 'Event not found'}), 404
+
+    try:
+        days = int(request.args.get('days', 30))
+        series = price_trend(
+            event_pk,
+            section=request.args.get('section'),
+            since=datetime.now() - timedelta(days=days),
+            bucket=request.args.get('bucket', 'run')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'event_id': event_id, 'section': request.args.get('section'), 'series': series})
@@ -0,0 +1,21 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from ..metrics import metrics
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target. Guarded by METRICS_TOKEN (bearer or ?token=) when one is set."""
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        supplied = request.args.get('token', '')
+        auth = request.headers.get('Authorization', '')
+        if auth.startswith('Bearer '):
+            supplied = auth[len('Bearer '):]
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return jsonify({'error': 'Unauthorized'}), 401
+    # Each gunicorn worker only knows its own samples; without a shared store scrapes would hop between them
+    if request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn') and not metrics.multiprocess_dir:
+        return jsonify({'error': 'Set METRICS_MULTIPROC_DIR to serve /metrics from gunicorn workers'}), 503
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
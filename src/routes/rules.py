@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 
-from src.constants import CITY_URL_MAP
+from sqlalchemy import delete, func, insert, literal, select, update
+
+from src.constants import CITY_URL_MAP, CITY_NAMES_BY_ID
 from ..models.database import db, Event, EventRule
 from flask_login import login_required
 
@@ -47,6 +49,7 @@ def manage_rule(event_id, rule_type):
             keyword=keyword
         )
         db.session.add(rule)
+    Event.mark_changed(Event.id == event_id)
         
     try:
         db.session.commit()
@@ -65,6 +68,7 @@ def delete_rule(event_id, rule_type):
     if rule:
         try:
             db.session.delete(rule)
+            Event.mark_changed(Event.id == event_id)
             db.session.commit()
             return jsonify({'success': True})
         except Exception as e:
@@ -73,35 +77,65 @@ def delete_rule(event_id, rule_type):
     
     return jsonify({'error': 'Rule not found'}), 404
 
+def event_group_filter(event_name, city_id, venue_name):
+    """Conditions selecting every event in one (event_name, city_id, venue_name) group."""
+    venue_condition = Event.venue_name.is_(None) if venue_name is None else Event.venue_name == venue_name
+    return [Event.event_name == event_name, Event.city_id == city_id, venue_condition]
+
+def upsert_group_rules(conditions, keywords):
+    """Set rule_type -> keyword on every event matching `conditions`.
+
+    Two set-based statements per rule type: update the rules that exist,
+    then insert the missing ones from a SELECT over the matching events.
+    The events are marked changed so cached listings aren't reused.
+    """
+    Event.mark_changed(*conditions)
+    event_ids = select(Event.id).where(*conditions)
+    for rule_type, keyword in keywords.items():
+        db.session.execute(
+            update(EventRule)
+            .where(EventRule.rule_type == rule_type, EventRule.event_id.in_(event_ids))
+            .values(keyword=keyword)
+            .execution_options(synchronize_session=False)
+        )
+        has_rule = select(EventRule.id).where(EventRule.event_id == Event.id, EventRule.rule_type == rule_type)
+        db.session.execute(
+            insert(EventRule).from_select(
+                ['event_id', 'rule_type', 'keyword'],
+                select(Event.id, literal(rule_type), literal(keyword)).where(*conditions, ~has_rule.exists())
+            )
+        )
+
 @rules_bp.route('/mappings')
 @login_required
 def mappings_list():
-    # Get unique events with their rules
-    events = db.session.query(Event)\
-        .group_by(Event.event_name, Event.city_id, Event.venue_name)\
-        .all()
-    
-    # Get rules for each unique event combination
+    group_columns = (Event.event_name, Event.city_id, Event.venue_name)
+
+    # One row per unique event combination
+    groups = db.session.execute(
+        select(*group_columns, func.min(Event.id).label('event_id'), func.count(Event.id).label('event_count'))
+        .group_by(*group_columns)
+        .order_by(*group_columns)
+    ).all()
+
+    # Rule summaries for every combination in a single grouped join
+    rule_rows = db.session.execute(
+        select(*group_columns, EventRule.rule_type, EventRule.keyword,
+               func.min(EventRule.id).label('rule_id'), func.count(EventRule.id).label('rule_count'))
+        .join(Event, EventRule.event_id == Event.id)
+        .group_by(*group_columns, EventRule.rule_type, EventRule.keyword)
+    ).all()
+
     rule_groups = {}
-    for event in events:
-        similar_events = Event.query.filter_by(
-            event_name=event.event_name,
-            city_id=event.city_id,
-            venue_name=event.venue_name
-        ).all()
-        
-        # Collect all rules from similar events
-        all_rules = []
-        for similar_event in similar_events:
-            all_rules.extend(similar_event.rules)
-            
-        key = (event.event_name, event.city_id, event.venue_name)
-        rule_groups[key] = all_rules
+    for row in rule_rows:
+        key = (row.event_name, row.city_id, row.venue_name)
+        rule_groups.setdefault(key, {}).setdefault(row.rule_type, []).append(row)
 
     return render_template('mappings.html', 
-                         events=events,
+                         groups=groups,
                          rule_groups=rule_groups,
                          cities=CITY_URL_MAP,
+                         city_names=CITY_NAMES_BY_ID,
                          rule_types=VALID_RULE_TYPES)
 
 @rules_bp.route('/mappings/new', methods=['GET', 'POST'])
@@ -109,49 +143,40 @@ def mappings_list():
 def new_mapping():
     if request.method == 'POST':
         try:
-            # Get all matching events
-            matching_events = Event.query.filter_by(
-                event_name=request.form['event_name'].strip(),
-                city_id=int(request.form['city_id']),
-                venue_name=request.form['venue_name'].strip() or None
-            ).all()
+            conditions = event_group_filter(
+                request.form['event_name'].strip(),
+                int(request.form['city_id']),
+                request.form['venue_name'].strip() or None
+            )
+            matching_count = db.session.execute(select(func.count(Event.id)).where(*conditions)).scalar()
             
-            if not matching_events:
+            if not matching_count:
                 flash('No matching events found', 'error')
                 return redirect(url_for('rules.mappings_list'))
             
-            # Process rules for all matching events
+            # Apply the rules to all matching events
             form_data = request.form.to_dict()
-            for event in matching_events:
-                for rule_type in VALID_RULE_TYPES:
-                    keyword = form_data.get(f'rules[{rule_type}]', '').strip()
-                    if keyword:
-                        # Find existing rule or create new one
-                        rule = EventRule.query.filter_by(
-                            event_id=event.id,
-                            rule_type=rule_type
-                        ).first()
-                        
-                        if rule:
-                            rule.keyword = keyword
-                        else:
-                            rule = EventRule(
-                                event_id=event.id,
-                                rule_type=rule_type,
-                                keyword=keyword
-                            )
-                            db.session.add(rule)
+            keywords = {}
+            for rule_type in VALID_RULE_TYPES:
+                keyword = form_data.get(f'rules[{rule_type}]', '').strip()
+                if keyword:
+                    keywords[rule_type] = keyword
+            upsert_group_rules(conditions, keywords)
             
             db.session.commit()
-            flash(f'Rules updated for {len(matching_events)} events', 'success')
+            flash(f'Rules updated for {matching_count} events', 'success')
             return redirect(url_for('rules.mappings_list'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating mappings: {str(e)}', 'error')
             
-    events = Event.query.distinct(Event.event_name, Event.city_id, Event.venue_name).all()
+    event_names = db.session.execute(select(Event.event_name).distinct().order_by(Event.event_name)).scalars().all()
+    venue_names = db.session.execute(
+        select(Event.venue_name).where(Event.venue_name.isnot(None)).distinct().order_by(Event.venue_name)
+    ).scalars().all()
     return render_template('mapping_form.html', 
-                         events=events,
+                         event_names=event_names,
+                         venue_names=venue_names,
                          cities=CITY_URL_MAP,
                          rule_types=VALID_RULE_TYPES)
 
@@ -160,21 +185,16 @@ def new_mapping():
 def delete_mapping(id):
     rule = EventRule.query.get_or_404(id)
     try:
-        # Get all matching events
-        matching_events = Event.query.filter_by(
-            event_name=rule.event.event_name,
-            city_id=rule.event.city_id,
-            venue_name=rule.event.venue_name
-        ).all()
-        
-        # Delete rules for all matching events
-        for event in matching_events:
-            matching_rule = EventRule.query.filter_by(
-                event_id=event.id,
-                rule_type=rule.rule_type
-            ).first()
-            if matching_rule:
-                db.session.delete(matching_rule)
+        # Delete this rule type from every event in the same group
+        event = rule.event
+        conditions = event_group_filter(event.event_name, event.city_id, event.venue_name)
+        event_ids = select(Event.id).where(*conditions)
+        db.session.execute(
+            delete(EventRule)
+            .where(EventRule.rule_type == rule.rule_type, EventRule.event_id.in_(event_ids))
+            .execution_options(synchronize_session=False)
+        )
+        Event.mark_changed(*conditions)
                 
         db.session.commit()
         flash('Rule mapping deleted successfully', 'success')
@@ -211,6 +231,7 @@ def copy_rules():
                 keyword=rule.keyword
             )
             db.session.add(new_rule)
+        Event.mark_changed(Event.id == target_event.id)
             
         db.session.commit()
         flash('Rules copied successfully', 'success')
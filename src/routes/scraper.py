@@ -1,17 +1,16 @@
 import os
-from flask import Blueprint, jsonify, render_template, request, current_app
+from flask import Blueprint, Response, jsonify, render_template, request, current_app
 from datetime import datetime, timedelta
 
 from flask_login import login_required
 from src.scraper.scheduler import scheduler, ScraperScheduler
-from src.ticketmaster.api import TicketmasterAPI
-from ..todaytix.api import TodayTixAPI
-from ..scraper.scraper import EventScraper
-from ..models.database import Event, ScraperJob, db
+from ..models.database import Event, RunEventRequests, ScraperJob, ScraperRun, db
+from sqlalchemy import func, select
+from ..progress import progress
+from ..clients import get_clients
 from pathlib import Path
 from werkzeug.utils import secure_filename
 from flask import send_file
-from ..services import UploadService  
 
 bp = Blueprint('scraper', __name__)
 
@@ -67,101 +66,14 @@ def start_scrape():
         
         db.session.commit()
 
-        job_id = job.id
-        app = current_app._get_current_object() 
-        output_dir = current_app.config['OUTPUT_FILE_DIR']
-
-        def run_scraper(app, job_id, output_dir, interval_minutes):
-            with app.app_context():
-                try:
-                    job = ScraperJob.query.get(job_id)
-                    if not job or job.status != 'running':
-                        return
-
-                    app.logger.info(f"Job {job_id} settings - auto_upload: {job.auto_upload}, concurrent_requests: {job.concurrent_requests}")
-
-                    todaytix_api = TodayTixAPI()
-                    ticketmaster_api = TicketmasterAPI()
-                    scraper = EventScraper(
-                        todaytix_api=todaytix_api, 
-                        ticketmaster_api=ticketmaster_api,
-                        output_dir=output_dir,
-                        concurrent_requests=job.concurrent_requests,
-                        auto_upload=job.auto_upload  
-                    )
-
-                    app.logger.info(f"Scraper settings - auto_upload: {scraper.auto_upload}, max_concurrent: {scraper.max_concurrent}")
-
-                    success, output_file = scraper.run(job)
-
-                    app.logger.info(f"Scraper run completed - success: {success}, output_file: {output_file}, auto_upload setting: {scraper.auto_upload}")
-
-                    job = ScraperJob.query.get(job_id)
-                    if not job or job.status == 'stopped':
-                        return
-
-                    if success and output_file:
-                        app.logger.info(f"Checking auto_upload setting for job {job_id}: {job.auto_upload}")
-
-                        if job.auto_upload:
-                            app.logger.info(f"Starting file upload for job {job_id}")
-                            try:
-                                upload_service = UploadService(
-                                    api_base_url=app.config['STORE_API_BASE_URL'],
-                                    api_key=app.config['STORE_API_KEY'],
-                                    company_id=app.config['COMPANY_ID']
-                                )
-                                upload_success, message = upload_service.upload_csv(output_file)
-
-                                if upload_success:
-                                    app.logger.info(f"Scheduled job {job_id}: File uploaded successfully")
-                                else:
-                                    app.logger.error(f"Scheduled job {job_id}: File upload failed - {message}")
-                            except Exception as e:
-                                app.logger.error(f"Scheduled job {job_id}: Upload error - {str(e)}")
-                        else:
-                            app.logger.info(f"Auto upload disabled for job {job_id}, skipping upload")
-
-                        job.status = 'completed'
-                        job.last_run = datetime.now()
-                        job.next_run = job.last_run + timedelta(minutes=interval_minutes)
-
-                        if job.status != 'stopped':
-                            scheduler.add_job(
-                                func=ScraperScheduler.start_scraper,
-                                trigger='date',
-                                run_date=job.next_run,
-                                args=[job_id, app],
-                                id=f'scraper_{job_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
-                            )
-
-                            cleanup_job_id = f'cleanup_{job_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
-                            scheduler.add_job(
-                                func=cleanup_old_files,
-                                trigger='date',
-                                run_date=datetime.now() + timedelta(hours=24),
-                                id=cleanup_job_id
-                            )
-                    else:
-                        job.status = 'error'
-                        job.next_run = None
-
-                    db.session.commit()
-                except Exception as e:
-                    app.logger.error(f"Error in scraper thread: {str(e)}")
-                    job = ScraperJob.query.get(job_id)
-                    if job:
-                        job.status = 'error'
-                        job.next_run = None
-                        db.session.commit()
-
-        import threading
-        thread = threading.Thread(
-            target=run_scraper,
-            args=(app, job_id, output_dir, interval_minutes)
+        app = current_app._get_current_object()
+        ScraperScheduler.schedule(
+            job,
+            app,
+            jitter_seconds=data.get('jitter_seconds'),
+            overrun_policy=data.get('overrun_policy')
         )
-        thread.daemon = True
-        thread.start()
+        schedule_cleanup(app)
 
         return jsonify({
             "status": "success",
@@ -181,21 +93,31 @@ def start_scrape():
 
 def stop_all_running_jobs():
     """Helper function to stop all running jobs and clean up"""
-    # Stop all running scraper jobs
-    running_jobs = ScraperJob.query.filter(ScraperJob.status.in_(['running', 'completed'])).all()
-    for job in running_jobs:
+    # Stop all running or scheduled scraper jobs
+    active_jobs = ScraperJob.query.filter(ScraperJob.status.in_(['running', 'completed', 'error'])).all()
+    for job in active_jobs:
         job.status = 'stopped'
         job.next_run = None
-        
-        # Remove all scheduled jobs for this job_id
-        jobs = scheduler.get_jobs()
-        for scheduled_job in jobs:
-            if scheduled_job.id.startswith(f'scraper_{job.id}_'):
-                scheduler.remove_job(scheduled_job.id)
-            elif scheduled_job.id.startswith(f'cleanup_{job.id}_'):
-                scheduler.remove_job(scheduled_job.id)
+        ScraperScheduler.unschedule(job.id)
     
     db.session.commit()
+    for job in active_jobs:
+        ScraperScheduler.publish_status(job)
+
+def schedule_cleanup(app):
+    """Register the recurring cleanup of old output files."""
+    def run_cleanup():
+        with app.app_context():
+            cleanup_old_files()
+
+    scheduler.add_job(
+        id='cleanup_output_files',
+        func=run_cleanup,
+        trigger='interval',
+        hours=1,
+        max_instances=1,
+        replace_existing=True
+    )
 
 @bp.route('/api/scrape/stop', methods=['POST'])
 @login_required
@@ -213,6 +135,75 @@ def stop_scrape():
             "message": str(e)
         }), 500
 
+@bp.route('/api/scrape/stream')
+@login_required
+def stream_progress():
+    """Server-Sent Events feed of live scraper progress, served from memory."""
+    return Response(
+        progress.stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/api/scrape/clients')
+@login_required
+def client_stats():
+    """Connection reuse of the shared TodayTix / Ticketmaster clients in this process."""
+    return jsonify(get_clients().stats())
+
+@bp.route('/api/scrape/requests')
+@login_required
+def request_usage():
+    """Upstream requests made today against the budgets, the last run's breakdown and the costliest events."""
+    try:
+        days = request.args.get('days', 7, type=int)
+        limit = request.args.get('limit', 20, type=int)
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        used_today = db.session.execute(
+            select(func.coalesce(func.sum(ScraperRun.requests_made), 0)).where(ScraperRun.started_at >= midnight)
+        ).scalar()
+        last_run = ScraperRun.query.filter(ScraperRun.request_stats.isnot(None)).order_by(ScraperRun.id.desc()).first()
+
+        costliest = db.session.execute(
+            select(RunEventRequests.event_id,
+                   func.avg(RunEventRequests.requests).label('avg_requests'),
+                   func.sum(RunEventRequests.requests).label('requests'),
+                   func.sum(RunEventRequests.bytes).label('bytes'),
+                   func.count().label('runs'))
+            .join(ScraperRun, ScraperRun.id == RunEventRequests.run_id)
+            .where(ScraperRun.started_at >= datetime.now() - timedelta(days=days))
+            .group_by(RunEventRequests.event_id)
+            .order_by(func.sum(RunEventRequests.requests).desc())
+            .limit(limit)
+        ).all()
+        names = dict(db.session.execute(
+            select(Event.id, Event.event_name).where(Event.id.in_([row.event_id for row in costliest]))
+        ).all())
+
+        return jsonify({
+            'today': {
+                'requests': used_today,
+                'daily_budget': current_app.config['SCRAPER_DAILY_REQUEST_BUDGET'] or None,
+                'run_budget': current_app.config['SCRAPER_RUN_REQUEST_BUDGET'] or None
+            },
+            'last_run': {
+                'id': last_run.id,
+                'started_at': last_run.started_at.isoformat(),
+                'requests_made': last_run.requests_made,
+                'request_stats': last_run.to_dict()['request_stats']
+            } if last_run else None,
+            'costliest_events': [{
+                'event_id': row.event_id,
+                'event_name': names.get(row.event_id),
+                'avg_requests': round(row.avg_requests, 2),
+                'requests': row.requests,
+                'bytes': row.bytes,
+                'runs': row.runs
+            } for row in costliest]
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @bp.route('/api/scrape/status')
 @login_required
 def get_status():
@@ -223,6 +214,7 @@ def get_status():
         if job:
             return jsonify({
                 "status": job.status,
+                "scheduled": ScraperScheduler.is_scheduled(job.id),
                 "last_run": job.last_run.isoformat() if job.last_run else None,
                 "next_run": job.next_run.isoformat() if job.next_run else None,
                 "events_processed": job.events_processed,
@@ -234,6 +226,7 @@ def get_status():
         else:
             return jsonify({
                 "status": "stopped",
+                "scheduled": False,
                 "last_run": None,
                 "next_run": None,
                 "events_processed": 0,
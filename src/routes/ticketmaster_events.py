@@ -1,9 +1,8 @@
 from datetime import datetime
 from flask import Blueprint, jsonify, render_template, request, current_app
 from flask_login import login_required
-import csv
-from io import StringIO
-from ..ticketmaster.api import TicketmasterAPI
+from ..csv_utils import csv_response
+from ..clients import get_clients
 
 bp = Blueprint('ticketmaster_events', __name__)
 
@@ -28,7 +27,7 @@ def search_events():
                 'message': 'All fields are required'
             }), 400
 
-        api = TicketmasterAPI()
+        api = get_clients().ticketmaster()
         events = api.search_events(
             event_name=event_name,
             location=city,
@@ -42,35 +41,23 @@ def search_events():
                 'message': f'No events found for "{event_name}" in {city}'
             }), 404
 
-        # Generate CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
+        # Stream the CSV
+        header = [
             'website', 'event_id', 'ticketmaster_event_id', 'event_name', 'city', 
             'event_date', 'event_time', 'venue_name', 'markup'
-        ])
-        
-        for event in events:
-            writer.writerow([
-                event['website'],
-                event['event_id'],
-                event['ticketmaster_event_id'],
-                event['event_name'],
-                event['city'],
-                event['event_date'],
-                event['event_time'],
-                event['venue_name'],
-                event['markup']
-            ])
-
-        output.seek(0)
-        return current_app.response_class(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": f"attachment;filename=ticketmaster_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
+        ]
+        rows = ([
+            event['website'],
+            event['event_id'],
+            event['ticketmaster_event_id'],
+            event['event_name'],
+            event['city'],
+            event['event_date'],
+            event['event_time'],
+            event['venue_name'],
+            event['markup']
+        ] for event in events)
+        return csv_response(header, rows, f"ticketmaster_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
         
     except Exception as e:
         current_app.logger.error(f"Error searching events: {str(e)}")
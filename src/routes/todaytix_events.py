@@ -1,9 +1,8 @@
 from datetime import datetime
 from flask import Blueprint, jsonify, render_template, request, current_app
 from flask_login import login_required
-import csv
-from io import StringIO
-from ..todaytix.api import TodayTixAPI
+from ..csv_utils import csv_response
+from ..clients import get_clients
 from ..constants import CITY_URL_MAP
 
 bp = Blueprint('todaytix_events', __name__)
@@ -29,7 +28,7 @@ def search_events():
                 'message': 'All fields are required'
             }), 400
 
-        api = TodayTixAPI()
+        api = get_clients().todaytix()
         event = api.search_event(event_name, city_id)
         if not event:
             return jsonify({
@@ -65,36 +64,24 @@ def search_events():
                 'message': 'No showtimes found in the specified date range'
             }), 404
 
-        # Generate CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
+        # Stream the CSV
+        header = [
             'website', 'event_id', 'todaytix_event_id', 'event_name', 'city', 
             'event_date', 'event_time', 'todaytix_show_id', 'venue_name', 'markup'
-        ])
-        
-        for show in filtered_showtimes:
-            writer.writerow([
-                show['website'],
-                show['event_id'],
-                show['todaytix_event_id'],
-                show['event_name'],
-                show['city'],
-                show['event_date'],
-                show['event_time'],
-                show['todaytix_show_id'],
-                show['venue_name'],
-                show['markup']
-            ])
-
-        output.seek(0)
-        return current_app.response_class(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": f"attachment;filename=todaytix_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
+        ]
+        rows = ([
+            show['website'],
+            show['event_id'],
+            show['todaytix_event_id'],
+            show['event_name'],
+            show['city'],
+            show['event_date'],
+            show['event_time'],
+            show['todaytix_show_id'],
+            show['venue_name'],
+            show['markup']
+        ] for show in filtered_showtimes)
+        return csv_response(header, rows, f"todaytix_events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
         
     except Exception as e:
         current_app.logger.error(f"Error searching events: {str(e)}")
@@ -1,42 +1,19 @@
 from flask import Blueprint, jsonify, render_template, request, current_app
 import os
-import pandas as pd
+import uuid
 from flask_login import login_required
-from ..services import UploadService
+from ..services import get_upload_service
 
 bp = Blueprint('upload', __name__)
 
-def get_upload_service():
-    return UploadService(
-        current_app.config['STORE_API_BASE_URL'],
-        current_app.config['STORE_API_KEY'],
-        current_app.config['COMPANY_ID']
-    )
+# The upload service picks the reader from the temp file's extension
+ALLOWED_UPLOAD_EXTENSIONS = ('.csv', '.xlsx', '.xls')
 
 def process_file_to_utf8(file_path: str) -> str:
     """Process file to UTF-8 CSV regardless of input format."""
     try:
-        if file_path.endswith(('.xlsx', '.xls')):
-            # Read Excel file
-            df = pd.read_excel(file_path)
-        else:
-            # Try reading CSV with different encodings
-            encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-            df = None
-            
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-                    
-            if df is None:
-                raise ValueError("Could not read file with any supported encoding")
-
-        # Save as UTF-8 CSV
         utf8_path = f"{os.path.splitext(file_path)[0]}_utf8.csv"
-        df.to_csv(utf8_path, index=False, encoding='utf-8')
+        get_upload_service().write_utf8_csv(file_path, utf8_path)
         return utf8_path
     except Exception as e:
         raise ValueError(f"Error processing file: {str(e)}")
@@ -58,14 +35,17 @@ def manual_upload():
             }), 400
 
         file = request.files['file']
-        if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        if extension not in ALLOWED_UPLOAD_EXTENSIONS:
             return jsonify({
                 "status": "error",
                 "message": "Invalid file format"
             }), 400
 
-        # Save file temporarily
-        temp_path = os.path.join(current_app.config['OUTPUT_FILE_DIR'], file.filename)
+        # Save file temporarily under a generated name; secure_filename() can drop the
+        # extension of non-ASCII names. FileStorage.save streams it to disk in chunks.
+        os.makedirs(current_app.config['OUTPUT_FILE_DIR'], exist_ok=True)
+        temp_path = os.path.join(current_app.config['OUTPUT_FILE_DIR'], f"{uuid.uuid4().hex}{extension}")
         file.save(temp_path)
 
         # Upload file
@@ -1,6 +1,11 @@
+from datetime import datetime
 from flask import Blueprint, jsonify, request, render_template
 from flask_login import login_required
+from sqlalchemy import select
+import io
+from ..csv_utils import csv_response
 from ..models.database import db, VenueMapping, Event
+from ..services import VenueMappingImporter, VENUE_MAPPING_CSV_HEADER, VENUE_MAPPING_IMPORT_MODES
 
 bp = Blueprint('mappings', __name__)
 
@@ -67,7 +72,9 @@ def create_mapping():
         )
         
         db.session.add(mapping)
+        VenueMapping.mark_events_changed([(mapping.event_name, mapping.venue_name)])
         db.session.commit()
+        VenueMapping.invalidate_excluded_seats_cache()
         
         return jsonify(mapping.to_dict()), 201
         
@@ -80,6 +87,8 @@ def update_mapping(id):
     try:
         mapping = VenueMapping.query.get_or_404(id)
         data = request.json
+        # The events the mapping applied to until now, as well as those it applies to after the edit
+        affected = [(mapping.event_name, mapping.venue_name)]
         
         if 'event_name' in data:
             mapping.event_name = data['event_name']
@@ -96,8 +105,11 @@ def update_mapping(id):
             mapping.seats = ','.join(seats)
         if 'active' in data:
             mapping.active = data['active']
+        affected.append((mapping.event_name, mapping.venue_name))
+        VenueMapping.mark_events_changed(affected)
             
         db.session.commit()
+        VenueMapping.invalidate_excluded_seats_cache()
         return jsonify(mapping.to_dict())
         
     except Exception as e:
@@ -109,7 +121,9 @@ def delete_mapping(id):
     try:
         mapping = VenueMapping.query.get_or_404(id)
         db.session.delete(mapping)
+        VenueMapping.mark_events_changed([(mapping.event_name, mapping.venue_name)])
         db.session.commit()
+        VenueMapping.invalidate_excluded_seats_cache()
         return '', 204
         
     except Exception as e:
@@ -123,10 +137,57 @@ def bulk_delete_mappings():
         if not data or 'ids' not in data:
             return jsonify({'error': 'No mapping IDs provided'}), 400
             
+        VenueMapping.mark_events_changed(db.session.execute(
+            select(VenueMapping.event_name, VenueMapping.venue_name).where(VenueMapping.id.in_(data['ids']))
+        ).tuples().all())
         VenueMapping.query.filter(VenueMapping.id.in_(data['ids'])).delete(synchronize_session=False)
         db.session.commit()
+        VenueMapping.invalidate_excluded_seats_cache()
         
         return jsonify({'success': True})
         
     except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/venue-mappings/export', methods=['GET'])
+@login_required
+def export_mappings():
+    query = select(
+        VenueMapping.event_name, VenueMapping.venue_name, VenueMapping.section,
+        VenueMapping.row, VenueMapping.seats, VenueMapping.active
+    ).order_by(VenueMapping.event_name, VenueMapping.venue_name, VenueMapping.section, VenueMapping.row)
+
+    def rows():
+        for mapping in db.session.execute(query.execution_options(yield_per=1000)):
+            yield [mapping.event_name, mapping.venue_name, mapping.section, mapping.row,
+                   mapping.seats, 'Y' if mapping.active else 'N']
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return csv_response(VENUE_MAPPING_CSV_HEADER, rows(), f'venue_mappings_{timestamp}.csv')
+
+@bp.route('/api/venue-mappings/import', methods=['POST'])
+@login_required
+def import_mappings():
+    """Import a CSV of event_name, venue_name, section, row, seats[, active].
+
+    mode=merge (default) adds the seats to an existing mapping for the same
+    section and row; mode=replace overwrites them.
+    """
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    if not file.filename.endswith('.csv'):
+        return jsonify({'error': 'Only CSV files are allowed'}), 400
+
+    mode = request.form.get('mode', 'merge')
+    if mode not in VENUE_MAPPING_IMPORT_MODES:
+        return jsonify({'error': f"Invalid mode '{mode}'. Use one of: {', '.join(VENUE_MAPPING_IMPORT_MODES)}"}), 400
+
+    try:
+        importer = VenueMappingImporter(mode=mode)
+        result = importer.run(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+        result['status'] = 'partial' if importer.error_count else 'success'
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
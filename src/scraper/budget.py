@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from ..models.database import db, RunEventRequests, ScraperRun
+from .priority import RefreshPolicy
+
+# How far back an event's request history is averaged, and what an event without one is assumed to cost
+COST_LOOKBACK_DAYS = 7
+DEFAULT_EVENT_COST = 1.0
+
+def request_allowance(run_limit: int, daily_limit: int) -> Optional[int]:
+    """Requests the next run may make under the per-run and per-day budgets (0 = no budget), or None."""
+    limits = []
+    if run_limit:
+        limits.append(run_limit)
+    if daily_limit:
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        used = db.session.execute(
+            select(func.coalesce(func.sum(ScraperRun.requests_made), 0)).where(ScraperRun.started_at >= midnight)
+        ).scalar()
+        limits.append(max(daily_limit - used, 0))
+    return min(limits) if limits else None
+
+def expected_costs(event_ids: List[int]) -> Dict[int, float]:
+    """Average requests per scrape of each event over the last COST_LOOKBACK_DAYS."""
+    since = datetime.now() - timedelta(days=COST_LOOKBACK_DAYS)
+    rows = db.session.execute(
+        select(RunEventRequests.event_id, func.avg(RunEventRequests.requests))
+        .join(ScraperRun, ScraperRun.id == RunEventRequests.run_id)
+        .where(RunEventRequests.event_id.in_(event_ids), ScraperRun.started_at >= since)
+        .group_by(RunEventRequests.event_id)
+    ).all()
+    return {event_id: float(cost) for event_id, cost in rows}
+
+def plan_within_budget(events: List, refresh_states: Dict, policy: RefreshPolicy, costs: Dict[int, float],
+                       allowance: int, now: datetime) -> Tuple[List, List]:
+    """Split due events into those scraped this run and those deferred to stay within `allowance`.
+
+    Events are taken by value per expected request, so cheap, valuable
+    events go first and expensive, low-value ones (big venues paging
+    through Ticketmaster, say) are the first to wait. An event too costly
+    for what is left doesn't stop cheaper ones behind it. `now` is UTC.
+    """
+    def cost(event) -> float:
+        return max(costs.get(event.id, DEFAULT_EVENT_COST), DEFAULT_EVENT_COST)
+
+    ranked = sorted(events, key=lambda event: policy.value(refresh_states.get(event.id), event, now) / cost(event),
+                    reverse=True)
+    scheduled, deferred = [], []
+    spent = 0.0
+    for event in ranked:
+        if spent + cost(event) <= allowance:
+            scheduled.append(event)
+            spent += cost(event)
+        else:
+            deferred.append(event)
+    return scheduled, deferred
@@ -0,0 +1,126 @@
+import logging
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from ..models.database import db, SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """DB-backed lease electing one process out of many for a role.
+
+    The holder renews well inside the TTL; any other process takes over
+    once the lease has expired. Acquire and renew are one conditional
+    UPDATE, so two processes can never both succeed. Expiry is compared
+    with each process's local clock, so hosts sharing the database need
+    synchronised clocks.
+
+    A renewal that fails (the database busy or unreachable) doesn't end
+    leadership: nobody else can take the lease before the expiry of our
+    last successful renewal, so the holder stays leader until then.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+        self.expires_at = None  # Expiry set by our last successful renewal
+        self.resumed = False  # The last acquire took over a lease this process held before
+
+    @contextmanager
+    def _connect(self, ttl_seconds: float):
+        """A connection of its own whose SQLite lock waits are capped at a quarter of the TTL.
+
+        Otherwise the app's busy_timeout (as long as the TTL itself) could
+        keep a renewal waiting until the lease had run out.
+        """
+        with db.engine.connect() as connection:
+            if connection.dialect.name != 'sqlite':
+                yield connection
+                return
+            previous = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+            connection.exec_driver_sql(f'PRAGMA busy_timeout={int(min(previous, ttl_seconds * 1000 / 4))}')
+            try:
+                yield connection
+            finally:
+                connection.rollback()
+                connection.exec_driver_sql(f'PRAGMA busy_timeout={int(previous)}')
+
+    def heartbeat(self, ttl_seconds: float) -> bool:
+        """Acquire the lease if it is free or expired, renew it if held. Must run in an app context."""
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            with self._connect(ttl_seconds) as connection:
+                previous_holder = connection.execute(
+                    select(SchedulerLease.holder).where(SchedulerLease.name == self.name)
+                ).scalar()
+                result = connection.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name,
+                           or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now))
+                    .values(
+                        holder=self.holder,
+                        acquired_at=case((SchedulerLease.holder == self.holder, SchedulerLease.acquired_at), else_=now),
+                        renewed_at=now,
+                        expires_at=expires_at
+                    )
+                )
+                acquired = result.rowcount == 1
+                if not acquired and previous_holder is None:
+                    connection.execute(insert(SchedulerLease).values(
+                        name=self.name, holder=self.holder, acquired_at=now, renewed_at=now, expires_at=expires_at
+                    ))
+                    acquired = True
+                connection.commit()
+            if acquired:
+                if not self.is_leader:
+                    self.resumed = previous_holder == self.holder
+                self.expires_at = expires_at
+        except IntegrityError:
+            # Another process created the lease first
+            acquired = False
+        except Exception as e:
+            # Still ours until the last renewal runs out; nobody else can hold it before then
+            acquired = self.is_leader and self.expires_at is not None and datetime.now() < self.expires_at
+            held = f"still held until {self.expires_at:%H:%M:%S}" if acquired else "not held"
+            logger.error(f"Error renewing lease '{self.name}' ({held}): {str(e)}")
+
+        if acquired != self.is_leader:
+            logger.info(f"{'Acquired' if acquired else 'Lost'} lease '{self.name}' as {self.holder}"
+                        f"{' (resumed)' if acquired and self.resumed else ''}")
+        self.is_leader = acquired
+        return acquired
+
+    def holds(self) -> bool:
+        """Whether the lease is ours right now, by the expiry of our last successful renewal."""
+        return self.is_leader and self.expires_at is not None and datetime.now() < self.expires_at
+
+    def release(self):
+        """Give the lease up so another process can take over without waiting for expiry."""
+        if not self.is_leader:
+            return
+        try:
+            db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error releasing lease '{self.name}': {str(e)}")
+        self.is_leader = False
+        self.expires_at = None
+
+    def current(self):
+        """The lease row as a dict, or None if nobody has held it yet."""
+        lease = db.session.get(SchedulerLease, self.name)
+        return lease.to_dict() if lease else None
+
+scheduler_lease = LeaderLease('scheduler')
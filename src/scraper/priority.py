@@ -0,0 +1,112 @@
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import select
+from ..models.database import db, EventRefreshState
+
+# (max days until the show, multiple of the base interval between refreshes)
+DEFAULT_DISTANCE_TIERS = [
+    (1, 1),
+    (7, 2),
+    (30, 4),
+]
+FAR_FUTURE_MULTIPLIER = 8
+# Budget value of an event with nothing on record, above any event that has listings
+NO_LISTINGS_VALUE = 1000.0
+# Events whose cached rows are read per query
+CACHED_ROWS_BATCH_SIZE = 500
+
+class RefreshPolicy:
+    """Decides how often each event is re-scraped.
+
+    The cadence is a multiple of the job's base interval picked from how far
+    away the show is, then pulled back toward every tick in proportion to the
+    event's observed volatility (an exponentially weighted rate of listing
+    changes between runs, from 0 to 1).
+    """
+
+    def __init__(self, base_minutes: int, tiers=None, far_multiplier: int = FAR_FUTURE_MULTIPLIER,
+                 volatility_alpha: float = 0.3):
+        self.base = timedelta(minutes=base_minutes)
+        self.tiers = tiers or DEFAULT_DISTANCE_TIERS
+        self.far_multiplier = far_multiplier
+        self.volatility_alpha = volatility_alpha
+
+    def distance_multiplier(self, event_date: date, today: date) -> int:
+        days_out = (event_date - today).days
+        for max_days, multiplier in self.tiers:
+            if days_out <= max_days:
+                return multiplier
+        return self.far_multiplier
+
+    def cadence(self, event_date: date, volatility: float, today: date) -> timedelta:
+        multiplier = self.distance_multiplier(event_date, today)
+        volatility = min(max(volatility, 0.0), 1.0)
+        multiplier = max(1.0, multiplier * (1 - volatility) + volatility)
+        return self.base * multiplier
+
+    def is_due(self, state, event, now: datetime) -> bool:
+        """An event is due if it was never scraped, was edited since, or its cadence has elapsed.
+
+        Half a tick of slack keeps an event from waiting a whole extra
+        interval because it came due a few seconds after a tick.
+        """
+        if state is None or state.next_due_at is None or state.last_scraped_at is None:
+            return True
+        if event.updated_at and event.updated_at > state.last_scraped_at:
+            return True
+        return state.next_due_at <= now + self.base / 2
+
+    def value(self, state, event, now: datetime) -> float:
+        """Worth of scraping `event` now, relative to other events, for spending a request budget.
+
+        Events with no listings on record come first. Otherwise nearer and
+        more volatile shows are worth more, and the value grows the further
+        past its cadence an event gets, so deferred events aren't starved.
+        `now` is UTC.
+        """
+        # record() sets the signature along with rows_json, which is deferred and not loaded here
+        if state is None or state.last_signature is None or state.last_scraped_at is None:
+            return NO_LISTINGS_VALUE
+        volatility = min(max(state.volatility or 0.0, 0.0), 1.0)
+        cadence = self.cadence(event.event_date, volatility, date.today())
+        overdue = max((now - state.last_scraped_at) / cadence, 1.0)
+        return (0.1 + volatility) / self.distance_multiplier(event.event_date, date.today()) * overdue
+
+    def update_volatility(self, previous: float, changed: bool) -> float:
+        return self.volatility_alpha * (1.0 if changed else 0.0) + (1 - self.volatility_alpha) * previous
+
+    @staticmethod
+    def signature(rows: List[Dict]) -> str:
+        """Fingerprint of what was on sale: sections, rows, seats and prices."""
+        items = sorted((str(r['section']), str(r['row']), str(r['seats']), str(r['cost'])) for r in rows)
+        return hashlib.sha1(json.dumps(items).encode()).hexdigest()
+
+    def record(self, state, event, rows: List[Dict], now: datetime):
+        """Fold one scrape of `event` into its refresh state. `now` is UTC."""
+        signature = self.signature(rows)
+        if state.last_signature is not None:
+            state.volatility = self.update_volatility(state.volatility or 0.0, signature != state.last_signature)
+        state.last_signature = signature
+        state.last_row_count = len(rows)
+        state.rows_json = json.dumps(rows, default=str)
+        state.last_scraped_at = now
+        state.next_due_at = now + self.cadence(event.event_date, state.volatility or 0.0, date.today())
+
+def cached_rows(event_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+    """Rows from the last scrape of each of these events that has any, reused while it is not due.
+
+    Refresh states are loaded with rows_json deferred; this reads it only
+    for the events that need it, in batches.
+    """
+    event_ids = list(event_ids)
+    rows = {}
+    for start in range(0, len(event_ids), CACHED_ROWS_BATCH_SIZE):
+        for event_id, rows_json in db.session.execute(
+            select(EventRefreshState.event_id, EventRefreshState.rows_json)
+            .where(EventRefreshState.event_id.in_(event_ids[start:start + CACHED_ROWS_BATCH_SIZE]),
+                   EventRefreshState.rows_json.isnot(None))
+        ):
+            rows[event_id] = json.loads(rows_json)
+    return rows
@@ -1,87 +1,490 @@
 from flask_apscheduler import APScheduler
+from apscheduler.triggers.base import BaseTrigger
 from datetime import datetime, timedelta
+import atexit
+import math
+import random
+import threading
 
-from src.ticketmaster.api import TicketmasterAPI
-from ..models.database import db, ScraperJob
-from ..todaytix.api import TodayTixAPI
-from .scraper import EventScraper
+from ..models.database import db, ScraperJob, ScraperRun, ScraperSchedule
+from ..clients import get_clients
+from .scraper import EventScraper, run_budget_seconds
+from .leader import scheduler_lease
+from ..services import archive_past_events
+from ..progress import progress
 import logging
 
 logger = logging.getLogger(__name__)
 scheduler = APScheduler()
 
+OVERRUN_POLICIES = ('skip', 'run_now')
+
+class AnchoredIntervalTrigger(BaseTrigger):
+    """Fixed-rate trigger: fires at anchor + k * interval, plus up to `jitter` seconds.
+
+    Unlike APScheduler's IntervalTrigger the next slot is derived from the
+    anchor rather than from the previous (jittered) fire time, so neither
+    jitter nor run duration makes the schedule drift.
+    """
+
+    def __init__(self, anchor: datetime, interval_seconds: float, jitter: float = 0, timezone=None):
+        self.timezone = timezone or scheduler.scheduler.timezone
+        self.anchor_ts = anchor.timestamp()
+        self.interval = interval_seconds
+        # Jitter must stay inside the slot so the slot index can be recovered
+        self.jitter = min(max(jitter, 0), interval_seconds / 2)
+
+    def slot_after(self, ts: float) -> float:
+        """Return the first slot strictly after `ts`."""
+        return self.anchor_ts + (math.floor((ts - self.anchor_ts) / self.interval) + 1) * self.interval
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        if previous_fire_time:
+            next_ts = self.slot_after(previous_fire_time.timestamp())
+        else:
+            next_ts = self.anchor_ts + math.ceil(max(now.timestamp() - self.anchor_ts, 0) / self.interval) * self.interval
+        if self.jitter:
+            next_ts += random.uniform(0, self.jitter)
+        return datetime.fromtimestamp(next_ts, tz=self.timezone)
+
+    def __str__(self):
+        return f'anchored-interval[{self.interval}s, jitter={self.jitter}s]'
+
 class ScraperScheduler:
+    # job_id -> anchor of each schedule registered in this process's APScheduler
+    _registered = {}
+    # Last job/run state republished by relay_progress
+    _relayed = {}
+    # Jobs with a run in progress in this process, so a restored schedule can't start a second one
+    _running = set()
+    _running_lock = threading.Lock()
+
+    @staticmethod
+    def scheduler_job_id(job_id: int) -> str:
+        return f'scraper_{job_id}'
+
+    @staticmethod
+    def runs_scrapes(app) -> bool:
+        """Whether scraper schedules run in this process.
+
+        Never in a web process when SCRAPER_MODE is 'worker'. Otherwise, with
+        leader election on, only in the process holding the scheduler lease.
+        """
+        if app.config['SCRAPER_MODE'] == 'worker' and not app.config.get('SCRAPER_WORKER'):
+            return False
+        return scheduler_lease.is_leader or not app.config['SCHEDULER_LEADER_ELECTION']
+
+    @staticmethod
+    def still_leads(app) -> bool:
+        """Whether a run started here may go on: no election, or the lease hasn't lapsed since."""
+        return not app.config['SCHEDULER_LEADER_ELECTION'] or scheduler_lease.holds()
+
+    @staticmethod
+    def is_scheduled(job_id: int) -> bool:
+        """Whether the job has an enabled schedule, whichever process runs it."""
+        return ScraperSchedule.query.filter_by(job_id=job_id, enabled=True).first() is not None
+
+    @staticmethod
+    def start_pending(schedule: ScraperSchedule) -> bool:
+        """Whether the schedule was (re)started and has not run since."""
+        return schedule.last_started_at is None or schedule.last_started_at < schedule.anchor
+
+    @staticmethod
+    def publish_status(job: ScraperJob):
+        """Push the job's status fields to live progress listeners."""
+        progress.publish(
+            'status',
+            job_id=job.id,
+            status=job.status,
+            scheduled=ScraperScheduler.is_scheduled(job.id),
+            last_run=job.last_run.isoformat() if job.last_run else None,
+            next_run=job.next_run.isoformat() if job.next_run else None,
+            events_processed=job.events_processed,
+            total_tickets_found=job.total_tickets_found
+        )
+
+    @staticmethod
+    def schedule(job: ScraperJob, app, jitter_seconds: int = None, overrun_policy: str = None, run_now: bool = True):
+        """Create or replace the recurring schedule for a job and record it in the DB."""
+        if overrun_policy is None:
+            overrun_policy = app.config['SCRAPER_OVERRUN_POLICY']
+        if overrun_policy not in OVERRUN_POLICIES:
+            raise ValueError(f"Invalid overrun policy: {overrun_policy}")
+        if jitter_seconds is None:
+            jitter_seconds = app.config['SCRAPER_JITTER_SECONDS']
+
+        schedule = ScraperSchedule.query.filter_by(job_id=job.id).first()
+        if not schedule:
+            schedule = ScraperSchedule(job_id=job.id)
+            db.session.add(schedule)
+        schedule.interval_minutes = job.interval_minutes
+        schedule.jitter_seconds = jitter_seconds
+        schedule.overrun_policy = overrun_policy
+        schedule.anchor = datetime.now()
+        schedule.enabled = True
+        db.session.commit()
+
+        if not ScraperScheduler.runs_scrapes(app):
+            # The process running the schedules registers the new anchor on its next sync
+            # and, as nothing has run since, starts it right away
+            job.next_run = schedule.anchor
+        else:
+            ScraperScheduler._add_job(schedule, app, run_now=run_now)
+            job.next_run = ScraperScheduler.next_run_time(job.id)
+        db.session.commit()
+        return schedule
+
+    @staticmethod
+    def _add_job(schedule: ScraperSchedule, app, run_now: bool = False):
+        trigger = AnchoredIntervalTrigger(
+            anchor=schedule.anchor,
+            interval_seconds=schedule.interval_minutes * 60,
+            jitter=schedule.jitter_seconds
+        )
+        kwargs = {}
+        if run_now:
+            kwargs['next_run_time'] = datetime.now(trigger.timezone)
+        scheduler.add_job(
+            id=ScraperScheduler.scheduler_job_id(schedule.job_id),
+            func=ScraperScheduler.start_scraper,
+            args=[schedule.job_id, app],
+            trigger=trigger,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=app.config['SCRAPER_MISFIRE_GRACE_SECONDS'],
+            replace_existing=True,
+            **kwargs
+        )
+        ScraperScheduler._registered[schedule.job_id] = schedule.anchor
+        logger.info(f"Scheduled job {schedule.job_id} every {schedule.interval_minutes} minutes "
+                    f"(jitter {schedule.jitter_seconds}s, overrun policy '{schedule.overrun_policy}')")
+
+    @staticmethod
+    def unschedule(job_id: int):
+        """Remove the recurring schedule for a job, in APScheduler and in the DB."""
+        scheduled_job = scheduler.get_job(ScraperScheduler.scheduler_job_id(job_id))
+        if scheduled_job:
+            scheduler.remove_job(scheduled_job.id)
+        ScraperScheduler._registered.pop(job_id, None)
+        schedule = ScraperSchedule.query.filter_by(job_id=job_id).first()
+        if schedule:
+            schedule.enabled = False
+
+    @staticmethod
+    def next_run_time(job_id: int):
+        """Next fire time for a job as a naive local datetime, or None if unscheduled."""
+        scheduled_job = scheduler.get_job(ScraperScheduler.scheduler_job_id(job_id))
+        if not scheduled_job or not scheduled_job.next_run_time:
+            return None
+        return scheduled_job.next_run_time.astimezone().replace(tzinfo=None)
+
+    @staticmethod
+    def restore_schedules(app):
+        """Re-register enabled schedules after a restart, keeping their original cadence."""
+        with app.app_context():
+            schedules = ScraperSchedule.query.filter_by(enabled=True).all()
+            for schedule in schedules:
+                job = db.session.get(ScraperJob, schedule.job_id)
+                if not job or job.status == 'stopped':
+                    schedule.enabled = False
+                    continue
+                if job.status == 'running' and job.id not in ScraperScheduler._running:
+                    # The process running it died mid-run
+                    job.status = 'error'
+                ScraperScheduler._add_job(schedule, app, run_now=ScraperScheduler.start_pending(schedule))
+                job.next_run = ScraperScheduler.next_run_time(job.id)
+            db.session.commit()
+            if schedules:
+                logger.info(f"Restored {len(schedules)} scraper schedule(s)")
+
+    @staticmethod
+    def start(app):
+        """Run scraper schedules in this process, or stand by to take over.
+
+        Registers the sync job: every SCHEDULER_SYNC_SECONDS it renews (or
+        tries to acquire) the scheduler lease and mirrors schedules started
+        or stopped by other processes. A web process relays progress from
+        whichever process runs the scrapes.
+        """
+        if not app.config.get('SCRAPER_WORKER'):
+            ScraperScheduler.schedule_progress_relay(app)
+        if app.config['SCRAPER_MODE'] == 'worker' and not app.config.get('SCRAPER_WORKER'):
+            return
+
+        if app.config['SCHEDULER_LEADER_ELECTION']:
+            atexit.register(ScraperScheduler.release_leadership, app)
+        else:
+            ScraperScheduler.become_leader(app)
+        scheduler.add_job(
+            id='scheduler_sync',
+            func=ScraperScheduler.sync,
+            args=[app],
+            trigger='interval',
+            seconds=app.config['SCHEDULER_SYNC_SECONDS'],
+            next_run_time=datetime.now(scheduler.scheduler.timezone),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+
+    @staticmethod
+    def sync(app):
+        with app.app_context():
+            if app.config['SCHEDULER_LEADER_ELECTION']:
+                was_leader = scheduler_lease.is_leader
+                is_leader = scheduler_lease.heartbeat(app.config['SCHEDULER_LEASE_TTL_SECONDS'])
+                if was_leader and not is_leader:
+                    ScraperScheduler.step_down()
+                if not is_leader:
+                    return
+                if not was_leader:
+                    if scheduler_lease.resumed:
+                        # Our own lease lapsed and nobody took it: the jobs that
+                        # were running here still are, so only re-register schedules
+                        ScraperScheduler.schedule_event_lifecycle(app)
+                    else:
+                        ScraperScheduler.become_leader(app)
+                        return
+            try:
+                ScraperScheduler.sync_schedules(app)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error syncing scraper schedules: {str(e)}")
+
+    @staticmethod
+    def sync_schedules(app):
+        """Mirror the enabled schedules in the DB into this process's APScheduler.
+
+        The anchor identifies a schedule: a start from any process sets a new
+        one, so a changed anchor means re-register. Disabled schedules are
+        removed; a run in progress notices the stop through the job status.
+        """
+        schedules = {schedule.job_id: schedule
+                     for schedule in ScraperSchedule.query.filter_by(enabled=True).all()}
+
+        for job_id in set(ScraperScheduler._registered) - set(schedules):
+            scheduled_job = scheduler.get_job(ScraperScheduler.scheduler_job_id(job_id))
+            if scheduled_job:
+                scheduler.remove_job(scheduled_job.id)
+            del ScraperScheduler._registered[job_id]
+            logger.info(f"Job {job_id} unscheduled")
+
+        for job_id, schedule in schedules.items():
+            if ScraperScheduler._registered.get(job_id) == schedule.anchor:
+                continue
+            ScraperScheduler._add_job(schedule, app, run_now=ScraperScheduler.start_pending(schedule))
+            job = db.session.get(ScraperJob, job_id)
+            if job:
+                job.next_run = ScraperScheduler.next_run_time(job_id)
+        db.session.commit()
+
+    @staticmethod
+    def become_leader(app):
+        """Start running the recurring jobs that must only run in one process."""
+        ScraperScheduler.restore_schedules(app)
+        ScraperScheduler.schedule_event_lifecycle(app)
+
+    @staticmethod
+    def step_down():
+        """Drop the recurring jobs after the lease went to another process."""
+        for job_id in list(ScraperScheduler._registered):
+            scheduled_job = scheduler.get_job(ScraperScheduler.scheduler_job_id(job_id))
+            if scheduled_job:
+                scheduler.remove_job(scheduled_job.id)
+        ScraperScheduler._registered.clear()
+        if scheduler.get_job('event_lifecycle'):
+            scheduler.remove_job('event_lifecycle')
+
+    @staticmethod
+    def release_leadership(app):
+        with app.app_context():
+            scheduler_lease.release()
+
+    @staticmethod
+    def schedule_progress_relay(app):
+        """Relay progress from the process running the scrapes to this process's listeners."""
+        scheduler.add_job(
+            id='scraper_progress_relay',
+            func=ScraperScheduler.relay_progress,
+            args=[app],
+            trigger='interval',
+            seconds=app.config['SCRAPER_PROGRESS_POLL_SECONDS'],
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+
+    @staticmethod
+    def relay_progress(app):
+        """Publish the latest job and run state when it changed since the last poll.
+
+        One poll serves every open progress stream in this process. The
+        process running the scrapes publishes directly instead.
+        """
+        if ScraperScheduler.runs_scrapes(app):
+            return
+        if progress.subscriber_count() == 0:
+            # Nobody watching: no queries, and the next stream to open gets the state republished
+            ScraperScheduler._relayed.clear()
+            return
+        with app.app_context():
+            try:
+                job = ScraperJob.query.order_by(ScraperJob.id.desc()).first()
+                if job:
+                    state = (job.id, job.status, job.events_processed, job.total_tickets_found,
+                             job.last_run, job.next_run, ScraperScheduler.is_scheduled(job.id))
+                    if ScraperScheduler._relayed.get('job') != state:
+                        ScraperScheduler._relayed['job'] = state
+                        ScraperScheduler.publish_status(job)
+
+                run = ScraperRun.query.order_by(ScraperRun.id.desc()).first()
+                if run:
+                    state = (run.id, run.status, run.events_scraped)
+                    if ScraperScheduler._relayed.get('run') != state:
+                        ScraperScheduler._relayed['run'] = state
+                        progress.publish('stage', stage='scraping' if run.status == 'running' else run.status,
+                                         job_id=run.job_id, run_id=run.id, events_processed=run.events_scraped,
+                                         rows_found=job.total_tickets_found if job else run.rows_found)
+            except Exception as e:
+                logger.error(f"Error relaying scraper progress: {str(e)}")
+
+    @staticmethod
+    def schedule_event_lifecycle(app):
+        """Register the recurring job that archives events past the retention window."""
+        scheduler.add_job(
+            id='event_lifecycle',
+            func=ScraperScheduler.run_event_lifecycle,
+            args=[app],
+            trigger='interval',
+            hours=app.config['EVENT_LIFECYCLE_INTERVAL_HOURS'],
+            next_run_time=datetime.now(scheduler.scheduler.timezone) + timedelta(minutes=1),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+
+    @staticmethod
+    def run_event_lifecycle(app):
+        with app.app_context():
+            try:
+                counts = archive_past_events(app.config['EVENT_RETENTION_DAYS'])
+                logger.info(f"Event lifecycle pruned {counts['events']} events and {counts['rules']} rules")
+                return counts
+            except Exception as e:
+                logger.error(f"Error archiving past events: {str(e)}")
+
     @staticmethod
     def start_scraper(job_id: int, app):
+        with ScraperScheduler._running_lock:
+            if job_id in ScraperScheduler._running:
+                logger.warning(f"Job {job_id} is already running in this process, skipping this start")
+                return
+            ScraperScheduler._running.add(job_id)
+        try:
+            ScraperScheduler._run_job(job_id, app)
+        finally:
+            with ScraperScheduler._running_lock:
+                ScraperScheduler._running.discard(job_id)
+
+    @staticmethod
+    def _run_job(job_id: int, app):
         with app.app_context():
-            job = ScraperJob.query.get(job_id)
+            job = db.session.get(ScraperJob, job_id)
             if not job:
                 logger.error(f"Job {job_id} not found")
                 return
-            
+
             try:
                 if job.status == 'stopped':
                     logger.info(f"Job {job_id} is stopped, not running")
+                    ScraperScheduler.unschedule(job_id)
+                    db.session.commit()
                     return
 
+                schedule = ScraperSchedule.query.filter_by(job_id=job_id).first()
+
                 logger.info(f"Starting scheduled job {job_id} with settings from DB:")
                 logger.info(f"- Auto Upload: {job.auto_upload}")
                 logger.info(f"- Concurrent Requests: {job.concurrent_requests}")
                 logger.info(f"- Interval Minutes: {job.interval_minutes}")
-                
+
+                started_at = datetime.now()
                 job.status = 'running'
                 job.events_processed = 0
                 job.total_tickets_found = 0
-                job.last_run = datetime.now()
-                job.next_run = job.last_run + timedelta(minutes=job.interval_minutes)
+                job.last_run = started_at
+                job.next_run = ScraperScheduler.next_run_time(job_id)
+                if schedule:
+                    schedule.last_started_at = started_at
                 db.session.commit()
-                
+
                 logger.info(f"Job {job_id} started. Next run scheduled at {job.next_run}")
-                
-                todaytix_api = TodayTixAPI()
-                ticketmaster_api = TicketmasterAPI()
+                ScraperScheduler.publish_status(job)
+
+                clients = get_clients(app)
+                clients.ensure_capacity(job.concurrent_requests)
                 scraper = EventScraper(
-                    todaytix_api=todaytix_api, 
-                    ticketmaster_api=ticketmaster_api,
+                    todaytix_api=clients.todaytix(),
+                    ticketmaster_api=clients.ticketmaster(),
                     output_dir=app.config['OUTPUT_FILE_DIR'],
-                    concurrent_requests=job.concurrent_requests,  
-                    auto_upload=job.auto_upload 
+                    concurrent_requests=job.concurrent_requests,
+                    auto_upload=job.auto_upload,
+                    event_timeout=app.config['SCRAPER_EVENT_TIMEOUT_SECONDS'],
+                    run_budget_seconds=run_budget_seconds(job.interval_minutes, app.config['SCRAPER_RUN_BUDGET_FRACTION']),
+                    # Once the lease is gone the new leader may start this job again
+                    keep_running=lambda: ScraperScheduler.still_leads(app)
                 )
 
-                logger.info(f"Initialized scraper with settings - auto_upload: {scraper.auto_upload}, concurrent_requests: {scraper.max_concurrent}")
-                
+                logger.info(f"Initialized scraper with settings - auto_upload: {scraper.auto_upload}, concurrent_requests: {scraper.max_concurrent}, "
+                            f"event_timeout: {scraper.event_timeout}, run_budget_seconds: {scraper.run_budget_seconds}")
+
                 success, output_file = scraper.run(job)
-                
+
                 logger.info(f"Scraper run completed - success: {success}, output_file: {output_file}")
+                logger.info(f"API connection reuse: {clients.stats()['clients']}")
+
+                if not ScraperScheduler.still_leads(app):
+                    # The job is the new leader's now, whatever it has made of it
+                    logger.warning(f"Lost the scheduler lease during job {job_id}, leaving its status alone")
+                    return
+
+                db.session.refresh(job)
+                if job.status == 'stopped':
+                    return
+
+                finished_at = datetime.now()
+                if schedule:
+                    schedule.last_finished_at = finished_at
 
                 if success and output_file:
-                    if job.status != 'stopped':
-                        next_run = datetime.now() + timedelta(minutes=job.interval_minutes)
-                        scheduler.add_job(
-                            func=ScraperScheduler.start_scraper,
-                            trigger='date',
-                            run_date=next_run,
-                            args=[job_id, app],
-                            id=f'scraper_{job_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
-                        )
-                        logger.info(f"Next run scheduled for job {job_id} at {next_run}")
-                    
                     job.status = 'completed'
                 else:
+                    # A failed run does not end the schedule; the next slot still fires
                     job.status = 'error'
-                    job.next_run = None
                     logger.error(f"Scraper run failed for job {job_id}")
-                
+
+                if schedule and schedule.overrun_policy == 'run_now' and \
+                        scheduler.get_job(ScraperScheduler.scheduler_job_id(job_id)) and \
+                        finished_at - started_at >= timedelta(minutes=schedule.interval_minutes):
+                    logger.warning(f"Job {job_id} overran its {schedule.interval_minutes} minute interval, running again now")
+                    # Leave a moment for this instance to return so max_instances=1 doesn't skip the catch-up run
+                    scheduler.modify_job(ScraperScheduler.scheduler_job_id(job_id),
+                                         next_run_time=datetime.now().astimezone() + timedelta(seconds=2))
+
+                job.next_run = ScraperScheduler.next_run_time(job_id)
                 db.session.commit()
-                
+                ScraperScheduler.publish_status(job)
+
             except Exception as e:
                 logger.error(f"Error in scheduled job {job_id}: {str(e)}")
                 try:
-                    job = ScraperJob.query.get(job_id)
-                    if job:
+                    db.session.rollback()
+                    job = db.session.get(ScraperJob, job_id)
+                    if job and ScraperScheduler.still_leads(app):
                         job.status = 'error'
-                        job.next_run = None
+                        job.next_run = ScraperScheduler.next_run_time(job_id)
                         db.session.commit()
+                        ScraperScheduler.publish_status(job)
                 except Exception as inner_e:
                     logger.error(f"Error updating job status: {str(inner_e)}")
-                raise e
\ No newline at end of file
+                raise e
@@ -1,28 +1,78 @@
 from concurrent import futures
+import json
 import zlib
+from contextlib import closing
 from flask import current_app
 import pandas as pd
 import logging
+import threading
 import time
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
-from ..models.database import Event, ScraperJob, VenueMapping, db
+from datetime import date, datetime
+from typing import Callable, List, Dict, Optional, Set, Tuple
+from sqlalchemy import insert
+from ..models.database import Event, EventRefreshState, RunEventRequests, ScraperJob, ScraperRun, VenueMapping, db
 from concurrent.futures import ThreadPoolExecutor
-from ..services import UploadService
+from ..accounting import BudgetExhausted, RequestLedger, accounting_scope
+from ..deadlines import Deadline, DeadlineExceeded, deadline_scope
+from ..metrics import metrics
+from ..progress import progress
+from ..services import get_upload_service, record_price_history, upsert_inventory
+from .budget import expected_costs, plan_within_budget, request_allowance
+from .priority import RefreshPolicy, cached_rows
+from .work_queue import WorkQueue
 
 logger = logging.getLogger(__name__)
 
+# How long past the run budget to wait for a request stuck beyond its own timeouts
+RUN_DEADLINE_GRACE_SECONDS = 30
+MAX_REPORTED_SKIPPED = 100
+# Stages of a run that are timed; the run then ends in a status (completed, error, stopped)
+RUN_STAGES = ('selecting', 'scraping', 'writing', 'uploading')
+
+scraper_events_total = metrics.counter('scraper_events_total', 'Events handled by scraper runs, by website and outcome')
+scraper_rows_emitted_total = metrics.counter('scraper_rows_emitted_total', 'Rows written to scraper output files')
+scraper_stage_seconds = metrics.histogram('scraper_stage_seconds', 'Duration of each scraper run stage',
+                                          buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0))
+scraper_run_seconds = metrics.histogram('scraper_run_seconds', 'Duration of scraper runs by status',
+                                        buckets=(10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0))
+
+class ScrapeFailed(Exception):
+    """The event's seats couldn't be fetched; it keeps its last listings rather than recording none."""
+
+def run_budget_seconds(interval_minutes: int, fraction: float) -> Optional[float]:
+    """Time a run may spend scraping, as a share of its job's interval; None for no limit."""
+    if not interval_minutes or fraction <= 0:
+        return None
+    return interval_minutes * 60 * fraction
+
 class EventScraper:
-    def __init__(self, todaytix_api, ticketmaster_api, output_dir: str, concurrent_requests: int = 5, auto_upload: bool = False):
+    def __init__(self, todaytix_api, ticketmaster_api, output_dir: str, concurrent_requests: int = 5, auto_upload: bool = False,
+                 event_timeout: float = None, run_budget_seconds: float = None, keep_running: Callable[[], bool] = None):
         self.todaytix_api = todaytix_api
         self.ticketmaster_api = ticketmaster_api
         self.output_dir = output_dir
         self.max_concurrent = concurrent_requests
         self.auto_upload = auto_upload
+        # The shared clients carry the same Hedger, if hedging is on
+        self.hedger = getattr(todaytix_api, 'hedger', None) or getattr(ticketmaster_api, 'hedger', None)
+        self.event_timeout = event_timeout
+        self.run_budget_seconds = run_budget_seconds
+        self.run_deadline = Deadline(run_budget_seconds)
+        self.skipped_events: List[Event] = []  # Events left out because a deadline ran out
+        self.failed_events: List[Event] = []  # Events whose upstream lookup failed
+        self.ledger = RequestLedger()  # Upstream requests of the current run
         self.app = current_app._get_current_object()
         self._stop_requested = False
         self._executor = None
+        self.keep_running = keep_running  # Checked with every should_stop(); the run stops once it returns False
+        # should_stop() is called per seat from every worker; only hit the DB every few seconds
+        self._stop_check_interval = 2.0
+        self._stop_checked_at = 0.0
+        self._stop_in_db = False
+        self._stop_lock = threading.Lock()
+        self._stage = None
+        self._stage_started = None
         
     def request_stop(self):
         """Signal the scraper to stop gracefully"""
@@ -32,10 +82,18 @@ class EventScraper:
             
     def should_stop(self) -> bool:
         """Check if stop has been requested"""
-        with self.app.app_context():
-            # Check both internal flag and job status
-            job = ScraperJob.query.order_by(ScraperJob.id.desc()).first()
-            return self._stop_requested or (job and job.status == 'stopped')
+        if self._stop_requested:
+            return True
+        if self.keep_running is not None and not self.keep_running():
+            return True
+        with self._stop_lock:
+            if time.monotonic() - self._stop_checked_at >= self._stop_check_interval:
+                with self.app.app_context():
+                    # Check the job status as well as the internal flag
+                    job = ScraperJob.query.order_by(ScraperJob.id.desc()).first()
+                    self._stop_in_db = bool(job and job.status == 'stopped')
+                self._stop_checked_at = time.monotonic()
+            return self._stop_in_db
 
     def generate_section_hash(self, section_name: str) -> str:
         """Generate a 3-digit hash from section name."""
@@ -115,16 +173,29 @@ class EventScraper:
             })
         return processed_data
 
-    def process_event_with_context(self, event: Event) -> List[Dict]:
-        """Wrapper to handle Flask context in threads"""
+    def process_event_with_context(self, event_id: int) -> List[Dict]:
+        """Wrapper to handle Flask context in threads.
+
+        Takes the event's primary key and reloads it so each worker thread only
+        ever touches its own session; ORM objects from the run's thread must not
+        be lazy-loaded or refreshed from here.
+        """
         if self.should_stop():
             return []
-            
-        with self.app.app_context():
+        if self.run_deadline.expired():
+            raise DeadlineExceeded('Run budget exhausted')
+        if self.ledger.exhausted():
+            raise BudgetExhausted('Request budget exhausted')
+
+        with self.app.app_context(), deadline_scope(Deadline(self.event_timeout, parent=self.run_deadline)), \
+                accounting_scope(self.ledger, event_id):
+            event = db.session.get(Event, event_id)
+            if event is None:
+                return []
             return self.process_event(event)
 
     def process_event(self, event: Event) -> List[Dict]:
-        """Process a single event."""
+        """Process a single event. Raises ScrapeFailed if its seats couldn't be fetched."""
         if self.should_stop():
             return []
 
@@ -165,74 +236,430 @@ class EventScraper:
 
             return self.process_seats(event, seats_data)
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error processing event {event.event_name}: {str(e)}")
-            return []
+            progress.publish('event_error', event={'id': event.id, 'name': event.event_name}, error=str(e))
+            raise ScrapeFailed(str(e)) from e
+
+    def _finish_run(self, scraper_run: ScraperRun, status: str, output_file: str = None):
+        try:
+            scraper_run.status = status
+            scraper_run.finished_at = datetime.now()
+            scraper_run.output_file = output_file
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording scraper run {scraper_run.id}: {str(e)}")
+
+    def _record_hedging(self, scraper_run: ScraperRun, before: Dict):
+        """Store and log how much hedging the run did and what it saved.
+
+        Counters are process-wide, so requests of anything else running in
+        this process meanwhile (a search, say) are counted too.
+        """
+        summary = self.hedger.diff(before, self.hedger.stats())
+        if not summary:
+            return
+        scraper_run.hedge_stats = json.dumps(summary)
+        for key, entry in summary.items():
+            logger.info(f"Hedging {key}: {entry['hedged']}/{entry['requests']} requests hedged "
+                        f"({entry['hedge_rate']:.1%}), {entry['hedge_wins']} won, "
+                        f"{entry['saved_seconds']:.1f}s saved, {entry['budget_exhausted']} over budget")
+
+    def _record_requests(self, scraper_run: ScraperRun):
+        """Persist the run's upstream request counts, overall and per event; failures are logged only."""
+        try:
+            ledger = self.ledger.to_dict()
+            scraper_run.requests_made = ledger['total']
+            scraper_run.request_stats = json.dumps({'total': ledger['total'], 'endpoints': ledger['endpoints']})
+            if ledger['events']:
+                db.session.execute(insert(RunEventRequests), [
+                    {'run_id': scraper_run.id, 'event_id': event_id, 'requests': counters['requests'],
+                     'bytes': counters['bytes'], 'seconds': counters['seconds'], 'errors': counters['errors']}
+                    for event_id, counters in ledger['events'].items()
+                ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error recording requests for run {scraper_run.id}: {str(e)}")
+            return
+
+        logger.info(f"Run {scraper_run.id} made {ledger['total']} upstream requests")
+        costliest = sorted(ledger['events'].items(), key=lambda item: item[1]['requests'], reverse=True)[:5]
+        if costliest:
+            logger.info("Costliest events (Event.id: requests): "
+                        + ', '.join(f"{event_id}: {counters['requests']}" for event_id, counters in costliest))
+
+    def _apply_request_budget(self, events: List[Event], refresh_states: Dict, policy: RefreshPolicy,
+                              all_seats_data: List[Dict], now: datetime) -> Tuple[List[Event], Set[int]]:
+        """Defer the lowest-value due events that the run's request allowance can't cover.
+
+        Deferred events contribute their last scraped rows like events that
+        aren't due; those without any are left out of the inventory sync.
+        Returns the events to scrape and the ids of deferred events left out.
+        """
+        allowance = self.ledger.limit
+        costs = expected_costs([event.id for event in events])
+        scheduled, deferred = plan_within_budget(events, refresh_states, policy, costs, allowance, now)
+        uncovered = set()
+        fallback = cached_rows(event.id for event in deferred if event.id in refresh_states)
+        for event in deferred:
+            scraper_events_total.inc(website=event.website, outcome='deferred')
+            rows = fallback.get(event.id)
+            if rows is None:
+                uncovered.add(event.id)
+            else:
+                all_seats_data.extend(rows)
+        if deferred:
+            logger.warning(f"Request budget of {allowance} covers {len(scheduled)} of {len(events)} due events; "
+                           f"deferred {len(deferred)} ({len(uncovered)} without listings on record)")
+        return scheduled, uncovered
+
+    def _record_inventory(self, scraper_run: ScraperRun, rows: List[Dict], events: List[Event]):
+        """Persist the run's listings; a failure here must not fail the run."""
+        try:
+            upsert_inventory(scraper_run.id, rows, {str(event.event_id): event.id for event in events})
+        except Exception as e:
+            logger.error(f"Error updating inventory for run {scraper_run.id}: {str(e)}")
+
+    def _record_price_history(self, scraper_run: ScraperRun, rows: List[Dict], events: List[Event]):
+        """Append freshly scraped prices to the history store; failures are logged only."""
+        try:
+            record_price_history(scraper_run.id, rows, {str(event.event_id): event.id for event in events})
+        except Exception as e:
+            logger.error(f"Error recording price history for run {scraper_run.id}: {str(e)}")
+
+    def _scrape_local(self, events: List[Event]):
+        """Scrape events in this process's thread pool, yielding (event, rows) as each finishes.
+
+        Events that run out of time are added to `skipped_events` instead.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent)
+        self._executor = executor
+        try:
+            future_to_event = {
+                executor.submit(self.process_event_with_context, event.id): event
+                for event in events
+            }
+            remaining = self.run_deadline.remaining()
+            wait = None if remaining is None else max(remaining, 0) + RUN_DEADLINE_GRACE_SECONDS
+            try:
+                for future in futures.as_completed(future_to_event, timeout=wait):
+                    event = future_to_event[future]
+                    try:
+                        seats_data = future.result()
+                    except DeadlineExceeded:
+                        self.skipped_events.append(event)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error processing event {event.event_name}: {str(e)}")
+                        self.failed_events.append(event)
+                        continue
+                    yield event, seats_data
+            except futures.TimeoutError:
+                stuck = [event for future, event in future_to_event.items() if not future.done()]
+                logger.warning(f"Gave up waiting on {len(stuck)} events stuck past the run budget")
+                self.skipped_events.extend(stuck)
+        finally:
+            # Never block on a thread stuck in a request; it gives up at its own timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scrape_sharded(self, scraper_run: ScraperRun, events: List[Event]):
+        """Scrape events together with any `python -m src.worker --shard` processes.
+
+        The events are queued in batches. This process works through them like
+        every other worker and yields (event, rows) as anyone's batch completes.
+        Events of failed batches, events a worker skipped and batches still
+        open when the run budget runs out end up in `skipped_events`.
+        """
+        config = current_app.config
+        queue = WorkQueue(config['SCRAPER_WORK_LEASE_SECONDS'], config['SCRAPER_WORK_MAX_ATTEMPTS'])
+        events_by_id = {event.id: event for event in events}
+        batches = queue.enqueue(scraper_run.id, list(events_by_id), config['SCRAPER_SHARD_SIZE'])
+        logger.info(f"Queued {len(events_by_id)} events as {batches} work items for run {scraper_run.id}")
+
+        merged = set()
+        try:
+            while len(merged) < batches and not self.should_stop() and not self.run_deadline.expired():
+                item = queue.claim(scraper_run.id)
+                if item:
+                    self.process_work_item(queue, item)
+                queue.fail_abandoned(scraper_run.id)
+
+                for finished in queue.finished_items(scraper_run.id, merged):
+                    merged.add(finished.id)
+                    event_ids = json.loads(finished.event_ids)
+                    if finished.status == 'failed':
+                        logger.error(f"Work item {finished.id} failed, {len(event_ids)} events not scraped: "
+                                     f"{finished.error}")
+                        self.skipped_events.extend(events_by_id[event_id] for event_id in event_ids)
+                        continue
+                    results = {int(event_id): rows for event_id, rows in json.loads(finished.results_json).items()}
+                    if finished.request_stats:
+                        self.ledger.merge(json.loads(finished.request_stats))
+                    self.skipped_events.extend(events_by_id[event_id] for event_id in event_ids
+                                               if event_id not in results)
+                    for event_id, seats_data in results.items():
+                        yield events_by_id[event_id], seats_data
+
+                if not item:
+                    time.sleep(config['SCRAPER_SHARD_POLL_SECONDS'])
+
+            if len(merged) < batches and not self.should_stop():
+                open_batches = queue.batches(scraper_run.id, exclude_ids=merged)
+                logger.warning(f"Run budget exhausted with {len(open_batches)} work items open")
+                for event_ids in open_batches:
+                    self.skipped_events.extend(events_by_id[event_id] for event_id in json.loads(event_ids))
+        finally:
+            queue.clear(scraper_run.id)
+
+    def process_work_item(self, queue: WorkQueue, item) -> bool:
+        """Scrape a claimed work item's events, renewing its lease meanwhile, and hand the rows back."""
+        finished = threading.Event()
+
+        def keep_leased():
+            while not finished.wait(queue.lease_seconds / 3):
+                with self.app.app_context():
+                    try:
+                        if not queue.renew(item):
+                            logger.warning(f"Lost the lease on work item {item.id}")
+                            return
+                    except Exception as e:
+                        logger.error(f"Error renewing lease on work item {item.id}: {str(e)}")
+
+        renewer = threading.Thread(target=keep_leased, daemon=True)
+        renewer.start()
+        skipped_before, failed_before = len(self.skipped_events), len(self.failed_events)
+        # The item's requests travel with its rows and are booked by whoever merges it;
+        # its share of the run's request budget is enforced like a run's own
+        run_ledger, self.ledger = self.ledger, RequestLedger(queue.request_allowance(item))
+        item_ledger = self.ledger
+        try:
+            events = Event.query.filter(Event.id.in_(json.loads(item.event_ids))).all()
+            results = {event.id: seats_data for event, seats_data in self._scrape_local(events)}
+            # Whoever merges the item reports the events missing from its results
+            del self.skipped_events[skipped_before:]
+            del self.failed_events[failed_before:]
+        except Exception as e:
+            logger.error(f"Error processing work item {item.id}: {str(e)}")
+            db.session.rollback()
+            queue.release(item, str(e))
+            return False
+        finally:
+            self.ledger = run_ledger
+            finished.set()
+            renewer.join()
+
+        if self.should_stop():
+            queue.release(item, 'Stopped')
+            return False
+        if not queue.complete(item, results, item_ledger.to_dict()):
+            logger.warning(f"Work item {item.id} was taken over before it completed; dropping its rows")
+            return False
+        logger.info(f"Completed work item {item.id}: {len(results)} events, "
+                    f"{sum(len(rows) for rows in results.values())} rows")
+        return True
+
+    def _enter_stage(self, stage: str, **fields):
+        """Publish the run's new stage and time the one it ends."""
+        now = time.perf_counter()
+        if self._stage is not None:
+            scraper_stage_seconds.observe(now - self._stage_started, stage=self._stage)
+        self._stage, self._stage_started = (stage, now) if stage in RUN_STAGES else (None, None)
+        progress.publish('stage', stage=stage, **fields)
+
+    @staticmethod
+    def _keep_last_rows(event_ids, refresh_states: Dict, all_seats_data: List[Dict]) -> Set[int]:
+        """Add the rows of the events' last scrapes to `all_seats_data`; returns the ids that have none."""
+        fallback = cached_rows(event_id for event_id in event_ids if event_id in refresh_states)
+        for rows in fallback.values():
+            all_seats_data.extend(rows)
+        return {event_id for event_id in event_ids if event_id not in fallback}
+
+    def _handle_failed(self, refresh_states: Dict, all_seats_data: List[Dict],
+                       covered_events: List[Event]) -> List[Event]:
+        """Keep the last known listings of events whose lookup failed, like skipped ones.
+
+        Their refresh state is left alone, so they are due again next tick.
+        Returns the events the run still covers.
+        """
+        failed = {event.id: event for event in self.failed_events}
+        uncovered = self._keep_last_rows(failed, refresh_states, all_seats_data)
+        names = [event.event_name for event in failed.values()]
+        logger.warning(f"Failed to scrape {len(failed)} events "
+                       f"({len(failed) - len(uncovered)} kept their last listings): "
+                       f"{', '.join(names[:20])}{' ...' if len(names) > 20 else ''}")
+        for event in failed.values():
+            scraper_events_total.inc(website=event.website, outcome='failed')
+        return [event for event in covered_events if event.id not in uncovered]
+
+    def _handle_skipped(self, scraper_run: ScraperRun, refresh_states: Dict, all_seats_data: List[Dict],
+                        covered_events: List[Event]) -> List[Event]:
+        """Report the events a deadline or the request budget left out and keep their last known listings.
+
+        A skipped event contributes the rows of its last scrape if there are
+        any; otherwise it is left out of the inventory sync, so its listings
+        aren't removed just because there was no time to check them.
+        Returns the events the run still covers.
+        """
+        skipped = {event.id: event for event in self.skipped_events}
+        uncovered = self._keep_last_rows(skipped, refresh_states, all_seats_data)
+
+        scraper_run.events_skipped = len(skipped)
+        db.session.commit()
+        names = [event.event_name for event in skipped.values()]
+        logger.warning(f"Skipped {len(skipped)} events that ran out of time or requests "
+                       f"({len(skipped) - len(uncovered)} kept their last listings): "
+                       f"{', '.join(names[:20])}{' ...' if len(names) > 20 else ''}")
+        for event in skipped.values():
+            scraper_events_total.inc(website=event.website, outcome='skipped')
+        progress.publish('events_skipped', events_skipped=len(skipped),
+                         events=[{'id': event.id, 'name': event.event_name}
+                                 for event in list(skipped.values())[:MAX_REPORTED_SKIPPED]])
+        return [event for event in covered_events if event.id not in uncovered]
 
     def run(self, job: ScraperJob):
         """Run the scraper with job tracking and concurrent processing."""
+        run_started = time.perf_counter()
+        scraper_run = ScraperRun(job_id=job.id, started_at=datetime.now())
+        db.session.add(scraper_run)
+        db.session.commit()
+        self._stage = None
+        self._enter_stage('selecting', job_id=job.id, run_id=scraper_run.id,
+                          events_processed=0, events_total=0, rows_found=0)
+        status = 'error'
+        output_file = None
+        hedge_before = self.hedger.stats() if self.hedger else None
         try:
             self._stop_requested = False
+            # The budget counts from the start of the run, not from when the scraper was built
+            self.run_deadline = Deadline(self.run_budget_seconds)
+            self.skipped_events = []
+            self.failed_events = []
+            self.ledger = RequestLedger()
             logger.info("Starting scraper run")
             logger.info(f"Using max concurrent requests: {self.max_concurrent}")
             logger.info(f"Auto upload enabled: {self.auto_upload}")
-            output_file = None
 
+            # Showtimes already in the past are never scraped
+            today = date.today()
             todaytix_events = Event.query.filter(
+                Event.event_date >= today,
                 Event.todaytix_event_id.isnot(None),
                 Event.todaytix_show_id.isnot(None),
                 Event.website == 'TodayTix'
             ).all()
 
             ticketmaster_events = Event.query.filter(
+                Event.event_date >= today,
                 Event.ticketmaster_id.isnot(None),
                 Event.website == 'TicketMaster'
             ).all()
 
             all_events = todaytix_events + ticketmaster_events
+            covered_events = list(all_events)
 
             if not all_events:
                 logger.warning("No events found with required IDs")
                 return False, None
 
             all_seats_data = []
+            scraped_seats_data = []  # Rows actually fetched this run, as opposed to reused from cache
             processed_events = 0
 
-            # Process events concurrently
-            with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
-                self._executor = executor
-                future_to_event = {
-                    executor.submit(self.process_event_with_context, event): event 
-                    for event in all_events
+            # Only events whose refresh cadence has elapsed are scraped this tick;
+            # the rest contribute their rows from the last time they were scraped.
+            # Timestamps are UTC to compare against the server-side Event.updated_at.
+            now = datetime.utcnow()
+            policy = RefreshPolicy(job.interval_minutes)
+            refresh_states = {}
+            if current_app.config['PRIORITY_REFRESH_ENABLED']:
+                # rows_json is deferred: cached rows are only read for the events that reuse them
+                refresh_states = {
+                    state.event_id: state
+                    for state in EventRefreshState.query.filter(
+                        EventRefreshState.event_id.in_([event.id for event in all_events])
+                    )
                 }
+                reused = cached_rows(event.id for event in all_events
+                                     if not policy.is_due(refresh_states.get(event.id), event, now))
+                for rows in reused.values():
+                    all_seats_data.extend(rows)
+                due_events = [event for event in all_events if event.id not in reused]
+                logger.info(f"{len(due_events)} of {len(all_events)} events are due for refresh")
+                all_events = due_events
+
+            config = current_app.config
+            self.ledger = RequestLedger(request_allowance(config['SCRAPER_RUN_REQUEST_BUDGET'],
+                                                          config['SCRAPER_DAILY_REQUEST_BUDGET']))
+            # Shard workers size each work item's allowance from it
+            scraper_run.request_limit = self.ledger.limit
+            db.session.commit()
+            if self.ledger.limit is not None:
+                all_events, deferred = self._apply_request_budget(all_events, refresh_states, policy, all_seats_data, now)
+                covered_events = [event for event in covered_events if event.id not in deferred]
+
+            self._enter_stage('scraping', events_total=len(all_events), rows_found=len(all_seats_data))
+
+            if current_app.config['SCRAPER_SHARDING']:
+                results = self._scrape_sharded(scraper_run, all_events)
+            else:
+                results = self._scrape_local(all_events)
 
-                for future in futures.as_completed(future_to_event):
+            with closing(results):
+                for event, seats_data in results:
                     if self.should_stop():
                         logger.info("Stop requested, terminating scraper")
+                        status = 'stopped'
                         return False, None
 
-                    event = future_to_event[future]
                     try:
-                        seats_data = future.result()
+                        if current_app.config['PRIORITY_REFRESH_ENABLED']:
+                            state = refresh_states.get(event.id)
+                            if state is None:
+                                state = EventRefreshState(event_id=event.id, volatility=1.0)
+                                db.session.add(state)
+                                refresh_states[event.id] = state
+                            policy.record(state, event, seats_data, datetime.utcnow())
                         if seats_data:
                             all_seats_data.extend(seats_data)
+                            scraped_seats_data.extend(seats_data)
                             job.total_tickets_found += len(seats_data)
                             logger.info(f"Found {len(seats_data)} seats for event: {event.event_name}")
 
                         processed_events += 1
+                        scraper_events_total.inc(website=event.website, outcome='scraped')
+                        scraper_run.events_scraped = processed_events
                         job.events_processed = processed_events
                         db.session.commit()
 
-                        progress = (processed_events / len(all_events)) * 100
-                        logger.info(f"Progress: {progress:.1f}% ({processed_events}/{len(all_events)} events)")
+                        progress.publish('event_completed',
+                                         event={'id': event.id, 'name': event.event_name, 'rows': len(seats_data)},
+                                         events_processed=processed_events, events_total=len(all_events),
+                                         rows_found=len(all_seats_data))
+                        percent = (processed_events / len(all_events)) * 100
+                        logger.info(f"Progress: {percent:.1f}% ({processed_events}/{len(all_events)} events)")
 
                     except Exception as e:
                         logger.error(f"Error processing event {event.event_name}: {str(e)}")
 
             if self.should_stop():
                 logger.info("Stop requested, terminating scraper")
+                status = 'stopped'
                 return False, None
 
+            if self.skipped_events:
+                covered_events = self._handle_skipped(scraper_run, refresh_states, all_seats_data, covered_events)
+            if self.failed_events:
+                covered_events = self._handle_failed(refresh_states, all_seats_data, covered_events)
+
+            scraper_run.rows_found = len(all_seats_data)
+            self._enter_stage('writing', rows_found=len(all_seats_data))
+            self._record_inventory(scraper_run, all_seats_data, covered_events)
+            self._record_price_history(scraper_run, scraped_seats_data, covered_events)
+
             if all_seats_data:
                 # Save directly as CSV instead of Excel
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -242,20 +669,19 @@ class EventScraper:
                 output_df = pd.DataFrame(all_seats_data)
                 output_df.to_csv(output_file, index=False, encoding='utf-8')
                 logger.info(f"Saved {len(output_df)} rows to {output_file}")
+                scraper_rows_emitted_total.inc(len(output_df))
 
                 # Upload the file if auto_upload is enabled
                 if self.auto_upload:
-                    upload_service = UploadService(
-                        current_app.config['STORE_API_BASE_URL'],
-                        current_app.config['STORE_API_KEY'],
-                        current_app.config['COMPANY_ID']
-                    )
+                    self._enter_stage('uploading')
+                    upload_service = get_upload_service(self.app)
                     success, message = upload_service.upload_csv(output_file)
                     if success:
                         logger.info(f"File uploaded successfully: {message}")
                     else:   
                         logger.error(f"File upload failed: {message}")
 
+                status = 'completed'
                 return True, output_file
             else:
                 logger.warning("No data collected")
@@ -263,6 +689,13 @@ class EventScraper:
 
         except Exception as e:
             logger.error(f"Error running scraper: {str(e)}")
+            db.session.rollback()
             return False, None
         finally:
-            self._executor = None
\ No newline at end of file
+            self._executor = None
+            if self.hedger:
+                self._record_hedging(scraper_run, hedge_before)
+            self._record_requests(scraper_run)
+            self._finish_run(scraper_run, status, output_file if status == 'completed' else None)
+            scraper_run_seconds.observe(time.perf_counter() - run_started, status=status)
+            self._enter_stage(status)
\ No newline at end of file
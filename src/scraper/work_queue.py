@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.engine import Row
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from ..models.database import db, ScrapeWorkItem, ScraperRun
+
+logger = logging.getLogger(__name__)
+
+class WorkQueue:
+    """Lease-based queue of event batches shared by cooperating scraper workers.
+
+    The run's coordinator enqueues its due events in batches; any worker
+    (the coordinator included) claims a batch, renews the lease while it
+    scrapes, and completes it with the rows. A lease that runs out puts the
+    batch back up for grabs until it has been tried `max_attempts` times.
+    Claim, renew and complete are conditional UPDATEs on a per-claim token,
+    so a worker whose lease was taken over can no longer complete the item
+    and each batch's rows are merged once.
+    """
+
+    def __init__(self, lease_seconds: int = 60, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            ScrapeWorkItem.status == 'pending',
+            and_(ScrapeWorkItem.status == 'claimed', ScrapeWorkItem.lease_expires_at < now)
+        )
+
+    def enqueue(self, run_id: int, event_ids: List[int], batch_size: int) -> int:
+        items = [
+            {'run_id': run_id, 'event_ids': json.dumps(event_ids[start:start + batch_size]), 'status': 'pending'}
+            for start in range(0, len(event_ids), batch_size)
+        ]
+        if items:
+            db.session.execute(insert(ScrapeWorkItem), items)
+            db.session.commit()
+        return len(items)
+
+    def claim(self, run_id: int = None) -> Optional[Row]:
+        """Lease the oldest claimable item of a running run (optionally only `run_id`), or None.
+
+        The item comes back as a plain row (id, run_id, event_ids, claim_token,
+        attempts) that is safe to hand to the thread renewing its lease.
+        """
+        now = datetime.now()
+        candidates = (
+            select(ScrapeWorkItem.id)
+            .join(ScraperRun, ScraperRun.id == ScrapeWorkItem.run_id)
+            .where(self._claimable(now), ScraperRun.status == 'running',
+                   ScrapeWorkItem.attempts < self.max_attempts)
+        )
+        if run_id is not None:
+            candidates = candidates.where(ScrapeWorkItem.run_id == run_id)
+
+        # Workers race for the same candidates; whoever loses one moves on to the next
+        for item_id in db.session.execute(candidates.order_by(ScrapeWorkItem.id).limit(10)).scalars().all():
+            token = uuid.uuid4().hex
+            claimed = db.session.execute(
+                update(ScrapeWorkItem)
+                .where(ScrapeWorkItem.id == item_id, self._claimable(now))
+                .values(status='claimed', claimed_by=self.holder, claim_token=token,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=ScrapeWorkItem.attempts + 1)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.execute(
+                    select(ScrapeWorkItem.id, ScrapeWorkItem.run_id, ScrapeWorkItem.event_ids,
+                           ScrapeWorkItem.claim_token, ScrapeWorkItem.attempts)
+                    .where(ScrapeWorkItem.id == item_id)
+                ).one()
+        return None
+
+    def _update_claimed(self, item: Row, **values) -> bool:
+        result = db.session.execute(
+            update(ScrapeWorkItem)
+            .where(ScrapeWorkItem.id == item.id, ScrapeWorkItem.claim_token == item.claim_token,
+                   ScrapeWorkItem.status == 'claimed')
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def renew(self, item: Row) -> bool:
+        """Extend the lease; False if the item was meanwhile taken over."""
+        return self._update_claimed(
+            item, lease_expires_at=datetime.now() + timedelta(seconds=self.lease_seconds)
+        )
+
+    def complete(self, item: Row, results: Dict[int, List[Dict]], request_stats: Dict = None) -> bool:
+        return self._update_claimed(
+            item,
+            status='done',
+            results_json=json.dumps(results, default=str),
+            request_stats=json.dumps(request_stats) if request_stats else None,
+            requests_made=request_stats['total'] if request_stats else 0,
+            rows_found=sum(len(rows) for rows in results.values()),
+            lease_expires_at=None
+        )
+
+    @staticmethod
+    def request_allowance(item: Row) -> Optional[int]:
+        """Requests a claimed item may make under its run's request limit, or None without one.
+
+        What completed items haven't used is shared evenly among the items
+        still pending or claimed, this one included, so workers scraping
+        at the same time can't each spend the whole remainder.
+        """
+        limit = db.session.execute(
+            select(ScraperRun.request_limit).where(ScraperRun.id == item.run_id)
+        ).scalar()
+        if limit is None:
+            return None
+        used, open_items = db.session.execute(
+            select(
+                func.coalesce(func.sum(ScrapeWorkItem.requests_made).filter(ScrapeWorkItem.status == 'done'), 0),
+                func.count().filter(ScrapeWorkItem.status.in_(['pending', 'claimed']))
+            ).where(ScrapeWorkItem.run_id == item.run_id)
+        ).one()
+        return max(limit - used, 0) // max(open_items, 1)
+
+    def release(self, item: Row, error: str = None) -> bool:
+        """Hand a claimed item back after a failure: requeued, or failed once out of attempts."""
+        return self._update_claimed(
+            item,
+            status='pending' if item.attempts < self.max_attempts else 'failed',
+            error=error,
+            lease_expires_at=None
+        )
+
+    def fail_abandoned(self, run_id: int) -> int:
+        """Fail items whose last allowed attempt let the lease run out."""
+        result = db.session.execute(
+            update(ScrapeWorkItem)
+            .where(ScrapeWorkItem.run_id == run_id, ScrapeWorkItem.status == 'claimed',
+                   ScrapeWorkItem.lease_expires_at < datetime.now(),
+                   ScrapeWorkItem.attempts >= self.max_attempts)
+            .values(status='failed', error='Lease expired')
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def counts(run_id: int) -> Dict[str, int]:
+        return dict(db.session.execute(
+            select(ScrapeWorkItem.status, func.count())
+            .where(ScrapeWorkItem.run_id == run_id)
+            .group_by(ScrapeWorkItem.status)
+        ).all())
+
+    @staticmethod
+    def finished_items(run_id: int, exclude_ids) -> List:
+        """Done and failed items of a run not in `exclude_ids`."""
+        return db.session.execute(
+            select(ScrapeWorkItem.id, ScrapeWorkItem.status, ScrapeWorkItem.event_ids,
+                   ScrapeWorkItem.results_json, ScrapeWorkItem.request_stats, ScrapeWorkItem.error)
+            .where(ScrapeWorkItem.run_id == run_id, ScrapeWorkItem.status.in_(['done', 'failed']),
+                   ScrapeWorkItem.id.notin_(list(exclude_ids)))
+            .order_by(ScrapeWorkItem.id)
+        ).all()
+
+    @staticmethod
+    def batches(run_id: int, exclude_ids=()) -> List[str]:
+        """event_ids (JSON) of a run's items not in `exclude_ids`."""
+        return db.session.execute(
+            select(ScrapeWorkItem.event_ids)
+            .where(ScrapeWorkItem.run_id == run_id, ScrapeWorkItem.id.notin_(list(exclude_ids)))
+        ).scalars().all()
+
+    @staticmethod
+    def clear(run_id: int):
+        """Drop a run's items once their rows have been merged."""
+        db.session.execute(delete(ScrapeWorkItem).where(ScrapeWorkItem.run_id == run_id))
+        db.session.commit()
@@ -1,3 +1,11 @@
-from .upload_service import UploadService
+from .upload_service import UploadService, init_upload_service, get_upload_service
+from .event_lifecycle import archive_past_events, delete_events
+from .event_import import EventImporter, IMPORT_MODES, run_import_job
+from .inventory import upsert_inventory
+from .price_history import record_price_history, price_trend
+from .venue_mapping_import import VenueMappingImporter, VENUE_MAPPING_CSV_HEADER, VENUE_MAPPING_IMPORT_MODES
 
-__all__ = ['UploadService']
\ No newline at end of file
+__all__ = ['UploadService', 'init_upload_service', 'get_upload_service', 'archive_past_events', 'delete_events',
+           'EventImporter', 'IMPORT_MODES', 'run_import_job',
+           'VenueMappingImporter', 'VENUE_MAPPING_CSV_HEADER', 'VENUE_MAPPING_IMPORT_MODES', 'upsert_inventory',
+           'record_price_history', 'price_trend']
\ No newline at end of file
@@ -0,0 +1,201 @@
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import insert, select, update
+from ..constants import CITY_URL_MAP
+from ..metrics import metrics
+from ..models.database import db, Event, ImportJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MODES = ('skip', 'upsert')
+MAX_REPORTED_ERRORS = 200
+
+events_imported_total = metrics.counter('events_imported_total', 'Event rows written by CSV imports')
+
+class EventImporter:
+    """Bulk CSV importer for events.
+
+    Rows are streamed and handled in batches: each batch is validated, the
+    event_ids it mentions are looked up in one query, and new and existing
+    rows are written with one bulk INSERT and one bulk UPDATE respectively.
+    In 'skip' mode rows whose event_id already exists are left alone; in
+    'upsert' mode they overwrite the stored event.
+    """
+
+    def __init__(self, mode: str = 'skip', batch_size: int = 1000):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Invalid import mode: {mode}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.imported_count = 0
+        self.updated_count = 0
+        self.skipped_count = 0
+        self.error_count = 0
+        self.processed_rows = 0
+        self.errors: List[str] = []
+
+    @staticmethod
+    def count_rows(file_path: str) -> int:
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as csvfile:
+            return max(sum(1 for _ in csv.reader(csvfile)) - 1, 0)
+
+    def add_error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    @staticmethod
+    def _optional(row: Dict, key: str) -> Optional[str]:
+        value = (row.get(key) or '').strip()
+        return value or None
+
+    def parse_row(self, row: Dict) -> Dict:
+        """Validate one CSV row and return Event column values. Raises ValueError."""
+        city = (row.get('city') or '').strip()
+        city_id = CITY_URL_MAP.get(city)
+        if city_id is None:
+            raise ValueError(f"Invalid city name '{city}'")
+
+        in_hand_date = None
+        if self._optional(row, 'in_hand_date'):
+            try:
+                in_hand_date = datetime.strptime(row['in_hand_date'].strip(), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError("Invalid in_hand_date format. Use YYYY-MM-DD")
+
+        in_hand = (row.get('in_hand') or '').strip().upper()
+        if in_hand and in_hand not in ['Y', 'N']:
+            raise ValueError("Invalid in_hand value. Use 'Y' or 'N'")
+
+        return {
+            'website': row['website'].strip(),
+            'event_id': row['event_id'].strip(),
+            'todaytix_event_id': self._optional(row, 'todaytix_event_id'),
+            'todaytix_show_id': self._optional(row, 'todaytix_show_id'),
+            'ticketmaster_id': self._optional(row, 'ticketmaster_id'),
+            'event_name': row['event_name'].strip(),
+            'city_id': city_id,
+            'event_date': datetime.strptime(row['event_date'].strip(), '%Y-%m-%d').date(),
+            'event_time': row['event_time'].strip(),
+            'venue_name': self._optional(row, 'venue_name'),
+            'markup': float(row['markup'].strip()),
+            'stock_type': self._optional(row, 'stock_type'),
+            'in_hand': in_hand or 'N',
+            'in_hand_date': in_hand_date
+        }
+
+    def _write_batch(self, batch: Dict[str, Dict]):
+        existing = dict(db.session.execute(
+            select(Event.event_id, Event.id).where(Event.event_id.in_(list(batch)))
+        ).all())
+
+        new_rows = [values for event_id, values in batch.items() if event_id not in existing]
+        if new_rows:
+            db.session.execute(insert(Event), new_rows)
+            self.imported_count += len(new_rows)
+
+        if existing:
+            if self.mode == 'upsert':
+                now = datetime.utcnow()
+                db.session.execute(update(Event), [
+                    {**batch[event_id], 'id': pk, 'updated_at': now} for event_id, pk in existing.items()
+                ])
+                self.updated_count += len(existing)
+            else:
+                self.skipped_count += len(existing)
+
+        db.session.commit()
+        events_imported_total.inc(len(new_rows), mode='insert')
+        if self.mode == 'upsert':
+            events_imported_total.inc(len(existing), mode='update')
+
+    def run(self, file_path: str, progress: Callable[['EventImporter'], None] = None):
+        """Import every row of `file_path`, committing once per batch."""
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            batch: Dict[str, Dict] = {}
+            for row_num, row in enumerate(reader, start=2):
+                self.processed_rows += 1
+                try:
+                    values = self.parse_row(row)
+                except (KeyError, ValueError, AttributeError) as e:
+                    self.add_error(f"Row {row_num}: {str(e)}")
+                    continue
+
+                event_id = values['event_id']
+                if event_id in batch:
+                    # Duplicate event_id within the file: upsert keeps the last row, skip keeps the first
+                    if self.mode == 'upsert':
+                        batch[event_id] = values
+                    else:
+                        self.skipped_count += 1
+                    continue
+                batch[event_id] = values
+
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = {}
+                    if progress:
+                        progress(self)
+
+            if batch:
+                self._write_batch(batch)
+        if progress:
+            progress(self)
+        return self.summary()
+
+    def summary(self) -> Dict:
+        return {
+            'imported_count': self.imported_count,
+            'updated_count': self.updated_count,
+            'skipped_count': self.skipped_count,
+            'error_count': self.error_count,
+            'processed_rows': self.processed_rows,
+            'errors': self.errors
+        }
+
+def _record_progress(job: ImportJob, importer: EventImporter):
+    job.processed_rows = importer.processed_rows
+    job.imported_count = importer.imported_count
+    job.updated_count = importer.updated_count
+    job.skipped_count = importer.skipped_count
+    job.error_count = importer.error_count
+    job.errors_json = json.dumps(importer.errors)
+    db.session.commit()
+
+def run_import_job(app, job_id: int, file_path: str):
+    """Run an ImportJob to completion, recording progress after every batch. Removes the file."""
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        if not job:
+            logger.error(f"Import job {job_id} not found")
+            return
+        try:
+            job.status = 'running'
+            job.total_rows = EventImporter.count_rows(file_path)
+            db.session.commit()
+
+            importer = EventImporter(mode=job.mode, batch_size=app.config['EVENT_IMPORT_BATCH_SIZE'])
+            importer.run(file_path, progress=lambda imp: _record_progress(job, imp))
+
+            job.status = 'completed'
+            job.finished_at = datetime.now()
+            db.session.commit()
+            logger.info(f"Import job {job_id} finished: {importer.imported_count} imported, "
+                        f"{importer.updated_count} updated, {importer.skipped_count} skipped, "
+                        f"{importer.error_count} errors")
+        except Exception as e:
+            logger.error(f"Import job {job_id} failed: {str(e)}")
+            db.session.rollback()
+            job = db.session.get(ImportJob, job_id)
+            job.status = 'error'
+            job.error_message = str(e)
+            job.finished_at = datetime.now()
+            db.session.commit()
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
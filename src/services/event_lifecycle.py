@@ -0,0 +1,73 @@
+import logging
+from datetime import date, timedelta
+from typing import Dict
+from sqlalchemy import delete, insert, select
+from ..metrics import metrics
+from ..models.database import db, Event, EventRule, EventRefreshState, ArchivedEvent, ArchivedEventRule
+
+logger = logging.getLogger(__name__)
+
+events_archived_total = metrics.counter('events_archived_total', 'Past events moved to the archive')
+events_deleted_total = metrics.counter('events_deleted_total', 'Events removed by bulk deletes')
+
+ARCHIVED_EVENT_COLUMNS = [
+    'id', 'website', 'event_id', 'todaytix_event_id', 'todaytix_show_id', 'ticketmaster_id',
+    'event_name', 'city_id', 'event_date', 'event_time', 'venue_name', 'markup',
+    'stock_type', 'in_hand_date', 'in_hand', 'created_at', 'updated_at'
+]
+ARCHIVED_RULE_COLUMNS = ['id', 'event_id', 'rule_type', 'keyword', 'created_at', 'updated_at']
+
+def archive_past_events(retention_days: int) -> Dict[str, int]:
+    """Move events whose date is more than `retention_days` in the past, and their rules, to the archive.
+
+    Runs as set-based INSERT ... SELECT / DELETE statements in one transaction.
+    Returns counts of what was moved.
+    """
+    cutoff = date.today() - timedelta(days=retention_days)
+    expired_ids = select(Event.id).where(Event.event_date < cutoff).scalar_subquery()
+
+    try:
+        event_count = db.session.execute(
+            insert(ArchivedEvent).from_select(
+                ARCHIVED_EVENT_COLUMNS,
+                select(*[getattr(Event, c) for c in ARCHIVED_EVENT_COLUMNS]).where(Event.event_date < cutoff)
+            )
+        ).rowcount
+        rule_count = db.session.execute(
+            insert(ArchivedEventRule).from_select(
+                ARCHIVED_RULE_COLUMNS,
+                select(*[getattr(EventRule, c) for c in ARCHIVED_RULE_COLUMNS]).where(EventRule.event_id.in_(expired_ids))
+            )
+        ).rowcount
+
+        db.session.execute(delete(EventRule).where(EventRule.event_id.in_(expired_ids)))
+        db.session.execute(delete(EventRefreshState).where(EventRefreshState.event_id.in_(expired_ids)))
+        db.session.execute(delete(Event).where(Event.event_date < cutoff))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    events_archived_total.inc(event_count)
+    logger.info(f"Archived {event_count} events and {rule_count} rules dated before {cutoff}")
+    return {'events': event_count, 'rules': rule_count, 'cutoff': cutoff.isoformat()}
+
+def delete_events(*conditions) -> int:
+    """Delete every event matching `conditions` with a single DELETE statement.
+
+    Rules and refresh state go with them through the ON DELETE CASCADE
+    foreign keys (SQLite enforces these once configure_sqlite has turned
+    foreign_keys on). Returns the number of events deleted.
+    """
+    try:
+        count = db.session.execute(
+            delete(Event).where(*conditions).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    events_deleted_total.inc(count)
+    logger.info(f"Deleted {count} events")
+    return count
@@ -0,0 +1,79 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+from sqlalchemy import delete, insert, select, update
+from ..metrics import metrics
+from ..models.database import db, Inventory
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_BATCH_SIZE = 1000
+
+inventory_rows_total = metrics.counter('inventory_rows_total', 'Inventory rows written by scraper runs')
+
+def _inventory_values(row: Dict, event_pk: int, run_id: int, now: datetime) -> Dict:
+    return {
+        'inventory_id': str(row['inventory_id']),
+        'event_pk': event_pk,
+        'event_id': str(row['event_id']),
+        'section': str(row['section']),
+        'row': str(row['row']),
+        'seats': str(row['seats']),
+        'quantity': int(row.get('quantity') or 2),
+        'cost': float(row['cost']),
+        'list_price': int(row['list_price']),
+        'last_seen_run_id': run_id,
+        'last_seen_at': now
+    }
+
+def upsert_inventory(run_id: int, rows: Iterable[Dict], event_pks: Dict[str, int],
+                     now: datetime = None) -> Dict[str, int]:
+    """Make the inventory table match the rows one scraper run produced.
+
+    Rows are upserted by inventory_id in batches (one lookup, one bulk
+    INSERT and one bulk UPDATE each). Listings of the run's events that the
+    run no longer produced are then removed with a single DELETE. `event_pks`
+    maps Event.event_id to Event.id for every event the run covered.
+    """
+    now = now or datetime.now()
+    latest: Dict[str, Dict] = {}
+    for row in rows:
+        event_pk = event_pks.get(str(row['event_id']))
+        if event_pk is not None:
+            latest[str(row['inventory_id'])] = _inventory_values(row, event_pk, run_id, now)
+
+    inserted = updated = 0
+    items: List[Dict] = list(latest.values())
+    try:
+        for start in range(0, len(items), INVENTORY_BATCH_SIZE):
+            batch = {values['inventory_id']: values for values in items[start:start + INVENTORY_BATCH_SIZE]}
+            existing = dict(db.session.execute(
+                select(Inventory.inventory_id, Inventory.id).where(Inventory.inventory_id.in_(list(batch)))
+            ).all())
+
+            new_rows = [{**values, 'first_seen_run_id': run_id}
+                        for inventory_id, values in batch.items() if inventory_id not in existing]
+            if new_rows:
+                db.session.execute(insert(Inventory), new_rows)
+            if existing:
+                db.session.execute(update(Inventory), [
+                    {**batch[inventory_id], 'id': pk} for inventory_id, pk in existing.items()
+                ])
+            inserted += len(new_rows)
+            updated += len(existing)
+
+        removed = db.session.execute(
+            delete(Inventory)
+            .where(Inventory.event_pk.in_(list(set(event_pks.values()))), Inventory.last_seen_run_id != run_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    inventory_rows_total.inc(inserted, action='insert')
+    inventory_rows_total.inc(updated, action='update')
+    inventory_rows_total.inc(removed, action='delete')
+    logger.info(f"Inventory for run {run_id}: {inserted} new, {updated} updated, {removed} no longer listed")
+    return {'inserted': inserted, 'updated': updated, 'removed': removed}
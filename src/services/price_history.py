@@ -0,0 +1,127 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, insert, select
+from ..models.database import db, PriceHistory, PriceHistoryLabel
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BUCKETS = {'run': None, 'hour': 3600, 'day': 86400}
+# Label ids start at 1; section_code = row_code = 0 holds the event-wide rollup of each scrape
+ALL_CODE = 0
+
+def label_codes(labels: Iterable[str]) -> Dict[str, int]:
+    """Integer codes for `labels`, creating the ones not seen before."""
+    labels = set(labels)
+    if not labels:
+        return {}
+    codes = dict(db.session.execute(
+        select(PriceHistoryLabel.label, PriceHistoryLabel.id).where(PriceHistoryLabel.label.in_(list(labels)))
+    ).all())
+    missing = labels - codes.keys()
+    if missing:
+        db.session.execute(insert(PriceHistoryLabel), [{'label': label} for label in missing])
+        codes.update(db.session.execute(
+            select(PriceHistoryLabel.label, PriceHistoryLabel.id).where(PriceHistoryLabel.label.in_(list(missing)))
+        ).all())
+    return codes
+
+def record_price_history(run_id: int, rows: Iterable[Dict], event_pks: Dict[str, int],
+                         observed_at: datetime = None) -> int:
+    """Append one observation per (event, section, row) from freshly scraped rows.
+
+    Listings in the same row are folded into min/max cost and a count, and
+    each event also gets an event-wide rollup row so whole-event trends
+    never scan row-level data. Returns the number of history rows written.
+    """
+    observed_ts = int((observed_at or datetime.now()).timestamp())
+    groups: Dict[tuple, List[int]] = {}
+    for row in rows:
+        event_pk = event_pks.get(str(row['event_id']))
+        if event_pk is None:
+            continue
+        cents = int(round(float(row['cost']) * 100))
+        entry = groups.get((event_pk, str(row['section']), str(row['row'])))
+        if entry is None:
+            groups[(event_pk, str(row['section']), str(row['row']))] = [cents, cents, 1]
+        else:
+            entry[0] = min(entry[0], cents)
+            entry[1] = max(entry[1], cents)
+            entry[2] += 1
+    if not groups:
+        return 0
+
+    rollups: Dict[int, List[int]] = {}
+    for (event_pk, _, _), (low, high, count) in groups.items():
+        entry = rollups.setdefault(event_pk, [low, high, 0])
+        entry[0] = min(entry[0], low)
+        entry[1] = max(entry[1], high)
+        entry[2] += count
+
+    try:
+        codes = label_codes([key[1] for key in groups] + [key[2] for key in groups])
+        codes[None] = ALL_CODE
+        groups.update({(event_pk, None, None): values for event_pk, values in rollups.items()})
+        history_rows = [
+            {
+                'event_pk': event_pk,
+                'section_code': codes[section],
+                'observed_at': observed_ts,
+                'row_code': codes[row],
+                'run_id': run_id,
+                'min_cost_cents': low,
+                'max_cost_cents': high,
+                'listings': count
+            }
+            for (event_pk, section, row), (low, high, count) in groups.items()
+        ]
+        db.session.execute(insert(PriceHistory), history_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Recorded {len(history_rows)} price history rows for run {run_id}")
+    return len(history_rows)
+
+def price_trend(event_pk: int, section: Optional[str] = None, since: Optional[datetime] = None,
+                bucket: str = 'run') -> List[Dict]:
+    """Min/max cost and listing count over time for an event, optionally one section.
+
+    `bucket` groups observations per scrape ('run'), per hour or per day.
+    """
+    if bucket not in HISTORY_BUCKETS:
+        raise ValueError(f"Invalid bucket '{bucket}'. Use one of: {', '.join(HISTORY_BUCKETS)}")
+
+    section_code = ALL_CODE
+    if section is not None:
+        section_code = db.session.execute(
+            select(PriceHistoryLabel.id).where(PriceHistoryLabel.label == section)
+        ).scalar()
+        if section_code is None:
+            return []
+    conditions = [PriceHistory.event_pk == event_pk, PriceHistory.section_code == section_code]
+    if since is not None:
+        conditions.append(PriceHistory.observed_at >= int(since.timestamp()))
+
+    width = HISTORY_BUCKETS[bucket]
+    period = PriceHistory.observed_at if width is None else (PriceHistory.observed_at // width) * width
+    period = period.label('period')
+    rows = db.session.execute(
+        select(
+            period,
+            func.min(PriceHistory.min_cost_cents).label('min_cents'),
+            func.max(PriceHistory.max_cost_cents).label('max_cents'),
+            func.sum(PriceHistory.listings).label('listings')
+        ).where(*conditions).group_by(period).order_by(period)
+    ).all()
+
+    return [
+        {
+            'observed_at': datetime.fromtimestamp(row.period).isoformat(),
+            'min_cost': row.min_cents / 100,
+            'max_cost': row.max_cents / 100,
+            'listings': row.listings
+        }
+        for row in rows
+    ]
@@ -1,15 +1,79 @@
+import codecs
+import csv
+import io
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, Optional, Tuple
 import os
 import pandas as pd
-import chardet
+from chardet import UniversalDetector
+from openpyxl import load_workbook
+from flask import current_app
+from ..metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+upload_phase_seconds = metrics.histogram('upload_phase_seconds', 'Duration of each upload phase')
+upload_seconds = metrics.histogram('upload_seconds', 'Duration of whole CSV uploads by outcome',
+                                   buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+upload_size_bytes = metrics.histogram('upload_size_bytes', 'Size of uploaded CSV bodies',
+                                      buckets=tuple(2 ** n * 1024 for n in range(4, 18, 2)))
+
+class _MultipartBody:
+    """File-like multipart/form-data body that streams the file part from disk.
+
+    Records when the last byte has been handed to the socket so send time can be
+    told apart from the wait for the response.
+    """
+
+    def __init__(self, fields: Dict, field_name: str, filename: str, file_obj, content_type: str):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        head = io.BytesIO()
+        for name, value in fields.items():
+            head.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode())
+            head.write(f'{value}\r\n'.encode())
+        head.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode()
+        )
+        file_obj.seek(0, os.SEEK_END)
+        file_size = file_obj.tell()
+        file_obj.seek(0)
+
+        self._parts = [io.BytesIO(head.getvalue()), file_obj, io.BytesIO(f'\r\n--{boundary}--\r\n'.encode())]
+        self._length = len(head.getvalue()) + file_size + len(self._parts[2].getvalue())
+        self.finished_at = None
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        out = b''
+        while self._parts and len(out) < size:
+            chunk = self._parts[0].read(size - len(out))
+            if chunk:
+                out += chunk
+            else:
+                self._parts.pop(0)
+        if not out and self.finished_at is None:
+            self.finished_at = time.perf_counter()
+        return out
+
 class UploadService:
-    def __init__(self, api_base_url: str, api_key: str, company_id: str):
+    def __init__(self, api_base_url: str, api_key: str, company_id: str,
+                 connect_timeout: float = 10, read_timeout: float = 120, pool_size: int = 4,
+                 chunk_rows: int = 5000, encoding_sample_bytes: int = 1024 * 1024):
         self.api_base_url = api_base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_rows = chunk_rows
+        self.chunk_bytes = 64 * 1024
+        self.encoding_sample_bytes = encoding_sample_bytes
         self.headers = {
             'X-Api-Token': api_key,
             'X-Company-Id': company_id,
@@ -26,6 +90,29 @@ class UploadService:
             'shown_quantity', 'passthrough'
         ]
 
+        # One pooled session per service; requests.Session is safe to share
+        # across threads as long as nobody mutates its headers or adapters.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls, config) -> 'UploadService':
+        return cls(
+            config['STORE_API_BASE_URL'],
+            config['STORE_API_KEY'],
+            config['COMPANY_ID'],
+            connect_timeout=config['UPLOAD_CONNECT_TIMEOUT'],
+            read_timeout=config['UPLOAD_READ_TIMEOUT'],
+            pool_size=config['UPLOAD_POOL_SIZE'],
+            chunk_rows=config['UPLOAD_CHUNK_ROWS'],
+            encoding_sample_bytes=config['UPLOAD_ENCODING_SAMPLE_BYTES']
+        )
+
+    def close(self):
+        self.session.close()
+
     def create_empty_dataframe(self) -> pd.DataFrame:
         """Create an empty DataFrame with required headers."""
         return pd.DataFrame(columns=self.required_headers)
@@ -33,10 +120,12 @@ class UploadService:
     def request_upload(self) -> Tuple[bool, Dict]:
         """Request upload credentials from the API."""
         try:
-            response = requests.post(
-                f"{self.api_base_url}/sync/api/inventories/csv_upload_request",
-                headers=self.headers
-            )
+            with upload_phase_seconds.time(phase='credentials'):
+                response = self.session.post(
+                    f"{self.api_base_url}/sync/api/inventories/csv_upload_request",
+                    headers=self.headers,
+                    timeout=self.timeout
+                )
             response.raise_for_status()
             return True, response.json()
         except Exception as e:
@@ -44,43 +133,119 @@ class UploadService:
             return False, {"error": str(e)}
 
     def detect_file_encoding(self, file_path: str) -> Tuple[bool, str]:
-        """Detect the encoding of a file."""
+        """Detect the encoding of a file from a bounded sample."""
         try:
-            with open(file_path, 'rb') as file:
-                raw_data = file.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-                confidence = result['confidence']
-                
-                logger.info(f"Detected encoding: {encoding} with confidence: {confidence}")
-                return True, f"Encoding: {encoding} (confidence: {confidence})"
+            encoding, confidence = self._sniff_encoding(file_path)
+            logger.info(f"Detected encoding: {encoding} with confidence: {confidence}")
+            return True, f"Encoding: {encoding} (confidence: {confidence})"
         except Exception as e:
             return False, f"Error detecting encoding: {str(e)}"
 
+    def _sniff_encoding(self, file_path: str) -> Tuple[Optional[str], float]:
+        """Feed chardet chunk by chunk until it is confident or the sample cap is hit."""
+        detector = UniversalDetector()
+        read = 0
+        with open(file_path, 'rb') as file:
+            while read < self.encoding_sample_bytes and not detector.done:
+                chunk = file.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                detector.feed(chunk)
+                read += len(chunk)
+        detector.close()
+        return detector.result['encoding'], detector.result['confidence']
+
     def verify_utf8_encoding(self, file_path: str) -> Tuple[bool, str]:
         """Verify if file is UTF-8 encoded."""
         try:
+            decoder = codecs.getincrementaldecoder('utf-8')()
             with open(file_path, 'rb') as file:
-                content = file.read()
-                # Try to decode as UTF-8
-                content.decode('utf-8')
-                return True, "File is UTF-8 encoded"
+                # Decode incrementally so multi-byte sequences split across chunks are handled
+                for chunk in iter(lambda: file.read(self.chunk_bytes), b''):
+                    decoder.decode(chunk)
+                decoder.decode(b'', final=True)
+            return True, "File is UTF-8 encoded"
         except UnicodeDecodeError as e:
             return False, f"File is not UTF-8 encoded: {str(e)}"
         except Exception as e:
             return False, f"Error checking encoding: {str(e)}"
 
+    def resolve_csv_encoding(self, file_path: str) -> str:
+        """Pick the encoding to read a CSV with: UTF-8 if it validates, else chardet's guess."""
+        is_utf8, _ = self.verify_utf8_encoding(file_path)
+        if is_utf8:
+            return 'utf-8-sig'
+        encoding, _ = self._sniff_encoding(file_path)
+        try:
+            return codecs.lookup(encoding).name if encoding else 'cp1252'
+        except LookupError:
+            return 'cp1252'
+
+    def iter_rows(self, file_path: str) -> Iterator[list]:
+        """Yield rows (header first) from a CSV or Excel file without loading it whole."""
+        if file_path.endswith('.xlsx'):
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                sheet = workbook.worksheets[0]
+                for row in sheet.iter_rows(values_only=True):
+                    yield ['' if value is None else str(value) for value in row]
+            finally:
+                workbook.close()
+        elif file_path.endswith('.xls'):
+            # Legacy .xls has no streaming reader; read it in one go
+            df = pd.read_excel(file_path, dtype=str).fillna('')
+            yield list(df.columns)
+            yield from df.itertuples(index=False, name=None)
+        else:
+            encoding = self.resolve_csv_encoding(file_path)
+            with open(file_path, 'r', encoding=encoding, newline='') as file:
+                yield from csv.reader(file)
+
+    def write_utf8_csv(self, file_path: str, output_path: str, encoding: str = 'utf-8',
+                       ensure_required_headers: bool = False) -> int:
+        """Stream a CSV/Excel file into a UTF-8 CSV, optionally appending missing required columns.
+
+        Returns the number of data rows written.
+        """
+        rows = self.iter_rows(file_path)
+        header = next(rows, None)
+        # Drop trailing empty columns that Excel tends to leave behind
+        while header and header[-1] == '':
+            header = header[:-1]
+        header = list(header or [])
+
+        extra = []
+        if ensure_required_headers:
+            extra = [h for h in self.required_headers if h not in header]
+        width = len(header)
+
+        written = 0
+        with open(output_path, 'w', encoding=encoding, newline='') as output:
+            writer = csv.writer(output, lineterminator='\n')
+            writer.writerow(header + extra)
+            batch = []
+            for row in rows:
+                row = list(row)
+                if not any(row):
+                    continue
+                row = (row + [''] * width)[:width] if width else row
+                batch.append(row + [''] * len(extra))
+                if len(batch) >= self.chunk_rows:
+                    writer.writerows(batch)
+                    written += len(batch)
+                    batch = []
+            writer.writerows(batch)
+            written += len(batch)
+        return written
+
     def convert_excel_to_csv(self, file_path: str) -> Tuple[bool, str]:
         """Convert Excel file to UTF-8 CSV."""
         try:
             # Create temp CSV file path
             csv_path = f"{os.path.splitext(file_path)[0]}_utf8.csv"
             
-            # Read Excel file
-            df = pd.read_excel(file_path)
-            
-            # Save as UTF-8 CSV with BOM
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
+            # Stream rows out of the workbook into a UTF-8 CSV with BOM
+            self.write_utf8_csv(file_path, csv_path, encoding='utf-8-sig')
             
             # Verify the encoding
             is_utf8, msg = self.verify_utf8_encoding(csv_path)
@@ -100,38 +265,13 @@ class UploadService:
             if not os.path.exists(file_path):
                 return False, "File does not exist"
 
-            # Process file
-            df = None
+            # Normalize to a UTF-8 CSV (without BOM) with all required columns, chunk by chunk
+            processed_path = f"{os.path.splitext(file_path)[0]}_processed.csv"
             try:
-                if file_path.endswith(('.xlsx', '.xls')):
-                    df = pd.read_excel(file_path)
-                else:
-                    # Try different encodings for CSV
-                    encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-                    for encoding in encodings:
-                        try:
-                            df = pd.read_csv(file_path, encoding=encoding)
-                            break
-                        except UnicodeDecodeError:
-                            continue
-            except pd.errors.EmptyDataError:
-                # If file is empty, create DataFrame with headers
-                df = self.create_empty_dataframe()
+                self.write_utf8_csv(file_path, processed_path, ensure_required_headers=True)
             except Exception as e:
                 return False, f"Error reading file: {str(e)}"
 
-            if df is None:
-                df = self.create_empty_dataframe()
-
-            # Ensure all required columns exist
-            for header in self.required_headers:
-                if header not in df.columns:
-                    df[header] = ""
-
-            # Save as UTF-8 CSV without BOM
-            processed_path = f"{os.path.splitext(file_path)[0]}_processed.csv"
-            df.to_csv(processed_path, index=False, encoding='utf-8')
-
             # Extract fields from upload data
             fields = upload_data['upload']['fields']
             url = upload_data['upload']['url']
@@ -148,11 +288,7 @@ class UploadService:
 
             # Upload file
             with open(processed_path, 'rb') as f:
-                files = {
-                    'file': (fields['key'], f, 'text/csv')
-                }
-                
-                response = requests.post(url, data=form, files=files)
+                response = self._post_timed(url, form, 'file', fields['key'], f, 'text/csv')
                 
                 if response.status_code not in [200, 201, 204]:
                     logger.error(f"Upload failed: {response.status_code}")
@@ -172,12 +308,43 @@ class UploadService:
                 except Exception as e:
                     logger.error(f"Error removing temporary file: {str(e)}")
 
+    def _post_timed(self, url: str, form: Dict, field_name: str, filename: str,
+                    file_obj, content_type: str) -> requests.Response:
+        """Stream a multipart POST through the pooled session, timing body send and response wait."""
+        body = _MultipartBody(form, field_name, filename, file_obj, content_type)
+        prepared = self.session.prepare_request(requests.Request('POST', url))
+        prepared.body = body
+        prepared.headers['Content-Type'] = body.content_type
+        prepared.headers['Content-Length'] = str(len(body))
+
+        start = time.perf_counter()
+        response = self.session.send(prepared, timeout=self.timeout)
+        end = time.perf_counter()
+
+        sent_at = body.finished_at or end
+        upload_size_bytes.observe(len(body))
+        upload_phase_seconds.observe(sent_at - start, phase='send')
+        upload_phase_seconds.observe(end - sent_at, phase='response')
+        return response
+
     def upload_csv(self, file_path: str) -> Tuple[bool, str]:
         """Complete upload process including requesting credentials and uploading."""
+        start = time.perf_counter()
         # Request upload credentials
         success, upload_data = self.request_upload()
         if not success:
+            upload_seconds.observe(time.perf_counter() - start, outcome='failure')
             return False, upload_data.get("error", "Failed to get upload credentials")
 
         # Upload to S3
-        return self.upload_to_s3(file_path, upload_data)
\ No newline at end of file
+        success, message = self.upload_to_s3(file_path, upload_data)
+        upload_seconds.observe(time.perf_counter() - start, outcome='success' if success else 'failure')
+        return success, message
+
+def init_upload_service(app):
+    """Create the long-lived upload service owned by the app."""
+    app.extensions['upload_service'] = UploadService.from_config(app.config)
+
+def get_upload_service(app=None) -> UploadService:
+    """Return the app's shared upload service."""
+    return (app or current_app).extensions['upload_service']
@@ -0,0 +1,135 @@
+import csv
+import logging
+from typing import Dict, List, Tuple
+from sqlalchemy import insert, select, tuple_, update
+from ..models.database import db, VenueMapping
+
+logger = logging.getLogger(__name__)
+
+VENUE_MAPPING_CSV_HEADER = ['event_name', 'venue_name', 'section', 'row', 'seats', 'active']
+VENUE_MAPPING_IMPORT_MODES = ('merge', 'replace')
+MAX_REPORTED_ERRORS = 200
+
+def split_seats(value: str) -> List[str]:
+    return [seat.strip() for seat in (value or '').split(',') if seat.strip()]
+
+def parse_active(value: str) -> bool:
+    value = (value or '').strip().lower()
+    if value in ('', 'y', 'yes', 'true', '1'):
+        return True
+    if value in ('n', 'no', 'false', '0'):
+        return False
+    raise ValueError(f"Invalid active value '{value}'. Use 'Y' or 'N'")
+
+class VenueMappingImporter:
+    """Bulk CSV importer for venue seat exclusions.
+
+    Rows are keyed by (event_name, venue_name, section, row). Each batch
+    looks up the mappings it touches in one query, then inserts the new keys
+    and updates the existing ones with one bulk statement each. In 'merge'
+    mode the imported seats are added to those already excluded; in
+    'replace' mode they overwrite them.
+    """
+
+    def __init__(self, mode: str = 'merge', batch_size: int = 1000):
+        if mode not in VENUE_MAPPING_IMPORT_MODES:
+            raise ValueError(f"Invalid import mode: {mode}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.created_count = 0
+        self.updated_count = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+
+    def add_error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    @staticmethod
+    def parse_row(row: Dict) -> Tuple[Tuple[str, str, str, str], List[str], bool]:
+        key = tuple((row.get(field) or '').strip() for field in ('event_name', 'venue_name', 'section', 'row'))
+        for field, value in zip(('event_name', 'venue_name', 'section', 'row'), key):
+            if not value:
+                raise ValueError(f"Missing required field: {field}")
+        seats = split_seats(row.get('seats'))
+        if not seats:
+            raise ValueError("No valid seats provided")
+        return key, seats, parse_active(row.get('active'))
+
+    def _write_batch(self, batch: Dict[Tuple, Dict]):
+        existing = {}
+        for mapping in db.session.execute(
+            select(VenueMapping.id, VenueMapping.event_name, VenueMapping.venue_name,
+                   VenueMapping.section, VenueMapping.row, VenueMapping.seats)
+            .where(tuple_(VenueMapping.event_name, VenueMapping.venue_name,
+                          VenueMapping.section, VenueMapping.row).in_(list(batch)))
+            .order_by(VenueMapping.id)
+        ):
+            # Older data may hold several rows per key; merge into the first
+            existing.setdefault((mapping.event_name, mapping.venue_name, mapping.section, mapping.row), mapping)
+
+        new_rows, updates = [], []
+        for key, values in batch.items():
+            if key in existing:
+                current = existing[key]
+                seats = values['seats']
+                if self.mode == 'merge':
+                    seats = list(dict.fromkeys(split_seats(current.seats) + seats))
+                updates.append({'id': current.id, 'seats': ','.join(seats), 'active': values['active']})
+            else:
+                event_name, venue_name, section, row = key
+                new_rows.append({
+                    'event_name': event_name,
+                    'venue_name': venue_name,
+                    'section': section,
+                    'row': row,
+                    'seats': ','.join(values['seats']),
+                    'active': values['active']
+                })
+
+        if new_rows:
+            db.session.execute(insert(VenueMapping), new_rows)
+        if updates:
+            db.session.execute(update(VenueMapping), updates)
+        VenueMapping.mark_events_changed((event_name, venue_name) for event_name, venue_name, _, _ in batch)
+        db.session.commit()
+        self.created_count += len(new_rows)
+        self.updated_count += len(updates)
+
+    def run(self, lines) -> Dict:
+        """Import CSV text from an iterable of lines, committing once per batch."""
+        batch: Dict[Tuple, Dict] = {}
+        try:
+            for row_num, row in enumerate(csv.DictReader(lines), start=2):
+                try:
+                    key, seats, active = self.parse_row(row)
+                except ValueError as e:
+                    self.add_error(f"Row {row_num}: {str(e)}")
+                    continue
+
+                if key in batch:
+                    # Repeated key within the file: seats accumulate, last active flag wins
+                    batch[key]['seats'] = list(dict.fromkeys(batch[key]['seats'] + seats))
+                    batch[key]['active'] = active
+                    continue
+                batch[key] = {'seats': seats, 'active': active}
+
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = {}
+
+            if batch:
+                self._write_batch(batch)
+        finally:
+            # Once per import, even a partial one, rather than once per row
+            VenueMapping.invalidate_excluded_seats_cache()
+
+        logger.info(f"Venue mapping import: {self.created_count} created, {self.updated_count} updated, "
+                    f"{self.error_count} errors")
+        return {
+            'created_count': self.created_count,
+            'updated_count': self.updated_count,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
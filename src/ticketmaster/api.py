@@ -4,14 +4,16 @@ import re
 import requests
 import logging
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from ..accounting import metered
+from ..deadlines import DeadlineExceeded, check_deadline, request_timeout
 
 logger = logging.getLogger(__name__)
 
 class TicketmasterAPI:
     BASE_URL = 'https://services.ticketmaster.com/api/ismds'
 
-    def __init__(self):
+    def __init__(self, session: requests.Session = None, timeout: Tuple[float, float] = (10, 30), hedger=None):
         self.api_key = os.getenv('TICKETMASTER_API_KEY')
         self.api_secret = os.getenv('TICKETMASTER_API_SECRET')
         self.consumer_api = os.getenv('TICKETMASTER_CONSUMER_API')
@@ -34,6 +36,12 @@ class TicketmasterAPI:
             'Cache-Control': 'no-cache',
             'TE': 'trailers'
         }
+        if session is not None:
+            # The shared session negotiates only the encodings it can decode
+            self.headers.pop('Accept-Encoding')
+        self.session = session or requests.Session()
+        self.timeout = timeout  # (connect, read), further capped by the current deadline
+        self.hedger = hedger  # Optional Hedger for the slow seat lookups
 
     def search_events(self, event_name: str, location: str, start_date: str, end_date: str) -> List[Dict]:
         """
@@ -70,10 +78,11 @@ class TicketmasterAPI:
                     'page': page
                 }
 
-                response = requests.get(
+                response = self.session.get(
                     base_url,
                     params=query_params,
-                    headers=self.headers
+                    headers=self.headers,
+                    timeout=self.timeout
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -144,7 +153,11 @@ class TicketmasterAPI:
             return []
 
     def get_seats(self, event_id: str) -> List[Dict]:
-        """Get available seats for a specific event."""
+        """Get available seats for a specific event.
+
+        A failed page raises rather than returning what was fetched so far,
+        so a failure never reads as fewer seats.
+        """
         seats_data = []
         offset = 0
         limit = 40
@@ -174,7 +187,9 @@ class TicketmasterAPI:
 
                 url = f"{base_url}?{query_params}"
 
-                response = requests.get(url, headers=self.headers)
+                send = metered('ticketmaster', 'quickpicks',
+                               lambda: self.session.get(url, headers=self.headers, timeout=request_timeout(self.timeout)))
+                response = self.hedger.call('ticketmaster.quickpicks', send) if self.hedger else send()
                 response.raise_for_status()
                 data = response.json()
 
@@ -189,11 +204,15 @@ class TicketmasterAPI:
 
                 offset += limit
 
+            except DeadlineExceeded:
+                raise
             except Exception as e:
+                # Cut short by the event's deadline: skip the event rather than keep a partial listing
+                check_deadline()
                 logger.error(f"Error fetching seats for event {event_id}: {str(e)}")
                 if 'response' in locals() and hasattr(response, 'text'):
                     logger.error(f"Response content: {response.text}")
-                break
+                raise
 
         return seats_data
 
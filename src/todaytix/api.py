@@ -4,7 +4,9 @@ import requests
 import logging
 import os
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from ..accounting import metered
+from ..deadlines import check_deadline, request_timeout
 from .models import ShowTime, Seat
 
 logger = logging.getLogger(__name__)
@@ -12,22 +14,30 @@ logger = logging.getLogger(__name__)
 class TodayTixAPI:
     BASE_URL = "https://api.todaytix.com/api/v2"
     
-    def __init__(self):
+    def __init__(self, session: requests.Session = None, timeout: Tuple[float, float] = (10, 30), hedger=None):
         self.proxy_url = os.getenv('PROXY_API_URL')
         self.proxy_api_key = os.getenv('PROXY_API_KEY')
         logger.info(f"Proxy URL: {self.proxy_url}")
         if not all([self.proxy_url, self.proxy_api_key]):
             raise ValueError("Missing proxy configuration in environment")
             
-        self.session = requests.Session()
+        # Shared by the scraper's worker threads; not modified after this point
+        self.session = session or requests.Session()
+        self.timeout = timeout  # (connect, read), further capped by the current deadline
+        self.hedger = hedger  # Optional Hedger for the slow seat lookups
         self.session.headers.update({
             'Accept': 'application/json',
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'X-Api-Key': self.proxy_api_key
         })
 
-    def _make_proxy_request(self, method: str, endpoint: str, params: Dict = None) -> Dict:
-        """Make a request through the proxy service."""
+    def _make_proxy_request(self, method: str, endpoint: str, params: Dict = None, hedge: str = None,
+                            raise_errors: bool = False) -> Dict:
+        """Make a request through the proxy service.
+
+        `hedge` names the endpoint for latency tracking when the request may be hedged.
+        Failures return None, or are raised with `raise_errors`.
+        """
         target_url = f"{self.BASE_URL}{endpoint}"
         proxy_params = {'url': target_url}
         
@@ -35,25 +45,36 @@ class TodayTixAPI:
             proxy_params.update(params)
         try:
             logger.info(f"Making proxy request to: {target_url}")
-            response = self.session.request(
+            # Booked per endpoint with the ids taken out, e.g. /shows/{id}/showtimes
+            send = metered('todaytix', re.sub(r'\d+', '{id}', endpoint), lambda: self.session.request(
                 method=method,
                 url=f"{self.proxy_url}/api/proxy/request",
-                params=proxy_params
-            )
+                params=proxy_params,
+                timeout=request_timeout(self.timeout)
+            ))
+            response = self.hedger.call(hedge, send) if self.hedger and hedge else send()
             response.raise_for_status()
             
             proxy_response = response.json()
             if not proxy_response.get('content'):
                 logger.error("No content in proxy response")
+                if raise_errors:
+                    raise ValueError("No content in proxy response")
                 return None
                 
             return json.loads(proxy_response['content'])
             
         except requests.RequestException as e:
+            # Cut short by the event's deadline: skip the event rather than report no seats
+            check_deadline()
             logger.error(f"Proxy request failed: {str(e)}")
+            if raise_errors:
+                raise
             return None
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse response: {str(e)}")
+            if raise_errors:
+                raise
             return None
 
     def search_event(self, event_name: str, location: int = 2) -> Optional[Dict]:
@@ -157,7 +178,9 @@ class TodayTixAPI:
         data = self._make_proxy_request(
             'GET',
             f'/shows/{show_id}/showtimes/{showtime_id}/sections',
-            params=params
+            params=params,
+            hedge='todaytix.sections',
+            raise_errors=True  # A failed lookup must not read as a sold-out showtime
         )
         
         if not data or 'data' not in data:
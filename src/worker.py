@@ -0,0 +1,161 @@
+"""Standalone scraper process.
+
+    python -m src.worker                 # daemon: run the schedules started from the web app
+    python -m src.worker --once          # run the latest job once and exit
+    python -m src.worker --once --job-id 3
+    python -m src.worker --shard         # help scrape runs split up with SCRAPER_SHARDING=True
+    python -m src.worker --metrics-port 9101   # also serve this process's /metrics
+
+Set SCRAPER_MODE=worker for the web app so it only records schedules in the
+DB and leaves running them to this process.
+"""
+import argparse
+import logging
+import signal
+import sys
+import threading
+from datetime import datetime
+from flask import Flask
+from werkzeug.serving import make_server
+from .app import create_app
+from .clients import get_clients
+from .models.database import db, ScraperJob, ScraperRun
+from .routes.metrics import bp as metrics_bp
+from .scraper.scheduler import scheduler, ScraperScheduler
+from .scraper.scraper import EventScraper, run_budget_seconds
+from .scraper.work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+class ScraperWorker:
+    """Runs the scraper schedules started from the web app until signalled.
+
+    With leader election on, several workers can be started for failover;
+    only the holder of the scheduler lease runs scrapes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._stop = threading.Event()
+
+    def stop(self, signum=None, frame=None):
+        logger.info("Shutdown requested, waiting for the current run to finish")
+        self._stop.set()
+        # A second signal exits immediately
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    def run_forever(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        ScraperScheduler.start(self.app)
+        logger.info(f"Scraper worker started, syncing schedules every {self.app.config['SCHEDULER_SYNC_SECONDS']}s")
+        self._stop.wait()
+
+        scheduler.pause()
+        scheduler.shutdown(wait=True)
+        ScraperScheduler.release_leadership(self.app)
+        logger.info("Scraper worker stopped")
+
+class ShardWorker(ScraperWorker):
+    """Claims batches of events from sharded runs and scrapes them until signalled.
+
+    Start as many as needed, on this host or others sharing the database;
+    the run's own process merges their rows into one output and upload.
+    """
+
+    def run_forever(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        config = self.app.config
+        queue = WorkQueue(config['SCRAPER_WORK_LEASE_SECONDS'], config['SCRAPER_WORK_MAX_ATTEMPTS'])
+        clients = get_clients(self.app)
+        logger.info(f"Shard worker {queue.holder} started")
+
+        while not self._stop.is_set():
+            item = None
+            with self.app.app_context():
+                try:
+                    item = queue.claim()
+                    if item:
+                        run = db.session.get(ScraperRun, item.run_id)
+                        job = db.session.get(ScraperJob, run.job_id) if run and run.job_id else None
+                        concurrency = job.concurrent_requests if job else config['MAX_CONCURRENT_REQUESTS']
+                        clients.ensure_capacity(concurrency)
+                        # Whatever is left of the run's budget; batches finished after it are ignored anyway
+                        budget = run_budget_seconds(job.interval_minutes, config['SCRAPER_RUN_BUDGET_FRACTION']) if job else None
+                        if budget is not None and run.started_at:
+                            budget = max(budget - (datetime.now() - run.started_at).total_seconds(), 0)
+                        scraper = EventScraper(
+                            todaytix_api=clients.todaytix(),
+                            ticketmaster_api=clients.ticketmaster(),
+                            output_dir=config['OUTPUT_FILE_DIR'],
+                            concurrent_requests=concurrency,
+                            event_timeout=config['SCRAPER_EVENT_TIMEOUT_SECONDS'],
+                            run_budget_seconds=budget
+                        )
+                        scraper.process_work_item(queue, item)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error in shard worker: {str(e)}")
+            if not item:
+                self._stop.wait(config['SCRAPER_SHARD_POLL_SECONDS'])
+
+        logger.info("Shard worker stopped")
+
+def serve_metrics(app, port: int):
+    """Serve only /metrics from this process in the background; a worker has no web server of its own."""
+    metrics_app = Flask(__name__)
+    metrics_app.config['METRICS_TOKEN'] = app.config['METRICS_TOKEN']
+    metrics_app.register_blueprint(metrics_bp)
+    server = make_server('0.0.0.0', port, metrics_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"Serving /metrics on port {port}")
+
+def run_once(app, job_id: int = None) -> bool:
+    """Run one scrape of `job_id` (default: the latest job) in this process."""
+    with app.app_context():
+        if job_id:
+            job = db.session.get(ScraperJob, job_id)
+        else:
+            job = ScraperJob.query.order_by(ScraperJob.id.desc()).first()
+        if not job:
+            logger.error("No scraper job found; start one from the web app first")
+            return False
+        if job.status == 'stopped':
+            logger.error(f"Job {job.id} is stopped; start it from the web app first")
+            return False
+        job_id = job.id
+
+    try:
+        ScraperScheduler.start_scraper(job_id, app)
+    except Exception:
+        return False
+    with app.app_context():
+        return db.session.get(ScraperJob, job_id).status == 'completed'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.worker', description='Run the event scraper outside the web app.')
+    parser.add_argument('--once', action='store_true', help='run a single scrape and exit')
+    parser.add_argument('--job-id', type=int, help='job to run with --once (default: the latest)')
+    parser.add_argument('--shard', action='store_true', help='only scrape batches of sharded runs started elsewhere')
+    parser.add_argument('--metrics-port', type=int, help='serve /metrics on this port (default: WORKER_METRICS_PORT)')
+    args = parser.parse_args(argv)
+
+    app = create_app(worker=True)
+    metrics_port = args.metrics_port if args.metrics_port is not None else app.config['WORKER_METRICS_PORT']
+    if metrics_port and not args.once:
+        serve_metrics(app, metrics_port)
+    if args.once:
+        return 0 if run_once(app, args.job_id) else 1
+    if args.shard:
+        ShardWorker(app).run_forever()
+        return 0
+
+    ScraperWorker(app).run_forever()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
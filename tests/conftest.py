@@ -0,0 +1,25 @@
+import pytest
+from flask import Flask
+from src.config import Config
+from src.db_utils import configure_sqlite
+from src.migrations import run_migrations
+from src.models.database import db
+
+def make_app(db_path):
+    """A bare app on its own SQLite file: models, pragmas and migrations, no scheduler or blueprints."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    db.init_app(app)
+    configure_sqlite(app)
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+    return app
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path / 'test.db')
+    yield app
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,138 @@
+from datetime import date
+from sqlalchemy import text
+from src.migrations import rebuild_table, run_migrations
+from src.models.database import db, ArchivedEvent, ArchivedEventRule, Event, EventRule, PriceHistory
+from src.services.event_lifecycle import archive_past_events
+
+def make_event(n: int, event_date: date = date(2030, 1, 1), **kwargs) -> Event:
+    return Event(website='TicketMaster', event_id=f'E{n}', event_name=f'Show {n}', city_id=1,
+                 event_date=event_date, event_time='19:30', **kwargs)
+
+def table_ddl(table_name: str) -> str:
+    return db.session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table_name}
+    ).scalar()
+
+def drop_autoincrement(table_name: str, version: int):
+    """Put the table back the way databases created before AUTOINCREMENT have it, with its migration unapplied."""
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        conn.commit()
+        with conn.begin():
+            ddl = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE name = :name"), {'name': table_name}
+            ).scalar()
+            conn.exec_driver_sql(ddl.replace('AUTOINCREMENT', '').replace(f'TABLE {table_name}', f'TABLE {table_name}_old', 1))
+            conn.execute(text(f'INSERT INTO {table_name}_old SELECT * FROM {table_name}'))
+            conn.execute(text(f'DROP TABLE {table_name}'))
+            conn.execute(text(f'ALTER TABLE {table_name}_old RENAME TO {table_name}'))
+            conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table_name})
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = :v'), {'v': version})
+        conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+        conn.commit()
+
+def test_deleted_event_id_is_not_reused(app):
+    with app.app_context():
+        first, second = make_event(1), make_event(2)
+        db.session.add_all([first, second])
+        db.session.commit()
+        last_id = second.id
+        db.session.delete(second)
+        db.session.commit()
+
+        third = make_event(3)
+        db.session.add(third)
+        db.session.commit()
+        assert third.id > last_id
+
+def test_migration_rebuilds_events_without_losing_rows_or_reusing_ids(app):
+    with app.app_context():
+        drop_autoincrement('events', 14)
+        assert 'AUTOINCREMENT' not in table_ddl('events')
+
+        db.session.add_all([make_event(1, id=1), make_event(2, id=2)])
+        db.session.add(EventRule(event_id=1, rule_type='exclude', keyword='obstructed'))
+        db.session.add(ArchivedEvent(id=5, website='TicketMaster', event_id='E5', event_name='Show 5', city_id=1,
+                                     event_date=date(2020, 1, 1), event_time='19:30'))
+        db.session.add(PriceHistory(event_pk=7, section_code=1, observed_at=0, row_code=1, run_id=1,
+                                     min_cost_cents=1000, max_cost_cents=1000, listings=1))
+        db.session.commit()
+
+        run_migrations()
+        db.session.expire_all()
+
+        assert 'AUTOINCREMENT' in table_ddl('events')
+        assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 1
+        assert [e.event_id for e in Event.query.order_by(Event.id)] == ['E1', 'E2']
+        assert [r.keyword for r in EventRule.query.filter_by(event_id=1)] == ['obstructed']
+        indexes = {row[1] for row in db.session.execute(text("PRAGMA index_list('events')"))}
+        assert {index.name for index in Event.__table__.indexes} <= indexes
+
+        event = make_event(8)
+        db.session.add(event)
+        db.session.commit()
+        assert event.id == 8  # past the archived and price-history ids
+
+def test_rebuild_keeps_foreign_keys_pointing_at_the_table(app):
+    with app.app_context():
+        event = make_event(1)
+        db.session.add(event)
+        db.session.commit()
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            conn.commit()
+            with conn.begin():
+                rebuild_table(conn, 'events')
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+            conn.commit()
+        db.session.add(EventRule(event_id=event.id, rule_type='exclude', keyword='view'))
+        db.session.commit()
+        db.session.delete(db.session.get(Event, event.id))
+        db.session.commit()
+        assert EventRule.query.count() == 0
+
+def test_archiving_twice_does_not_reuse_rule_ids(app):
+    with app.app_context():
+        first = make_event(1, event_date=date(2020, 1, 1))
+        db.session.add(first)
+        db.session.flush()
+        db.session.add(EventRule(event_id=first.id, rule_type='exclude', keyword='obstructed'))
+        db.session.commit()
+        assert archive_past_events(7)['rules'] == 1
+
+        second = make_event(2, event_date=date(2020, 1, 2))
+        db.session.add(second)
+        db.session.flush()
+        db.session.add(EventRule(event_id=second.id, rule_type='exclude', keyword='view'))
+        db.session.commit()
+        moved = archive_past_events(7)
+        assert (moved['events'], moved['rules']) == (1, 1)
+
+        assert sorted(r.keyword for r in ArchivedEventRule.query) == ['obstructed', 'view']
+        assert ArchivedEvent.query.count() == 2
+
+def test_migration_rebuilds_event_rules_past_archived_ids(app):
+    with app.app_context():
+        event = make_event(1)
+        db.session.add(event)
+        db.session.flush()
+        db.session.add(EventRule(id=1, event_id=event.id, rule_type='exclude', keyword='obstructed'))
+        db.session.add(ArchivedEventRule(id=9, event_id=99, rule_type='exclude', keyword='view'))
+        db.session.commit()
+        drop_autoincrement('event_rules', 15)
+        assert 'AUTOINCREMENT' not in table_ddl('event_rules')
+
+        run_migrations()
+        db.session.expire_all()
+
+        assert 'AUTOINCREMENT' in table_ddl('event_rules')
+        assert [r.keyword for r in EventRule.query] == ['obstructed']
+        rule = EventRule(event_id=event.id, rule_type='include', keyword='stalls')
+        db.session.add(rule)
+        db.session.commit()
+        assert rule.id == 10
+
+        # The rebuilt table still cascades from events
+        db.session.delete(event)
+        db.session.commit()
+        assert EventRule.query.count() == 0
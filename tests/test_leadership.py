@@ -0,0 +1,44 @@
+from datetime import date, datetime, timedelta
+from src.models.database import db, Event, ScraperJob, ScraperRun
+from src.scraper.leader import scheduler_lease
+from src.scraper.scheduler import ScraperScheduler
+from src.scraper.scraper import EventScraper
+
+class LeaseLosingTicketmaster:
+    """Lets the scheduler lease run out after `lose_after` lookups."""
+
+    def __init__(self, lose_after: int):
+        self.lose_after = lose_after
+        self.fetched = 0
+
+    def get_seats(self, ticketmaster_id):
+        self.fetched += 1
+        if self.fetched == self.lose_after:
+            scheduler_lease.expires_at = datetime.now() - timedelta(seconds=1)
+        return [{'section': 'A', 'row': '1', 'seats': '1,2', 'price': 10.0}]
+
+def test_scrape_stops_once_the_lease_is_gone(app, tmp_path):
+    app.config['SCHEDULER_LEADER_ELECTION'] = True
+    with app.app_context():
+        db.session.add_all(
+            Event(website='TicketMaster', event_id=f'E{i}', ticketmaster_id=f'TM{i}', event_name=f'Show {i}',
+                  city_id=1, event_date=date.today() + timedelta(days=30), event_time='19:30')
+            for i in range(10)
+        )
+        job = ScraperJob(status='running', interval_minutes=20)
+        db.session.add(job)
+        db.session.commit()
+
+        scheduler_lease.is_leader, scheduler_lease.expires_at = True, datetime.now() + timedelta(minutes=1)
+        try:
+            assert ScraperScheduler.still_leads(app)
+            api = LeaseLosingTicketmaster(lose_after=3)
+            scraper = EventScraper(None, api, str(tmp_path), concurrent_requests=1,
+                                   keep_running=lambda: ScraperScheduler.still_leads(app))
+            ok, output_file = scraper.run(job)
+        finally:
+            scheduler_lease.is_leader, scheduler_lease.expires_at = False, None
+
+        assert (ok, output_file) == (False, None)
+        assert api.fetched < 10
+        assert ScraperRun.query.one().status == 'stopped'
@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+from flask import Flask
+from src.metrics import MetricsRegistry
+from src.routes.metrics import bp as metrics_bp
+
+def define(registry):
+    requests = registry.counter('requests_total', 'Requests served')
+    latency = registry.histogram('latency_seconds', 'Request latency', buckets=(0.1, 1.0))
+    streams = registry.gauge('streams', 'Open streams', multiprocess_mode='livesum')
+    queued = registry.gauge('queued', 'Queued items')
+    return requests, latency, streams, queued
+
+def worker_process(directory, requests_served):
+    registry = MetricsRegistry()
+    requests, latency, streams, queued = define(registry)
+    registry.enable_multiprocess(directory)
+    for _ in range(requests_served):
+        requests.inc(route='/api/events')
+        latency.observe(0.5)
+    streams.set(2)
+    queued.set(99)
+    registry.flush()
+
+def test_multiprocess_render_merges_every_worker(tmp_path):
+    context = multiprocessing.get_context('fork')
+    for requests_served in (3, 4):
+        process = context.Process(target=worker_process, args=(str(tmp_path), requests_served))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+    registry = MetricsRegistry()
+    requests, latency, streams, queued = define(registry)
+    registry.enable_multiprocess(str(tmp_path))
+    requests.inc(route='/api/events')
+    streams.set(1)
+    queued.set(5)
+    lines = registry.render().splitlines()
+
+    # Counters and histograms of exited workers still count, so totals never go backwards
+    assert 'requests_total{route="/api/events"} 8' in lines
+    assert 'latency_seconds_bucket{le="1"} 7' in lines
+    assert 'latency_seconds_count 7' in lines
+    # livesum gauges only add up live processes; local ones come from the rendering process
+    assert 'streams 1' in lines
+    assert 'queued 5' in lines
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.json')]) == 3
+
+def test_gunicorn_worker_refuses_process_local_metrics():
+    app = Flask(__name__)
+    app.config['METRICS_TOKEN'] = ''
+    app.register_blueprint(metrics_bp)
+    client = app.test_client()
+    assert client.get('/metrics', environ_overrides={'SERVER_SOFTWARE': 'gunicorn/23.0.0'}).status_code == 503
+    assert client.get('/metrics').status_code == 200
@@ -0,0 +1,25 @@
+from src.models.database import db, ScraperJob
+from src.progress import progress
+from src.scraper.scheduler import ScraperScheduler
+from tests.test_query_plans import captured_queries
+
+def test_relay_polls_only_while_someone_is_watching(app):
+    app.config['SCHEDULER_LEADER_ELECTION'] = True
+    with app.app_context():
+        db.session.add(ScraperJob(status='running', interval_minutes=20))
+        db.session.commit()
+
+        ScraperScheduler._relayed['job'] = ('stale',)
+        with captured_queries() as queries:
+            ScraperScheduler.relay_progress(app)
+        assert queries == []
+        assert ScraperScheduler._relayed == {}
+
+        subscriber = progress.subscribe()
+        try:
+            ScraperScheduler.relay_progress(app)
+            message = subscriber.get_nowait()
+            assert (message['type'], message['status']) == ('status', 'running')
+        finally:
+            progress.unsubscribe(subscriber)
+            ScraperScheduler._relayed.clear()
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import event, select, text
+from src.migrations import run_migrations
+from src.models.database import db, Event, EventRule, Inventory, VenueMapping
+from src.routes.events import paginate_events
+from src.scraper.budget import request_allowance
+
+@contextmanager
+def captured_queries():
+    """Collect (statement, parameters) of every query the engine runs inside the block."""
+    queries = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            queries.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield queries
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+def query_plan(statement, parameters=()) -> str:
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return '\n'.join(row[3] for row in rows)
+
+def plan_of(stmt) -> str:
+    with captured_queries() as queries:
+        db.session.execute(stmt).all()
+    return query_plan(*queries[0])
+
+def test_migrations_recreate_missing_indexes(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_events_website_event_date'))
+            conn.execute(text('DROP INDEX ix_scraper_runs_started_at'))
+            conn.execute(text('DELETE FROM schema_migrations WHERE version IN (2, 11)'))
+        run_migrations()
+        with db.engine.connect() as conn:
+            names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+            versions = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+        assert {'ix_events_website_event_date', 'ix_scraper_runs_started_at'} <= names
+        assert {2, 11} <= versions
+
+def test_scraper_event_selection_uses_website_date_index(app):
+    with app.app_context():
+        plan = plan_of(select(Event).where(
+            Event.event_date >= date.today(),
+            Event.ticketmaster_id.isnot(None),
+            Event.website == 'TicketMaster'
+        ))
+    assert 'ix_events_website_event_date' in plan
+
+def test_events_page_filters_use_indexes(app):
+    with app.app_context():
+        with captured_queries() as queries:
+            paginate_events({'website': 'TodayTix', 'sort': 'event_date'})
+        assert 'ix_events_website_event_date' in query_plan(*queries[0])
+
+        with captured_queries() as queries:
+            paginate_events({'date_from': date.today().isoformat(), 'sort': 'event_date'})
+        assert 'ix_events_event_date' in query_plan(*queries[0])
+
+def test_name_search_uses_nocase_index(app):
+    with app.app_context():
+        with captured_queries() as queries:
+            paginate_events({'q': 'ham', 'sort': 'event_name'})
+        assert 'ix_events_event_name_nocase' in query_plan(*queries[0])
+
+def test_name_search_matches_prefix_ignoring_case(app):
+    names = ['Hamilton', 'hamlet', 'HAMZA', 'Ham_on_rye', 'Hannah', 'Shamrock', 'Wicked', 'Zoo', 'zz top',
+             'x@home', 'x_files', 'x[1]', 'xavier']
+    with app.app_context():
+        db.session.add_all(Event(website='TodayTix', event_id=f'E{i}', event_name=name, city_id=1,
+                                 event_date=date.today(), event_time='19:30') for i, name in enumerate(names))
+        db.session.commit()
+
+        def search(q):
+            return sorted(event.event_name for event in paginate_events({'q': q})[0])
+
+        assert search('HAM') == ['HAMZA', 'Ham_on_rye', 'Hamilton', 'hamlet']
+        assert search('ham_') == ['Ham_on_rye']
+        assert search('z') == ['Zoo', 'zz top']
+        assert search('  wick ') == ['Wicked']
+        assert search('x@') == ['x@home']
+
+def test_event_rule_lookup_uses_index(app):
+    with app.app_context():
+        plan = plan_of(select(EventRule).filter_by(event_id=1, rule_type='section'))
+    assert 'ix_event_rules_event_id_rule_type' in plan
+
+def test_excluded_seats_lookup_uses_index(app):
+    with app.app_context():
+        with captured_queries() as queries:
+            VenueMapping.get_excluded_seats('Hamilton', 'Richard Rodgers Theatre')
+        assert 'ix_venue_mappings_event_venue_active' in query_plan(*queries[0])
+
+def test_daily_request_budget_uses_started_at_index(app):
+    with app.app_context():
+        with captured_queries() as queries:
+            request_allowance(0, 1000)
+        assert 'ix_scraper_runs_started_at' in query_plan(*queries[0])
+
+def test_inventory_lookups_use_indexes(app):
+    with app.app_context():
+        by_inventory_id = plan_of(select(Inventory.inventory_id, Inventory.id).where(Inventory.inventory_id.in_(['a', 'b'])))
+        by_event_pk = plan_of(select(Inventory.id).where(Inventory.event_pk.in_([1, 2]), Inventory.last_seen_run_id != 3))
+    # inventory_id is unique, so SQLite serves it from the constraint's automatic index
+    assert 'sqlite_autoindex_inventory' in by_inventory_id
+    assert 'ix_inventory_event_section' in by_event_pk
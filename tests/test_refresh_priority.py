@@ -0,0 +1,97 @@
+import io
+from datetime import date, datetime, timedelta
+import requests
+from src.models.database import db, Event, EventRefreshState, ScraperJob
+from src.routes.rules import event_group_filter, upsert_group_rules
+from src.scraper.scraper import EventScraper
+from src.services import VenueMappingImporter
+from tests.test_query_plans import captured_queries
+
+class CountingTicketmaster:
+    def __init__(self):
+        self.fetched = []
+
+    def get_seats(self, ticketmaster_id):
+        self.fetched.append(ticketmaster_id)
+        return [{'section': 'A', 'row': '1', 'seats': '1,2', 'price': 10.0}]
+
+class FailingTicketmaster(CountingTicketmaster):
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = failing
+
+    def get_seats(self, ticketmaster_id):
+        if ticketmaster_id in self.failing:
+            raise requests.ConnectionError('proxy unreachable')
+        return super().get_seats(ticketmaster_id)
+
+def setup_events():
+    for i in range(4):
+        db.session.add(Event(website='TicketMaster', event_id=f'E{i}', ticketmaster_id=f'TM{i}',
+                             event_name='Hamilton' if i < 2 else 'Wicked', city_id=1, venue_name=f'Venue {i % 2}',
+                             event_date=date.today() + timedelta(days=90), event_time='19:30'))
+    job = ScraperJob(status='running', interval_minutes=20, concurrent_requests=1)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def scrape(job, tmp_path):
+    api = CountingTicketmaster()
+    ok, output_file = EventScraper(None, api, str(tmp_path), concurrent_requests=1).run(job)
+    assert ok
+    with open(output_file) as f:
+        rows = len(f.read().splitlines()) - 1
+    return sorted(api.fetched), rows
+
+def test_rule_and_venue_mapping_changes_invalidate_cached_rows(app, tmp_path):
+    app.config['PRIORITY_REFRESH_ENABLED'] = True
+    with app.app_context():
+        job = setup_events()
+        assert scrape(job, tmp_path) == (['TM0', 'TM1', 'TM2', 'TM3'], 4)
+        # Far-off shows aren't due again yet; their cached rows are reused
+        assert scrape(job, tmp_path) == ([], 4)
+
+        upsert_group_rules(event_group_filter('Hamilton', 1, 'Venue 0'), {'even': 'EVEN'})
+        db.session.commit()
+        assert scrape(job, tmp_path) == (['TM0'], 4)
+
+        importer = VenueMappingImporter()
+        importer.run(io.StringIO('event_name,venue_name,section,row,seats\nWicked,Venue 1,A,1,1\n'))
+        assert importer.created_count == 1
+        assert scrape(job, tmp_path)[0] == ['TM3']
+
+def test_cached_rows_are_loaded_only_for_reused_events(app, tmp_path):
+    app.config['PRIORITY_REFRESH_ENABLED'] = True
+    with app.app_context():
+        job = setup_events()
+        scrape(job, tmp_path)
+        upsert_group_rules(event_group_filter('Wicked', 1, 'Venue 0'), {'odd': 'ODD'})
+        db.session.commit()
+        with captured_queries() as queries:
+            assert scrape(job, tmp_path)[0] == ['TM2']
+    rows_json_reads = [(statement, parameters) for statement, parameters in queries
+                       if 'event_refresh_states.rows_json' in statement.split('FROM')[0]]
+    assert len(rows_json_reads) == 1
+    # The three events reused from cache, not the one being scraped again
+    assert sorted(p for p in rows_json_reads[0][1] if isinstance(p, int)) == [1, 2, 4]
+
+def test_failed_lookup_keeps_last_rows_and_refresh_state(app, tmp_path):
+    app.config['PRIORITY_REFRESH_ENABLED'] = True
+    with app.app_context():
+        job = setup_events()
+        scrape(job, tmp_path)
+        due = datetime.utcnow() - timedelta(minutes=1)
+        EventRefreshState.query.update({'next_due_at': due})
+        db.session.commit()
+        failed_event = Event.query.filter_by(ticketmaster_id='TM0').one()
+        signature = db.session.get(EventRefreshState, failed_event.id).last_signature
+
+        api = FailingTicketmaster({'TM0'})
+        ok, output_file = EventScraper(None, api, str(tmp_path), concurrent_requests=1).run(job)
+        assert ok
+        with open(output_file) as f:
+            assert len(f.read().splitlines()) - 1 == 4
+        state = db.session.get(EventRefreshState, failed_event.id)
+        # Not recorded as an empty scrape: still due, same listings
+        assert (state.next_due_at, state.last_signature) == (due, signature)
+        assert sorted(api.fetched) == ['TM1', 'TM2', 'TM3']
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import text
+from src.models.database import db, Event, ScraperJob, ScraperRun, VenueMapping
+from src.routes.events import paginate_events
+from src.scraper.scraper import EventScraper
+
+EVENTS = 100
+WEB_READERS = 4
+WEB_WRITERS = 2
+
+class FakeTicketmaster:
+    def get_seats(self, ticketmaster_id):
+        time.sleep(0.002)
+        return [{'section': 'A', 'row': str(i), 'seats': '1,2', 'price': 10.0 + random.random()} for i in range(5)]
+
+def seed(app):
+    with app.app_context():
+        db.session.add_all(
+            Event(website='TicketMaster', event_id=f'E{i}', ticketmaster_id=f'TM{i}', event_name=f'Show {i % 20}',
+                  city_id=1, event_date=date.today() + timedelta(days=1 + i % 60), event_time='19:30')
+            for i in range(EVENTS)
+        )
+        job = ScraperJob(status='running', interval_minutes=20, concurrent_requests=8)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+def test_scrape_alongside_web_reads_and_writes(app, tmp_path):
+    # Scrape every event in both runs rather than only the due ones
+    app.config['PRIORITY_REFRESH_ENABLED'] = False
+    job_id = seed(app)
+    with app.app_context():
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(text('PRAGMA busy_timeout')).scalar() == app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+    errors, counts = [], {'reads': 0, 'writes': 0}
+    done = threading.Event()
+
+    def web_reader():
+        with app.app_context():
+            while not done.is_set():
+                try:
+                    paginate_events({'website': 'TicketMaster', 'sort': 'event_date', 'limit': '50'})
+                    db.session.execute(db.select(ScraperRun).order_by(ScraperRun.id.desc()).limit(1)).all()
+                    counts['reads'] += 1
+                except Exception as e:
+                    errors.append(repr(e))
+                finally:
+                    db.session.remove()
+
+    def web_writer(n):
+        with app.app_context():
+            row = 0
+            while not done.is_set():
+                try:
+                    db.session.add(VenueMapping(event_name='Show 1', venue_name='Venue', section=f'W{n}',
+                                                row=str(row), seats='1,2'))
+                    db.session.commit()
+                    counts['writes'] += 1
+                    row += 1
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(repr(e))
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=web_reader) for _ in range(WEB_READERS)]
+    threads += [threading.Thread(target=web_writer, args=(n,)) for n in range(WEB_WRITERS)]
+    for thread in threads:
+        thread.start()
+    try:
+        with app.app_context():
+            job = db.session.get(ScraperJob, job_id)
+            for _ in range(2):
+                scraper = EventScraper(None, FakeTicketmaster(), str(tmp_path), concurrent_requests=8)
+                ok, output_file = scraper.run(job)
+                assert ok and output_file
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+    assert not [e for e in errors if 'database is locked' in e]
+    assert not errors
+    assert counts['reads'] and counts['writes']
+    with app.app_context():
+        runs = ScraperRun.query.all()
+        assert [run.status for run in runs] == ['completed', 'completed']
+        assert all(run.events_scraped == EVENTS for run in runs)
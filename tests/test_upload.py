@@ -0,0 +1,54 @@
+import io
+import os
+import pytest
+from flask import Flask
+from openpyxl import Workbook, load_workbook
+from src.routes import upload
+from src.routes.auth import login_manager
+
+class RecordingUploadService:
+    def __init__(self):
+        self.uploaded = []
+
+    def upload_csv(self, file_path):
+        workbook = load_workbook(file_path, read_only=True)
+        rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+        workbook.close()
+        self.uploaded.append((os.path.basename(file_path), rows))
+        return True, 'Uploaded'
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    service = RecordingUploadService()
+    monkeypatch.setattr(upload, 'get_upload_service', lambda: service)
+    app = Flask(__name__)
+    app.config.update(LOGIN_DISABLED=True, OUTPUT_FILE_DIR=str(tmp_path), SECRET_KEY='test')
+    login_manager.init_app(app)
+    app.register_blueprint(upload.bp)
+    client = app.test_client()
+    client.service = service
+    return client
+
+def workbook_bytes():
+    workbook = Workbook()
+    workbook.active.append(['section', 'row'])
+    workbook.active.append(['A', '1'])
+    data = io.BytesIO()
+    workbook.save(data)
+    return data.getvalue()
+
+def test_non_ascii_filename_keeps_its_extension(client, tmp_path):
+    response = client.post('/api/upload', data={'file': (io.BytesIO(workbook_bytes()), '票.XLSX')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    (name, rows), = client.service.uploaded
+    assert name.endswith('.xlsx')
+    assert rows == [('section', 'row'), ('A', '1')]
+    # The temp file is removed once uploaded
+    assert os.listdir(tmp_path) == []
+
+def test_rejects_unsupported_extension(client):
+    response = client.post('/api/upload', data={'file': (io.BytesIO(b'x'), 'listings.xlsx.exe')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert client.service.uploaded == []
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from sqlalchemy import update
+from src.accounting import metered
+from src.models.database import db, Event, ScraperJob, ScraperRun, ScrapeWorkItem
+from src.scraper.scraper import EventScraper
+from src.scraper.work_queue import WorkQueue
+
+class FakeResponse:
+    content = b'{}'
+
+class FakeTicketmaster:
+    """Makes `requests_per_event` metered upstream calls per event, like paged seat lookups."""
+
+    def __init__(self, requests_per_event: int = 1, delay: float = 0.0):
+        self.requests_per_event = requests_per_event
+        self.delay = delay
+        self.fetched = Counter()
+        self._lock = threading.Lock()
+
+    def get_seats(self, ticketmaster_id):
+        with self._lock:
+            self.fetched[ticketmaster_id] += 1
+        for _ in range(self.requests_per_event):
+            metered('ticketmaster', 'quickpicks', FakeResponse)()
+        time.sleep(self.delay)
+        return [{'section': 'A', 'row': '1', 'seats': '1,2', 'price': 10.0}]
+
+def add_events(count: int):
+    db.session.add_all(
+        Event(website='TicketMaster', event_id=f'E{i}', ticketmaster_id=f'TM{i}', event_name=f'Show {i}',
+              city_id=1, event_date=date.today() + timedelta(days=1), event_time='19:30')
+        for i in range(count)
+    )
+    job = ScraperJob(status='running', interval_minutes=20, concurrent_requests=1)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def sharded(app, **config):
+    app.config.update(SCRAPER_SHARDING=True, SCRAPER_SHARD_SIZE=5, SCRAPER_SHARD_POLL_SECONDS=0.05,
+                      PRIORITY_REFRESH_ENABLED=False, **config)
+
+def test_sharded_run_keeps_to_request_budget(app, tmp_path):
+    sharded(app, SCRAPER_RUN_REQUEST_BUDGET=10)
+    with app.app_context():
+        job = add_events(20)
+        # Two requests per event where the planner expects one, so the items have to stop early
+        ok, _ = EventScraper(None, FakeTicketmaster(requests_per_event=2), str(tmp_path), concurrent_requests=1).run(job)
+        run = ScraperRun.query.one()
+        assert ok
+        assert run.request_limit == 10
+        assert run.requests_made <= 10
+        assert run.events_scraped + run.events_skipped == 10
+        assert run.events_skipped > 0
+
+def start_run(event_ids, batch_size: int, queue: WorkQueue) -> int:
+    run = ScraperRun(status='running', started_at=datetime.now())
+    db.session.add(run)
+    db.session.commit()
+    queue.enqueue(run.id, event_ids, batch_size)
+    return run.id
+
+def expire_leases(run_id: int):
+    db.session.execute(
+        update(ScrapeWorkItem).where(ScrapeWorkItem.run_id == run_id, ScrapeWorkItem.status == 'claimed')
+        .values(lease_expires_at=datetime.now() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+def test_two_shard_workers_claim_each_item_once(app, tmp_path):
+    with app.app_context():
+        add_events(40)
+        event_ids = [event.id for event in Event.query.order_by(Event.id)]
+        run_id = start_run(event_ids, 4, WorkQueue())
+    api = FakeTicketmaster(delay=0.01)
+    claimed = {}
+    errors = []
+
+    def shard_worker(name):
+        queue = WorkQueue(lease_seconds=30)
+        with app.app_context():
+            try:
+                while True:
+                    item = queue.claim(run_id)
+                    if item is None:
+                        return
+                    claimed.setdefault(item.id, []).append(name)
+                    scraper = EventScraper(None, api, str(tmp_path), concurrent_requests=2)
+                    assert scraper.process_work_item(queue, item)
+            except Exception as e:
+                errors.append(repr(e))
+            finally:
+                db.session.remove()
+
+    workers = [threading.Thread(target=shard_worker, args=(name,)) for name in ('shard-1', 'shard-2')]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors
+    with app.app_context():
+        assert WorkQueue.counts(run_id) == {'done': 10}
+        items = ScrapeWorkItem.query.filter_by(run_id=run_id).all()
+        assert all(item.attempts == 1 for item in items)
+        assert len({item.claimed_by for item in items}) == 2
+    assert sorted(claimed) == sorted(item.id for item in items)
+    assert all(len(names) == 1 for names in claimed.values())
+    # Every event was scraped exactly once across both workers
+    assert len(api.fetched) == 40 and set(api.fetched.values()) == {1}
+
+def test_expired_lease_is_reclaimed_and_stale_holder_cannot_complete(app):
+    with app.app_context():
+        add_events(2)
+        first, second = WorkQueue(), WorkQueue()
+        run_id = start_run([event.id for event in Event.query], 2, first)
+
+        stale = first.claim(run_id)
+        assert second.claim(run_id) is None
+        expire_leases(run_id)
+
+        reclaimed = second.claim(run_id)
+        assert reclaimed.id == stale.id and reclaimed.attempts == 2
+        assert not first.renew(stale)
+        assert not first.complete(stale, {})
+        assert second.complete(reclaimed, {})
+        assert WorkQueue.counts(run_id) == {'done': 1}
+
+def test_fail_abandoned_fails_items_out_of_attempts(app):
+    with app.app_context():
+        add_events(4)
+        queue = WorkQueue(max_attempts=2)
+        run_id = start_run([event.id for event in Event.query.order_by(Event.id)], 2, queue)
+
+        # Both items claimed once and abandoned: they go back up for grabs
+        queue.claim(run_id), queue.claim(run_id)
+        expire_leases(run_id)
+        assert queue.fail_abandoned(run_id) == 0
+        # The second claims are the last allowed attempts
+        queue.claim(run_id), queue.claim(run_id)
+        expire_leases(run_id)
+        assert queue.claim(run_id) is None
+        assert queue.fail_abandoned(run_id) == 2
+
+        items = ScrapeWorkItem.query.filter_by(run_id=run_id).all()
+        assert [(item.status, item.error, item.attempts) for item in items] == [('failed', 'Lease expired', 2)] * 2
+        assert [item.id for item in WorkQueue.finished_items(run_id, set())] == [item.id for item in items]